@@ -0,0 +1,71 @@
+"""Startup benchmark of EvolutionaryModelDiscovery.
+
+Measures, in fresh interpreters, the time and memory taken to import the package,
+the modules of the factor importance analysis stack loaded by the import, and the
+memory of a spawned worker process, like those evolving GP runs in parallel.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import multiprocessing
+import statistics
+import subprocess
+import sys
+
+ANALYSIS_MODULES = ["sklearn", "scipy.stats", "networkx", "eli5"]
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import EvolutionaryModelDiscovery
+imported = time.perf_counter()
+loaded = [m for m in {modules!r} if m in sys.modules]
+EvolutionaryModelDiscovery.FactorImportances
+print(imported - start, time.perf_counter() - imported, ','.join(loaded))
+"""
+
+
+def get_max_rss_mb() -> float:
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows
+        return float("nan")
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in kilobytes elsewhere
+    return max_rss / 2 ** 20 if sys.platform == "darwin" else max_rss / 2 ** 10
+
+
+def worker_stats() -> tuple:
+    import EvolutionaryModelDiscovery
+
+    loaded = [m for m in ANALYSIS_MODULES if m in sys.modules]
+    return get_max_rss_mb(), loaded
+
+
+def measure_import() -> tuple:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT.format(modules=ANALYSIS_MODULES)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.split()
+    return float(output[0]), float(output[1]), output[2].split(",") if len(output) > 2 else []
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EvolutionaryModelDiscovery startup benchmark")
+    parser.add_argument("--repeats", type=int, default=5, help="Fresh interpreters to time the import in.")
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.repeats)]
+    import_times = [import_time for import_time, _, _ in imports]
+    analysis_times = [analysis_time for _, analysis_time, _ in imports]
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        worker_rss, worker_loaded = executor.submit(worker_stats).result()
+
+    print(f"import EvolutionaryModelDiscovery: median {statistics.median(import_times):.3f}s, "
+          f"min {min(import_times):.3f}s over {args.repeats} interpreters")
+    print(f"analysis stack loaded by the import: {', '.join(imports[0][2]) or 'none'}")
+    print(f"first use of FactorImportances: median {statistics.median(analysis_times):.3f}s")
+    print(f"spawned worker max RSS: {worker_rss:.1f} MB, "
+          f"analysis stack loaded: {', '.join(worker_loaded) or 'none'}")
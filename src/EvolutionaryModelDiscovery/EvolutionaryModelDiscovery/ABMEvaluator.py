@@ -12,8 +12,13 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>."""
 
-from typing import Dict, List, Callable, Any, Union
+from typing import Dict, List, Callable, Any, Iterator, Optional, Tuple, Union
+from contextlib import contextmanager
+import hashlib
 import math
+import multiprocessing.pool
+import statistics
+import warnings
 
 import numpy as np
 import pandas as pd
@@ -23,6 +28,11 @@ from deap import gp
 
 from .Util import *
 from .NetLogoWriter import NetLogoWriter
+from .FitnessCache import FitnessCache
+from .WorkspacePool import WorkspacePool
+from .IncrementalObjective import IncrementalObjective
+from .RuleCanonicalizer import RuleCanonicalizer
+from .PresenceScorer import PresenceScorer
 
 
 def default_objective(results: pd.DataFrame) -> float:
@@ -37,6 +47,16 @@ def default_objective(results: pd.DataFrame) -> float:
 
 
 OBJECTIVE_FUNCTION = default_objective
+FITNESS_CACHE = None
+SIMULATION_CONTEXT_HASH = None
+WORKSPACE_POOL = None
+REPLICATE_PROCS = 1
+SIMULATION_SLOTS = None
+RACING = None
+RACING_REFERENCE = None
+RULE_CANONICALIZER = RuleCanonicalizer()
+MODEL_FACTORS = None
+PRESENCE_SCORER = None
 
 
 def set_objective_function(objective_function: Callable) -> None:
@@ -44,59 +64,295 @@ def set_objective_function(objective_function: Callable) -> None:
     Sets a custom callable as the objective function for the GP. 
 
     :param objective_function: Callable to be executed by GP. Must return a fitness value.
+                                    An IncrementalObjective also receives measurements 
+                                    while simulations run and can stop them early.
     """
-    global OBJECTIVE_FUNCTION
+    global OBJECTIVE_FUNCTION, SIMULATION_CONTEXT_HASH
     OBJECTIVE_FUNCTION = objective_function
+    SIMULATION_CONTEXT_HASH = None
+
+
+def get_objective_function() -> Callable:
+    return OBJECTIVE_FUNCTION
+
+
+def set_fitness_cache(fitness_cache: FitnessCache) -> None:
+    """
+    Sets the store used to look up the fitness of previously simulated rules.
+
+    :param fitness_cache: FitnessCache to use, or None to simulate every rule.
+    """
+    global FITNESS_CACHE
+    FITNESS_CACHE = fitness_cache
+
+
+def get_fitness_cache() -> FitnessCache:
+    return FITNESS_CACHE
+
+
+def set_workspace_pool(workspace_pool: WorkspacePool) -> None:
+    """
+    Sets the pool that simulations check NetLogo workspaces out of.
+
+    :param workspace_pool: WorkspacePool to use, or None to create and delete
+                                a workspace per simulation.
+    """
+    global WORKSPACE_POOL
+    WORKSPACE_POOL = workspace_pool
+
+
+def set_replicate_procs(replicate_procs: int) -> None:
+    """
+    Sets how many workspaces the replicates of a single simulation are spread over.
+
+    :param replicate_procs: int number of replicates of a rule simulated concurrently.
+    """
+    global REPLICATE_PROCS
+    REPLICATE_PROCS = max(1, replicate_procs)
+
+
+def set_racing(racing: Dict[str, Any]) -> None:
+    """
+    Enables replicate racing, see race.
+
+    :param racing: Dict with int "initial_replicates" run before and between checks,
+                        float "top_fraction" of the population a rule must be able
+                        to reach to get more replicates, and float "confidence" of
+                        that check. None runs all replicates of every rule.
+    """
+    global RACING, SIMULATION_CONTEXT_HASH
+    RACING = racing
+    SIMULATION_CONTEXT_HASH = None
+
+
+def get_racing() -> Dict[str, Any]:
+    return RACING
+
+
+def set_racing_reference(fitness_values: List[float], is_minimize: bool) -> None:
+    """
+    Sets the fitness distribution of the current population that raced rules are
+    compared against.
+
+    :param fitness_values: List[float] fitness of the population, or None if not known yet.
+    :param is_minimize: bool whether lower fitness is better.
+    """
+    global RACING_REFERENCE
+    RACING_REFERENCE = (
+        None if fitness_values is None else (list(fitness_values), is_minimize)
+    )
+
+
+def set_simulation_slots(simulation_slots: Any) -> None:
+    """
+    Sets a semaphore bounding the number of simulations running at once across
+    all genetic programs sharing it, such as GP runs evolved in separate processes.
+
+    :param simulation_slots: semaphore with acquire() and release(), or None for
+                                no bound other than the workspace pool.
+    """
+    global SIMULATION_SLOTS
+    SIMULATION_SLOTS = simulation_slots
+
+
+@contextmanager
+def checkout_workspace() -> Iterator["nl4py.NetLogoHeadlessWorkspace"]:
+    """
+    Provides a NetLogo headless workspace for the duration of a simulation,
+    from the workspace pool if one is set. Waits for a simulation slot first
+    if simulation slots are set.
+    """
+    if SIMULATION_SLOTS is not None:
+        SIMULATION_SLOTS.acquire()
+        try:
+            with _checkout_workspace() as workspace:
+                yield workspace
+        finally:
+            SIMULATION_SLOTS.release()
+    else:
+        with _checkout_workspace() as workspace:
+            yield workspace
+
+
+@contextmanager
+def _checkout_workspace() -> Iterator["nl4py.NetLogoHeadlessWorkspace"]:
+    if WORKSPACE_POOL is not None:
+        with WORKSPACE_POOL.workspace() as workspace:
+            yield workspace
+    else:
+        workspace = nl4py.create_headless_workspace()
+        try:
+            yield workspace
+        finally:
+            workspace.deleteWorkspace()
 
 
 def set_model_factors(
     model_factors: "EvolutionaryModelDiscovery.ModelFactors",
 ) -> None:
-    global MODEL_FACTORS
+    global MODEL_FACTORS, RULE_CANONICALIZER, PRESENCE_SCORER
     MODEL_FACTORS = model_factors
+    PRESENCE_SCORER = PresenceScorer(model_factors)
+    RULE_CANONICALIZER = RuleCanonicalizer(
+        getattr(model_factors, "commutative", []),
+        getattr(model_factors, "associative", []),
+    )
+
+
+def get_rule_key(
+    individual: Union["gp.creator.IndividualMin", "gp.creator.IndividualMax"],
+    rule: str,
+) -> str:
+    """
+    Returns the key identifying the behavior of a rule: its canonical form if any
+    factors are annotated @commutative or @associative, otherwise the compiled rule.
+
+    :param individual: gp individual.
+    :param rule: str rule compiled from the individual.
+    """
+    if RULE_CANONICALIZER.is_identity():
+        return rule
+    return RULE_CANONICALIZER.canonicalize(individual)
+
+
+def get_individual_rule_key(
+    individual: Union["gp.creator.IndividualMin", "gp.creator.IndividualMax"],
+) -> str:
+    """
+    Compiles the rule of an individual and returns its key, see get_rule_key.
+
+    :param individual: gp individual.
+    """
+    return get_rule_key(individual, compile_rule(individual))
+
+
+def compile_rule(
+    individual: Union["gp.creator.IndividualMin", "gp.creator.IndividualMax"],
+) -> str:
+    return str(gp.compile(individual, MODEL_FACTORS.get_DEAP_primitive_set()))
+
+
+def get_equivalent_record(
+    individual: Union["gp.creator.IndividualMin", "gp.creator.IndividualMax"],
+    record: Dict[str, Any],
+) -> pd.Series:
+    """
+    Builds the evaluation result of an individual from the record of an equivalent
+    rule, one with the same rule key: only the simulation results carry over, the
+    presence scores and rule are those of the individual.
+
+    :param individual: gp individual.
+    :param record: Dict record of the equivalent rule.
+    :returns: pd.Series evaluation result of the individual, as returned by evaluate.
+    """
+    ind_record = score_presence(individual)
+    for name in ["Replicates", "Fitness"]:
+        if name in record:
+            ind_record[name] = record[name]
+    ind_record["Rule"] = compile_rule(individual)[:-1]
+    return pd.Series(list(ind_record.values()), index=ind_record.keys())
 
 
 def set_model_init_data(model_init_data: Dict[str, Any]) -> None:
-    global MODEL_INIT_DATA
+    global MODEL_INIT_DATA, SIMULATION_CONTEXT_HASH
     MODEL_INIT_DATA = model_init_data
+    SIMULATION_CONTEXT_HASH = None
 
 
 def set_netlogo_writer(netlogo_writer: NetLogoWriter) -> None:
-    global NETLOGO_WRITER
+    global NETLOGO_WRITER, SIMULATION_CONTEXT_HASH
     NETLOGO_WRITER = netlogo_writer
+    SIMULATION_CONTEXT_HASH = None
+
+
+def get_simulation_context_hash() -> Optional[str]:
+    """
+    Hashes everything other than the rule that determines the fitness of a
+    simulated rule: the model and factors files, setup commands, measurement
+    reporters, ticks, go command, aggregation function and objective function,
+    see callable_fingerprint for what the hash of a function covers. Data files
+    read by the model or the objective function are not hashed, change the
+    version of the fitness cache when they change.
+
+    :return: str sha256 hex digest of the simulation context, or None if the
+                objective or aggregation function cannot be fingerprinted, in which
+                case fitness is not cached.
+    """
+    global SIMULATION_CONTEXT_HASH
+    if SIMULATION_CONTEXT_HASH is None:
+        try:
+            context = [
+                file_hash(MODEL_INIT_DATA["model_path"]),
+                file_hash(NETLOGO_WRITER.get_factors_file_path()),
+                repr(MODEL_INIT_DATA["setup_commands"]),
+                repr(MODEL_INIT_DATA["measurement_commands"]),
+                repr(MODEL_INIT_DATA["ticks_to_run"]),
+                repr(MODEL_INIT_DATA["go_command"]),
+                callable_fingerprint(MODEL_INIT_DATA["agg_func"]),
+                callable_fingerprint(OBJECTIVE_FUNCTION),
+                repr(RACING),
+            ]
+            SIMULATION_CONTEXT_HASH = hashlib.sha256(
+                "\n".join(context).encode()
+            ).hexdigest()
+        except TypeError as e:
+            warnings.warn(f"Fitness is not cached: {e}")
+            # Empty rather than None, so that the warning is only given once
+            SIMULATION_CONTEXT_HASH = ""
+    return SIMULATION_CONTEXT_HASH or None
 
 
 def evaluate(
-    individual: Union["gp.creator.IndividualMin", "gp.creator.IndividualMax"]
+    individual: Union["gp.creator.IndividualMin", "gp.creator.IndividualMax"],
+    ticks_to_run: int = None,
 ) -> pd.Series:
     """
     Genetic program's evaluation function. 
 
     Simplifies and scores factor/factor-interaction presence.
     Compiles gp tree representation into flattened str format.
-    Writes rule to new NetLogo model.
-    Simulates new NetLogo model and records fitness.
-    Cleans up auto-generated NetLogo model.
+    Reuses the fitness of the rule, or of an equivalent rule, if it has already 
+    been simulated.
+    Simulates NetLogo model with the rule injected and records fitness.
 
     :param individual: Union['gp.creator.IndividualMin', 'gp.creator.IndividualMax'] gp individual
+    :param ticks_to_run: int number of ticks to simulate instead of the model's ticks_to_run,
+                            e.g. for low-fidelity pre-screening. Replicates are not raced.
     :return: pd.Series containing presence scores, fitness, and compiled rule of executed gp individual
     """
-    ind_record = score_factor_presence(individual, MODEL_FACTORS)
-    newRule = str(
-        gp.compile(individual, MODEL_FACTORS.get_DEAP_primitive_set())
-    )
-    newModelPath = NETLOGO_WRITER.inject_new_rule(newRule)
-    fitness = simulate(
-        newModelPath,
+    newRule = compile_rule(individual)
+    context_hash = None
+    if FITNESS_CACHE is not None:
+        context_hash = get_simulation_context_hash()
+    if context_hash is not None:
+        if ticks_to_run is not None:
+            context_hash = f"{context_hash}:{ticks_to_run}"
+        rule_key = get_rule_key(individual, newRule)
+        cached_record = FITNESS_CACHE.get(rule_key, context_hash)
+        if cached_record is not None:
+            if rule_key == newRule:
+                return pd.Series(
+                    list(cached_record.values()), index=cached_record.keys()
+                )
+            return get_equivalent_record(individual, cached_record)
+    ind_record = score_presence(individual)
+    simulation_args = (
+        None,
         MODEL_INIT_DATA["setup_commands"],
         MODEL_INIT_DATA["measurement_commands"],
-        MODEL_INIT_DATA["ticks_to_run"],
+        MODEL_INIT_DATA["ticks_to_run"] if ticks_to_run is None else ticks_to_run,
         MODEL_INIT_DATA["go_command"],
         MODEL_INIT_DATA["agg_func"],
     )
-    remove_model(newModelPath)
+    if RACING is not None and ticks_to_run is None:
+        fitness, replicates = race(*simulation_args, new_rule=newRule)
+        ind_record["Replicates"] = replicates
+    else:
+        fitness = simulate(*simulation_args, new_rule=newRule)
     ind_record["Fitness"] = fitness
     ind_record["Rule"] = newRule[:-1]
+    if context_hash is not None:
+        FITNESS_CACHE.put(rule_key, context_hash, ind_record)
     ind_record = pd.Series(list(ind_record.values()), index=ind_record.keys())
     return ind_record
 
@@ -108,21 +364,112 @@ def simulate(
     ticks_to_run: int,
     go_command: str,
     agg_func: Callable = np.mean,
+    new_rule: str = None,
 ) -> pd.DataFrame:
     """
-    Creates a workspace for the NetLogo model and runs it by specified parameters, returning workspace results as pandas dataframe
+    Checks out a workspace, opens the NetLogo model and runs it by specified parameters, returning workspace results as pandas dataframe
 
-    :param model_path: str file path to .nlogo model file.
+    :param model_path: str file path to .nlogo model file. Ignored if new_rule is given.
     :param all_setup_commands: list of str NetLogo commands for simulation setup.
     :param measurement_reporters: list of str NetLogo reporters to measure simulation state per tick.
     :param ticks_to_run: int number of ticks to run simulation for.
     :param go_command: str NetLogo command to run simulation.
     :param agg_func: function use to aggregate results of replicates.
+    :param new_rule: str rule to inject into the model loaded by the NetLogoWriter.
     :returns: pd.DataFrame of simulation fitness.
     """
 
-    workspace = nl4py.create_headless_workspace()
-    workspace.open_model(model_path)
+    all_setup_commands, ticks_to_run = prepare_replicates(
+        all_setup_commands, ticks_to_run
+    )
+    all_results = simulate_replicates_concurrently(
+        model_path,
+        all_setup_commands,
+        measurement_reporters,
+        ticks_to_run,
+        go_command,
+        new_rule,
+    )
+    return (agg_func(all_results),)
+
+
+def race(
+    model_path: str,
+    all_setup_commands: List[Any],
+    measurement_reporters: List[str],
+    ticks_to_run: int,
+    go_command: str,
+    agg_func: Callable = np.mean,
+    new_rule: str = None,
+) -> Tuple[Tuple[float], int]:
+    """
+    Simulates replicates in batches of RACING["initial_replicates"] until the
+    replicates run so far show, with RACING["confidence"], that the rule cannot
+    reach the top RACING["top_fraction"] of the current population. Runs all
+    replicates while no population fitness is known yet.
+
+    The fitness of the replicates so far, aggregated by agg_func like the final
+    fitness, is compared against the population, give or take the confidence bound
+    of the mean of the replicates.
+
+    Parameters are as for simulate.
+
+    :returns: Tuple of the simulation fitness and the number of replicates run.
+    """
+    all_setup_commands, ticks_to_run = prepare_replicates(
+        all_setup_commands, ticks_to_run
+    )
+    if RACING_REFERENCE is None:
+        all_results = simulate_replicates_concurrently(
+            model_path,
+            all_setup_commands,
+            measurement_reporters,
+            ticks_to_run,
+            go_command,
+            new_rule,
+        )
+        return (agg_func(all_results),), len(all_results)
+    reference, is_minimize = RACING_REFERENCE
+    top_fraction = RACING["top_fraction"]
+    threshold = np.quantile(
+        reference, top_fraction if is_minimize else 1 - top_fraction
+    )
+    z = statistics.NormalDist().inv_cdf(RACING["confidence"])
+    batch_size = RACING["initial_replicates"]
+    all_results = []
+    while len(all_results) < len(all_setup_commands):
+        replicates = all_setup_commands[
+            len(all_results) : len(all_results) + batch_size
+        ]
+        all_results.extend(
+            simulate_replicates_concurrently(
+                model_path,
+                replicates,
+                measurement_reporters,
+                ticks_to_run,
+                go_command,
+                new_rule,
+            )
+        )
+        if len(all_results) == len(all_setup_commands):
+            break
+        fitness = agg_func(all_results)
+        bound = z * np.std(all_results, ddof=1) / math.sqrt(len(all_results))
+        # Stop once even the optimistic end of the confidence interval misses the top
+        if (is_minimize and fitness - bound > threshold) or (
+            not is_minimize and fitness + bound < threshold
+        ):
+            break
+    return (agg_func(all_results),), len(all_results)
+
+
+def prepare_replicates(
+    all_setup_commands: List[Any], ticks_to_run: int
+) -> Tuple[List[List[str]], int]:
+    """
+    Normalizes setup commands into one list of commands per replicate and
+    replaces a negative ticks_to_run by a practically unlimited number of ticks.
+    """
     assert (
         type(all_setup_commands[0]) == str
         or type(all_setup_commands[0]) == list
@@ -132,17 +479,200 @@ def simulate(
     if ticks_to_run < 0:
         # Run "forever" because no stop condition provided.
         ticks_to_run = math.pow(2, 31)
+    return all_setup_commands, ticks_to_run
+
+
+def simulate_replicates_concurrently(
+    model_path: str,
+    all_setup_commands: List[List[str]],
+    measurement_reporters: List[str],
+    ticks_to_run: int,
+    go_command: str,
+    new_rule: str = None,
+) -> List[Any]:
+    """
+    Runs simulation replicates spread over up to REPLICATE_PROCS workspaces.
+
+    Parameters are as for simulate_replicates.
+
+    :returns: List of objective function results, one per replicate, in order.
+    """
+
+    def run_replicates(replicates: List[List[str]]) -> List[Any]:
+        return simulate_replicates(
+            model_path,
+            replicates,
+            measurement_reporters,
+            ticks_to_run,
+            go_command,
+            new_rule,
+        )
+
+    num_chunks = min(REPLICATE_PROCS, len(all_setup_commands))
+    if num_chunks > 1:
+        # Spread replicates over several workspaces, keeping their order
+        chunks = [
+            chunk.tolist()
+            for chunk in np.array_split(
+                np.arange(len(all_setup_commands)), num_chunks
+            )
+        ]
+        with multiprocessing.pool.ThreadPool(num_chunks) as pool:
+            chunk_results = pool.map(
+                run_replicates,
+                [[all_setup_commands[i] for i in chunk] for chunk in chunks],
+            )
+        return [result for results in chunk_results for result in results]
+    return run_replicates(all_setup_commands)
+
+
+def simulate_replicates(
+    model_path: str,
+    all_setup_commands: List[List[str]],
+    measurement_reporters: List[str],
+    ticks_to_run: int,
+    go_command: str,
+    new_rule: str = None,
+) -> List[Any]:
+    """
+    Runs simulation replicates one after another in a single workspace.
+
+    :param model_path: str file path to .nlogo model file. Ignored if new_rule is given.
+    :param all_setup_commands: list of lists of str NetLogo setup commands, one per replicate.
+    :param measurement_reporters: list of str NetLogo reporters to measure simulation state per tick.
+    :param ticks_to_run: int number of ticks to run simulation for.
+    :param go_command: str NetLogo command to run simulation.
+    :param new_rule: str rule to inject into the model loaded by the NetLogoWriter.
+    :returns: List of objective function results, one per replicate.
+    """
     all_results = []
-    for setup_commands_replicate in all_setup_commands:
-        for setup_command in setup_commands_replicate:
-            workspace.command(setup_command)
-        measures = workspace.schedule_reporters(
-            measurement_reporters, 0, 1, ticks_to_run, go_command
+    with checkout_workspace() as workspace:
+        if new_rule is None:
+            workspace.open_model(model_path)
+        else:
+            open_rule_model(workspace, new_rule)
+        for setup_commands_replicate in all_setup_commands:
+            for setup_command in setup_commands_replicate:
+                workspace.command(setup_command)
+            if isinstance(OBJECTIVE_FUNCTION, IncrementalObjective):
+                all_results.append(
+                    run_incremental(
+                        workspace,
+                        OBJECTIVE_FUNCTION,
+                        measurement_reporters,
+                        ticks_to_run,
+                        go_command,
+                    )
+                )
+                continue
+            measures = workspace.schedule_reporters(
+                measurement_reporters, 0, 1, ticks_to_run, go_command
+            )
+            measures = pd.DataFrame(measures, columns=measurement_reporters)
+            all_results.append(OBJECTIVE_FUNCTION(measures))
+    return all_results
+
+
+def run_incremental(
+    workspace: "nl4py.NetLogoHeadlessWorkspace",
+    objective_function: IncrementalObjective,
+    measurement_reporters: List[str],
+    ticks_to_run: int,
+    go_command: str,
+) -> Any:
+    """
+    Runs a set up simulation in chunks of ticks, handing the measurements so far to
+    the objective function after each chunk, until it returns a fitness or ticks_to_run
+    ticks have been simulated. The stop tick of each chunk is absolute, and the
+    progress of the simulation is read from its ticks reporter after each chunk. A
+    simulation that stops on its own ends with a chunk cut short.
+
+    :param workspace: NetLogo headless workspace with the model open and set up.
+    :param objective_function: IncrementalObjective translating measurements into fitness.
+    :param measurement_reporters: list of str NetLogo reporters to measure simulation state per tick.
+    :param ticks_to_run: int number of ticks to run simulation for.
+    :param go_command: str NetLogo command to run simulation.
+    :returns: fitness of the simulation.
+    :raises RuntimeError: if a chunk reports no measurements before ticks_to_run is
+                            reached, or the simulation does not advance.
+    """
+    measures = []
+    ticks_run = 0
+    while ticks_run < ticks_to_run:
+        chunk_ticks = int(
+            min(objective_function.get_chunk_ticks(), ticks_to_run - ticks_run)
         )
-        measures = pd.DataFrame(measures, columns=measurement_reporters)
-        all_results.append(OBJECTIVE_FUNCTION(measures))
-    workspace.deleteWorkspace()
-    return (agg_func(all_results),)
+        stop_tick = ticks_run + chunk_ticks
+        chunk = workspace.schedule_reporters(
+            measurement_reporters, 0, 1, stop_tick, go_command
+        )
+        if len(chunk) == 0:
+            raise RuntimeError(
+                f"No measurements reported between ticks {ticks_run} and {stop_tick} "
+                f"of a simulation of {ticks_to_run} ticks."
+            )
+        measures.extend(chunk)
+        ticks_reached = int(float(workspace.report("ticks")))
+        if ticks_reached <= ticks_run:
+            raise RuntimeError(
+                f"Simulation did not advance past tick {ticks_run} of {ticks_to_run}."
+            )
+        ticks_run = ticks_reached
+        fitness = objective_function.update(
+            pd.DataFrame(measures, columns=measurement_reporters)
+        )
+        if fitness is not None:
+            return fitness
+        if ticks_run < stop_tick:
+            # Simulation stopped on its own
+            break
+    return objective_function(pd.DataFrame(measures, columns=measurement_reporters))
+
+
+def open_rule_model(
+    workspace: "nl4py.NetLogoHeadlessWorkspace", new_rule: str
+) -> None:
+    """
+    Opens the model with the new rule injected in a workspace. The model source is 
+    handed to the workspace directly if its backend supports it, otherwise the model 
+    is written to a temporary .EMD.nlogo file that is removed once opened.
+
+    :param workspace: NetLogo headless workspace.
+    :param new_rule: str rule to inject into the model.
+    """
+    if hasattr(workspace, "open_model_from_source"):
+        workspace.open_model_from_source(
+            NETLOGO_WRITER.get_model_source(new_rule)
+        )
+    else:
+        model_path = NETLOGO_WRITER.inject_new_rule(new_rule)
+        try:
+            workspace.open_model(model_path)
+        finally:
+            remove_model(model_path)
+
+
+def score_presence(
+    individual: Union["gp.creator.IndividualMin", "gp.creator.IndividualMax"]
+) -> Dict[str, int]:
+    """
+    Scores factor or factor interaction presence of an individual using the loaded ModelFactors.
+    """
+    return PRESENCE_SCORER.to_dict(*PRESENCE_SCORER.score(individual))
+
+
+def score_population_presence(
+    individuals: List[Union["gp.creator.IndividualMin", "gp.creator.IndividualMax"]]
+) -> List[Dict[str, int]]:
+    """
+    Scores factor or factor interaction presence of a whole population at once
+    using the loaded ModelFactors.
+    """
+    scores, interactions = PRESENCE_SCORER.score_batch(individuals)
+    return [
+        PRESENCE_SCORER.to_dict(row, row_interactions)
+        for row, row_interactions in zip(scores, interactions)
+    ]
 
 
 def score_factor_presence(
@@ -153,77 +683,12 @@ def score_factor_presence(
     Scores factor or factor interaction presence as coefficient of simplified rule.
 
     :param ind: 
-    :param ModelFactors: ModelFactors module auto-generated and loaded by EMD.
+    :param ModelFactors: ModelFactors parsed from the model by EMD.
     :return: Dict[str, int] mapping factor/factor-interaction name to presence score
     """
-    factor_interactions = ModelFactors.interactions
-    factors = ModelFactors.measureable_factors
-    presence_dict = {}
-    for factor in factors:
-        presence_dict[factor] = 0
-    # items on stack represent primitives being processed.
-    # items have 3 elements param num considered, primitive(deap.gp.Primitive), and polarity (int)
-    stack = [{"param_num": 0, "obj": ind[0], "polarity": 1}]
-    interaction = None
-    interactionRoot = None
-    polarity = 1
-    for child in range(1, len(ind)):
-        childString = ind[child].name
-        childArity = ind[child].arity
-        # Update presence counts
-        # Check negate
-        parent = stack[-1]
-        if interaction == None:
-            if parent["obj"].name in ModelFactors.negativeOps.keys():
-                child_position_polarity = ModelFactors.negativeOps[
-                    parent["obj"].name
-                ][parent["param_num"]]
-                polarity = parent["polarity"] * child_position_polarity
-            if childString in factors:
-                # Countable
-                print(childString, parent["obj"].name, polarity)
-                presence_dict[childString] = (
-                    presence_dict[childString] + polarity
-                )
-            # If interaction found start recording
-            if childString in factor_interactions:
-                interaction = [childString]
-                interactionRoot = len(stack)
-        elif type(interaction) == list:
-            # if interaction still processing, append
-            interaction.append(childString)
-        # Process next
-        # Tell parent a child has been found...
-        stack[-1]["param_num"] = stack[-1]["param_num"] + 1
-        parent = stack[-1]
-        # Resolve children if any
-        if childArity == 0:
-            # Terminal found.
-            # Travel up the stack and pop any completed parents
-            while parent["param_num"] == parent["obj"].arity:
-                _ = stack.pop()
-                if len(stack) == 0:
-                    # root reached
-                    break
-                parent = stack[-1]
-                polarity = parent["polarity"]
-                # Now, if all this parent removal revealed an interaction root, process it
-                if len(stack) == interactionRoot:
-                    # Interaction is done processing
-                    interactionString = str(
-                        gp.compile(
-                            interaction, MODEL_FACTORS.get_DEAP_primitive_set()
-                        )
-                    )
-                    presence_dict[interactionString] = (
-                        presence_dict.get(interactionString, 0) + polarity
-                    )
-                    interaction = None
-                    interactionRoot = None
-                    polarity = 1
-        else:
-            # primitive found. Add to family stack with arity
-            stack.append(
-                {"param_num": 0, "obj": ind[child], "polarity": polarity}
-            )
-    return presence_dict
+    scorer = (
+        PRESENCE_SCORER
+        if ModelFactors is MODEL_FACTORS
+        else PresenceScorer(ModelFactors)
+    )
+    return scorer.to_dict(*scorer.score(ind))
@@ -11,8 +11,8 @@ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
 GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>."""
+from typing import List
 import re
-from tkinter import E
 
 from .Factor import Factor
 from .Util import *
@@ -25,33 +25,30 @@ from .Util import *
 class FactorGenerator:
     def __init__(self) -> None:
         """
-        This class is responsible for generating ModelFactors.py according 
-        to the NetLogo annotations read from the input model.
-
-        Note: ModelFactors.py is autogenerated and should not be manually 
-            created.
+        This class is responsible for parsing the factors and operators 
+        that ModelFactors are built from out of the NetLogo annotations 
+        read from the input model.
 
         """
         self._factors = []
         self._operators = []
         self._negativeOps = {}
         self._interactions = []
+        self._commutative = []
+        self._associative = []
         self._typeSignatures = {}
         self._types = set([])
-        self.model_factor_path = get_model_factors_path()
 
     def generate(self, factor_file_path: str) -> None:
         """
         Reads in the .nls or .nlogo file with factors, loading factors 
         and their parameters, typing, and other metadata.
-        Writes extracted factors and typing information into ModelFactors.py
 
         :param factor_file_path: str path to  the .nls or .nlogo file with the factor specififications
 
         """
         self.read_netlogo_function_file(factor_file_path)
         self.extract_NL_types()
-        self.write_python_classes()
 
     def read_netlogo_function_file(self, factor_file_path: str) -> None:
         """
@@ -66,6 +63,8 @@ class FactorGenerator:
             factor_identified = False
             operator_identified = False
             interaction_identified = False
+            commutative_identified = False
+            associative_identified = False
             factor_return_type = ""
             factor_parameter_types = []
             parameter_contributions_to_fitness = []
@@ -106,6 +105,10 @@ class FactorGenerator:
                                 )
                             elif "interaction" in emd_parameter:
                                 interaction_identified = True
+                            elif emd_parameter == "commutative":
+                                commutative_identified = True
+                            elif emd_parameter == "associative":
+                                associative_identified = True
                             else:
                                 raise Exception(
                                     "Invalid EMD annotation argument {1} at line {0}.".format(
@@ -127,9 +130,15 @@ class FactorGenerator:
                         self._operators.append(factor)
                     if interaction_identified:
                         self._interactions.append(factor.get_safe_name())
+                    if commutative_identified:
+                        self._commutative.append(factor.get_safe_name())
+                    if associative_identified:
+                        self._associative.append(factor.get_safe_name())
                     factor_identified = False
                     operator_identified = False
                     interaction_identified = False
+                    commutative_identified = False
+                    associative_identified = False
                     factor = None
             self._interactions = list(set(self._interactions))
 
@@ -138,101 +147,6 @@ class FactorGenerator:
             self._types.add(factor.get_return_type())
             self._types = self._types.union(set(factor.get_parameter_types()))
 
-    def write_python_classes(self) -> None:
-        """
-        Writes factors and operators as Python classes into ModelFactors.py
-
-        """
-        self.write_class_names()
-        self.write_negative_ops_dictionary()
-        self.write_measureable_factors()
-        self.write_interactions()
-        for factor in self._factors:
-            self.write_python_class_from_factor(factor)
-        for nlType in self._types:
-            self.write_python_class_from_nl_type(nlType)
-
-    def write_class_names(self) -> None:
-        classNamesString = "\nclassNames = ["
-        with open(self.model_factor_path, "a+") as f:
-            for factor in self._factors:
-                classNamesString = '{0}"{1}",'.format(
-                    classNamesString, factor.get_safe_name()
-                )
-            classNamesString = (
-                classNamesString[: (len(classNamesString) - 1)] + "]"
-            )
-            f.write(classNamesString)
-
-    def write_python_class_from_factor(self, factor: Factor) -> None:
-        """
-        Compile the NetLogo procedure string for the Factor into a Python 
-        class written to ModelFactors.py.
-
-        """
-        parameterString = " "
-        occurances = 0
-        for parameterType in factor.get_parameter_types():
-            parameterString = parameterString + "{0}, ".format(
-                (parameterType + str(occurances))
-            )
-            occurances = occurances + 1
-        parameterString = parameterString[:-2]
-        netlogoString = '"( {0} '.format(str(factor.get_name()))
-        occurances = 0
-        for parameterType in factor.get_parameter_types():
-            netlogoString = netlogoString + '(" + str({0}) + ") '.format(
-                (parameterType + str(occurances))
-            )
-            occurances = occurances + 1
-        netlogoString = netlogoString + '"'
-        netlogoString = '{0} + " ) "'.format(netlogoString)
-        with open(self.model_factor_path, "a+") as f:
-            f.write("\nclass {0}:".format(factor.get_safe_name()))
-            f.write('\n\t__name__ = "{0}"'.format(factor.get_safe_name()))
-            f.write("\n\tdef __init__(self,{0}):".format(parameterString))
-            f.write("\n\t\tself.__name__ = {0}".format(netlogoString))
-            f.write("\n\tdef __str__(self):")
-            f.write("\n\t\treturn self.__name__")
-            f.write("\n\tdef __repr__(self):")
-            f.write("\n\t\treturn self.__name__")
-            f.flush()
-            f.close()
-
-    def write_python_class_from_nl_type(self, nlType: str) -> None:
-        with open(self.model_factor_path, "a+") as f:
-            f.write("\nclass {0}:".format(nlType))
-            f.write('\n\t__name__ = "{0}"'.format(nlType))
-            f.write("\n\tdef __init__(self, nl_string):")
-            f.write("\n\t\tself.__name__ = str(nl_string)")
-            f.write("\n\tdef __str__(self):")
-            f.write("\n\t\treturn self.__name__")
-            f.write("\n\tdef __repr__(self):")
-            f.write("\n\t\treturn self.__name__")
-            f.flush()
-            f.close()
-
-    def write_negative_ops_dictionary(self) -> None:
-        with open(self.model_factor_path, "a+") as f:
-            f.write("\nnegativeOps = ")
-            f.write(str(self.get_negative_ops()))
-            f.flush()
-            f.close()
-
-    def write_measureable_factors(self) -> None:
-        with open(self.model_factor_path, "a+") as f:
-            f.write("\nmeasureable_factors = ")
-            f.write(str(self.get_measureable_factors()))
-            f.flush()
-            f.close()
-
-    def write_interactions(self) -> None:
-        with open(self.model_factor_path, "a+") as f:
-            f.write("\ninteractions = ")
-            f.write(str(self.get_interactions()))
-            f.flush()
-            f.close()
-
     def get_factors(self) -> None:
         return self._factors
 
@@ -251,3 +165,9 @@ class FactorGenerator:
 
     def get_interactions(self) -> None:
         return self._interactions
+
+    def get_commutative(self) -> List[str]:
+        return self._commutative
+
+    def get_associative(self) -> List[str]:
+        return self._associative
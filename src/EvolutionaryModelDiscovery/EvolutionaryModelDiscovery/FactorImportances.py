@@ -12,18 +12,28 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.'''
 
-from typing import Tuple, Union
+from typing import List, Tuple, Union
+import hashlib
 import os
-import importlib
 import multiprocessing
+import uuid
 
+import joblib
+import numpy as np
 import pandas as pd
 import networkx as nx
-from scipy import stats
+import sklearn
+from scipy import sparse, stats
 from sklearn.ensemble import RandomForestRegressor
-from eli5.sklearn import PermutationImportance
 
 from .Util import *
+from .FactorScoresWriter import read_factor_scores, get_random_forests_path
+from .PermutationImportance import get_permutation_importances
+from .SparseFactorScores import (
+    METADATA_COLUMNS,
+    SparseFactorScores,
+    is_sparse_factor_scores_path,
+)
 
 
 class FactorImportances:
@@ -35,46 +45,183 @@ class FactorImportances:
 
     '''
 
-    def __init__(self, factor_scores: Union[pd.DataFrame, str]) -> None:
+    # Trees added at a time, most trees and factors ranked when growing forests of num_trees="auto"
+    AUTO_TREES_STEP = 50
+    AUTO_MAX_TREES = 2000
+    AUTO_RANKED_FACTORS = 20
+
+    def __init__(self, factor_scores: Union[pd.DataFrame, SparseFactorScores, str], 
+                    model_factors: "EvolutionaryModelDiscovery.ModelFactors" = None, 
+                    random_forests_path: str = None, num_trees: Union[int, str] = 520,
+                    tree_tolerance: float = 0.01) -> None:
         '''
         Loads genetic program output along with factor and operator data
 
-        :param factor_scores: pd.DataFrame or str path to .csv containing genetic program output
+        :param factor_scores: pd.DataFrame, SparseFactorScores or str path to .csv or .npz 
+            containing genetic program output. Sparse factor scores are trained on without 
+            converting the presence scores to a dense matrix.
+        :param model_factors: ModelFactors the genetic program was run with. If None, the 
+            first order factors are taken to be the factor scores columns that are not 
+            factor interactions.
+        :param random_forests_path: str directory trained random forests are saved to, and 
+            loaded from instead of retraining when trained on the same factor scores with 
+            the same hyperparameters. Defaults to next to the factor scores file when given 
+            its path. If None otherwise, random forests are not saved.
+        :param num_trees: int number of trees of the random forests, or "auto" to grow them
+            until their out-of-bag error and importance ranking converge, see get_num_trees.
+        :param tree_tolerance: float relative change of out-of-bag error, and of the rank
+            correlation of the most important factors, below which forests of "auto" trees
+            stop growing.
         '''
+        if isinstance(num_trees, str) and num_trees != "auto":
+            raise ValueError('num_trees should be an int or "auto".')
+        self.num_trees = num_trees
+        self.tree_tolerance = tree_tolerance
+        if random_forests_path is None and isinstance(factor_scores, str):
+            random_forests_path = get_random_forests_path(factor_scores)
+        self.random_forests_path = random_forests_path
         # Loading factor scores
-        if isinstance(factor_scores, pd.DataFrame):
+        self.sparse_factor_scores = None
+        if isinstance(factor_scores, str) and is_sparse_factor_scores_path(factor_scores):
+            factor_scores = SparseFactorScores.load(factor_scores)
+        if isinstance(factor_scores, SparseFactorScores):
+            self.sparse_factor_scores = factor_scores
+            self.factor_scores = factor_scores.to_dataframe()
+        elif isinstance(factor_scores, pd.DataFrame):
             self.factor_scores = factor_scores.fillna(0)
         elif isinstance(factor_scores, str):
-            self.factor_scores = pd.read_csv(
+            self.factor_scores = read_factor_scores(
                 os.path.join(factor_scores)).fillna(0)
         else:
             raise TypeError(
-                "factor_scores should be a str path or pandas DataFrame.")
-        module_name = get_model_factors_module_name()
-        self.model_factors = importlib.import_module(
-            f"EvolutionaryModelDiscovery.{module_name}")
+                "factor_scores should be a str path, pandas DataFrame or SparseFactorScores.")
+        self.model_factors = model_factors
+        if model_factors is not None:
+            self.measureable_factors = list(model_factors.measureable_factors)
+        else:
+            # Factor interactions are named by the list of names of their subtree
+            self.measureable_factors = [col for col in self._get_presence_columns() 
+                                        if not col.startswith("[")]
 
-    def _train_random_forest(self, num_trees: int = 520, interactions: bool = False) -> None:
+    def _train_random_forest(self, num_trees: Union[int, str] = None, interactions: bool = False) -> None:
         '''
         Trains random forest regressor to predict simulation fitness using factor presence
 
         Train/test split omitted for now, instead using complete dataset since the aim is 
         to estimate factor importance rather than measure predictive performance.
         '''
+        if num_trees is None:
+            num_trees = self.num_trees
         self.y = self.factor_scores["Fitness"]
         if not interactions:
             # Training random forest with first order factors (excluding interactions)
-            self.x_first_order = self.factor_scores[self.model_factors.measureable_factors]
-            self.rf_first_order = RandomForestRegressor(
-                n_estimators=num_trees, random_state=0, n_jobs=multiprocessing.cpu_count(), bootstrap=False)
-            self.rf_first_order.fit(self.x_first_order, self.y)
+            self.first_order_columns = list(self.measureable_factors)
+            self.x_first_order = self._get_presence(self.first_order_columns)
+            self.rf_first_order = self._fit_random_forest(
+                self.x_first_order, self.first_order_columns, num_trees)
         else:
             # Training random forest with factors and factor interactions
-            self.x_with_interactions = self.factor_scores[list(filter(lambda col: (
-                col not in ["Run", "Gen", "Rule", "Fitness"]), self.factor_scores.columns))]
-            self.rf_with_interactions = RandomForestRegressor(
+            self.interaction_columns = self._get_presence_columns()
+            self.x_with_interactions = self._get_presence(self.interaction_columns)
+            self.rf_with_interactions = self._fit_random_forest(
+                self.x_with_interactions, self.interaction_columns, num_trees)
+
+    def _fit_random_forest(self, features: Union[pd.DataFrame, sparse.csr_matrix], 
+                           columns: List[str], num_trees: Union[int, str]) -> RandomForestRegressor:
+        '''
+        Fits a random forest regressor to predict fitness from the given presence scores, 
+        or loads the one saved under the same hash of presence scores, fitness, columns 
+        and hyperparameters. Arrays of a loaded forest are memory-mapped from the saved 
+        file where the model keeps them as they are.
+        '''
+        if num_trees == "auto":
+            # Out-of-bag error needs bootstrapped trees
+            rf = RandomForestRegressor(
+                n_estimators=self.AUTO_TREES_STEP, random_state=0, n_jobs=multiprocessing.cpu_count(),
+                bootstrap=True, oob_score=True, warm_start=True)
+            growth = (self.tree_tolerance, self.AUTO_MAX_TREES, self.AUTO_RANKED_FACTORS)
+        else:
+            rf = RandomForestRegressor(
                 n_estimators=num_trees, random_state=0, n_jobs=multiprocessing.cpu_count(), bootstrap=False)
-            self.rf_with_interactions.fit(self.x_with_interactions, self.y)
+            growth = ()
+        if self.random_forests_path is None:
+            return self._grow_random_forest(rf, features) if growth else rf.fit(features, self.y)
+        path = os.path.join(self.random_forests_path,
+                            f"{_get_random_forest_key(rf, features, self.y, columns, growth)}.joblib")
+        if os.path.isfile(path):
+            try:
+                saved_rf = joblib.load(path, mmap_mode='r')
+                saved_rf.set_params(n_jobs=rf.n_jobs)
+                return saved_rf
+            except Exception:
+                # Unreadable, such as saved by an incompatible scikit-learn, so retrained
+                pass
+        rf = self._grow_random_forest(rf, features) if growth else rf.fit(features, self.y)
+        os.makedirs(self.random_forests_path, exist_ok=True)
+        # Write and then rename, so that other sessions never load a partial file
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        joblib.dump(rf, tmp_path)
+        os.replace(tmp_path, path)
+        return rf
+
+    def _grow_random_forest(self, rf: RandomForestRegressor,
+                            features: Union[pd.DataFrame, sparse.csr_matrix]) -> RandomForestRegressor:
+        '''
+        Grows a warm started random forest AUTO_TREES_STEP trees at a time, until adding
+        trees changes its out-of-bag mean squared error by a fraction of at most
+        tree_tolerance and leaves the ranking of its most important factors stable, with
+        a Spearman rank correlation of at least 1 - tree_tolerance, or until it has
+        AUTO_MAX_TREES trees.
+        '''
+        y = self.y.to_numpy()
+        previous_error = None
+        previous_importances = None
+        while True:
+            rf.fit(features, y)
+            error = np.mean((y - rf.oob_prediction_) ** 2)
+            importances = rf.feature_importances_
+            if previous_error is not None:
+                error_change = abs(previous_error - error) / max(previous_error, np.finfo(float).eps)
+                # Ranking of the factors most important to the grown forest, as the many
+                # factors of near zero importance reorder by chance
+                ranked = np.argsort(importances)[::-1][:self.AUTO_RANKED_FACTORS]
+                ranking_stable = (len(ranked) < 2
+                                  or np.allclose(previous_importances[ranked], importances[ranked])
+                                  or stats.spearmanr(previous_importances[ranked],
+                                                     importances[ranked])[0] >= 1 - self.tree_tolerance)
+                if error_change <= self.tree_tolerance and ranking_stable:
+                    break
+            if rf.n_estimators >= self.AUTO_MAX_TREES:
+                break
+            previous_error = error
+            previous_importances = importances
+            rf.set_params(n_estimators=min(rf.n_estimators + self.AUTO_TREES_STEP, self.AUTO_MAX_TREES))
+        return rf
+
+    def get_num_trees(self, interactions: bool = False) -> int:
+        '''
+        Returns the number of trees of the trained random forest, the size chosen when
+        growing forests of num_trees="auto".
+
+        :param interactions: Whether or not to consider factor-factor interactions.
+        '''
+        return len(self._get_trained_random_forest(interactions).estimators_)
+
+    def _get_presence_columns(self) -> List[str]:
+        '''
+        Returns the factor and factor interaction columns of the factor scores.
+        '''
+        if self.sparse_factor_scores is not None:
+            return self.sparse_factor_scores.get_columns()
+        return [col for col in self.factor_scores.columns if col not in METADATA_COLUMNS]
+
+    def _get_presence(self, columns: List[str]) -> Union[pd.DataFrame, sparse.csr_matrix]:
+        '''
+        Returns the presence scores of the given factors, as a sparse matrix for sparse factor scores.
+        '''
+        if self.sparse_factor_scores is not None:
+            return self.sparse_factor_scores.get_column_presence(columns)
+        return self.factor_scores[columns]
 
     def _get_trained_random_forest(self, interactions: bool = False):
         '''
@@ -102,9 +249,9 @@ class FactorImportances:
         '''
         rf = self._get_trained_random_forest(interactions)
         if not interactions:
-            cols = self.x_first_order.columns
+            cols = self.first_order_columns
         else:
-            cols = self.x_with_interactions.columns
+            cols = self.interaction_columns
         # SKLean uses Gini Importance by default
         GI = pd.DataFrame(
             data=[tree.feature_importances_ for tree in rf.estimators_], columns=cols)
@@ -112,26 +259,40 @@ class FactorImportances:
         GI = GI.loc[:, ~GI.columns.duplicated()]
         return GI
 
-    def get_permutation_accuracy_importances(self, interactions: bool = False) -> pd.DataFrame:
+    def get_permutation_accuracy_importances(self, interactions: bool = False, n_iter: int = 10,
+                                             max_samples: int = None, num_procs: int = None,
+                                             random_state: int = None, 
+                                             max_workers: int = None) -> pd.DataFrame:
         '''
-        Calculates permutation accuracy importance of factors.
+        Calculates permutation accuracy importance of factors, shuffling factors in 
+        parallel.
 
         :param interactions: Whether or not to consider factor-factor interactions.
+        :param n_iter: int number of times each factor is shuffled.
+        :param max_samples: int number of randomly sampled rules to shuffle factors of. 
+            If None, all rules are used. Bounds the cost on large factor scores archives.
+        :param num_procs: int number of threads shuffling factors, defaults to the number of cores.
+        :param random_state: int seed of the rule sample and the shuffles.
+        :param max_workers: int most threads at a time, each holding a copy of the factor 
+            presence scores, to bound memory on large dense factor scores. Sparse factor 
+            scores are shuffled without densifying them.
 
         :returns: pd.DataFrame with factors (optionally interactions) with thier 
             permutation accuracy importance estimates.
         '''
         rf = self._get_trained_random_forest(interactions)
         if not interactions:
-            cols = self.x_first_order.columns
-            features = self.x_first_order.values
+            cols = self.first_order_columns
+            features = self.x_first_order
         else:
-            cols = self.x_with_interactions.columns
-            features = self.x_with_interactions.values
-        # Using eli5 to compute permutation accuracy importance on fitted random forest
-        perm = PermutationImportance(
-            rf, cv="prefit", n_iter=10).fit(features, self.y.values)
-        PI = pd.DataFrame(data=perm.results_, columns=cols)
+            cols = self.interaction_columns
+            features = self.x_with_interactions
+        # Decrease in R^2 of the fitted random forest when each factor is shuffled
+        PI = pd.DataFrame(
+            data=get_permutation_importances(rf, features, self.y.values, n_iter=n_iter,
+                                             max_samples=max_samples, num_procs=num_procs,
+                                             random_state=random_state, 
+                                             max_workers=max_workers), columns=cols)
         PI = PI[PI.sum().sort_values(ascending=True).index]
         PI = PI.loc[:, ~PI.columns.duplicated()]
         return PI
@@ -180,3 +341,24 @@ class FactorImportances:
         if return_pvalues:
             return_value = optimal_presence, presence_comparisons
         return return_value
+
+
+def _get_random_forest_key(rf: RandomForestRegressor, features: Union[pd.DataFrame, sparse.csr_matrix], 
+                           y: pd.Series, columns: List[str], growth: tuple = ()) -> str:
+    '''
+    Returns the sha256 hex digest identifying a random forest by its training data,
+    features, hyperparameters and the settings it is grown with. Parallelism and
+    verbosity do not change the model and are left out.
+    '''
+    params = {name: value for name, value in rf.get_params().items() 
+              if name not in ("n_jobs", "verbose")}
+    sha = hashlib.sha256(repr((sorted(params.items()), growth, sklearn.__version__,
+                               list(columns))).encode())
+    if sparse.issparse(features):
+        features = sparse.csr_matrix(features)
+        for array in (features.data, features.indices, features.indptr, np.array(features.shape)):
+            sha.update(np.ascontiguousarray(array).tobytes())
+    else:
+        sha.update(pd.util.hash_pandas_object(features, index=False).to_numpy().tobytes())
+    sha.update(np.ascontiguousarray(y, dtype=np.float64).tobytes())
+    return sha.hexdigest()
@@ -0,0 +1,291 @@
+"""EvolutionaryModelDiscovery: Automated agent rule generation and
+importance evaluation for agent-based models with Genetic Programming.
+Copyright (C) 2018  Chathika Gunaratne
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>."""
+
+from typing import Any, Dict, List, Mapping
+from pathlib import Path
+import pickle
+import shutil
+import tempfile
+import uuid
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from .SparseFactorScores import SparseFactorScores
+
+
+class FactorScoreAccumulator:
+    """
+    Collects the factor presence scores and metadata (fitness, rule, generation, ...)
+    of evaluated individuals.
+
+    Presence scores are appended into a preallocated, growable int8 NumPy matrix
+    with a column index that grows as new factors and factor interactions are seen.
+    Metadata fields are kept in plain lists. A single pandas DataFrame is only
+    materialized on demand. Once the presence matrix grows beyond a memory limit,
+    the accumulated rows are spilled to disk.
+    """
+
+    def __init__(
+        self,
+        initial_rows: int = 1024,
+        initial_columns: int = 64,
+        memory_limit: int = 256 * 2 ** 20,
+        spill_dir: str = None,
+    ) -> None:
+        """
+        :param initial_rows: int number of rows preallocated.
+        :param initial_columns: int number of presence columns preallocated.
+        :param memory_limit: int number of bytes of presence data held in memory
+                                before rows are spilled to disk.
+        :param spill_dir: str directory to spill rows into (default: a new temporary directory).
+        """
+        self._initial_rows = max(1, initial_rows)
+        self._initial_columns = max(1, initial_columns)
+        self._memory_limit = memory_limit
+        self._spill_dir = spill_dir
+        self._owns_spill_dir = spill_dir is None
+        self._spill_files = []
+        self._spilled_rows = 0
+        self._columns = {}
+        self._field_names = []
+        self._reset_block()
+
+    def _reset_block(self) -> None:
+        self._presence = np.zeros(
+            (self._initial_rows, max(self._initial_columns, len(self._columns))),
+            dtype=np.int8,
+        )
+        self._fields = {name: [] for name in self._field_names}
+        self._num_rows = 0
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Spilled rows are embedded so that pickled accumulators, e.g. in
+        # evolution snapshots, do not depend on temporary files.
+        state = self.__dict__.copy()
+        spilled_blocks = []
+        for spill_file, num_rows in self._spill_files:
+            with open(spill_file, "rb") as f:
+                spilled_blocks.append((f.read(), num_rows))
+        state["_spill_files"] = spilled_blocks
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        spilled_blocks = state.pop("_spill_files")
+        self.__dict__.update(state)
+        self._spill_files = []
+        if len(spilled_blocks) > 0:
+            if self._owns_spill_dir:
+                self._spill_dir = tempfile.mkdtemp(prefix="EMD_factor_scores_")
+            Path(self._spill_dir).mkdir(parents=True, exist_ok=True)
+        for block, num_rows in spilled_blocks:
+            spill_file = Path(
+                self._spill_dir, f"block_{uuid.uuid4().hex}.pkl"
+            )
+            with open(spill_file, "wb") as f:
+                f.write(block)
+            self._spill_files.append((str(spill_file), num_rows))
+
+    def __len__(self) -> int:
+        return self._spilled_rows + self._num_rows
+
+    def get_columns(self) -> List[str]:
+        """
+        :returns: List[str] factor and factor interaction columns in order of appearance.
+        """
+        return list(self._columns.keys())
+
+    def get_field_names(self) -> List[str]:
+        """
+        :returns: List[str] metadata fields in order of appearance.
+        """
+        return list(self._field_names)
+
+    def append(self, presence: Mapping[str, int], **fields: Any) -> None:
+        """
+        Appends the factor presence scores and metadata of an evaluated individual.
+
+        :param presence: Mapping of factor/factor-interaction name to presence score.
+        :param fields: metadata of the individual, such as Fitness, Rule and Gen.
+        """
+        if self._num_rows == self._presence.shape[0]:
+            self._grow(rows=True)
+        row = self._num_rows
+        for name, score in presence.items():
+            column = self._columns.get(name)
+            if column is None:
+                column = len(self._columns)
+                self._columns[name] = column
+                if column == self._presence.shape[1]:
+                    self._grow(rows=False)
+            if score:
+                self._set_score(row, column, score)
+        for name in self._field_names:
+            self._fields[name].append(fields.pop(name, None))
+        for name, value in fields.items():
+            # Field seen for the first time, earlier rows get None
+            self._field_names.append(name)
+            self._fields[name] = [None] * row + [value]
+        self._num_rows = row + 1
+        if self._presence.nbytes > self._memory_limit:
+            self._spill()
+
+    def _set_score(self, row: int, column: int, score: int) -> None:
+        info = np.iinfo(self._presence.dtype)
+        if not info.min <= score <= info.max:
+            # Presence score overflows the current dtype, widen it
+            dtype = np.int16 if self._presence.dtype == np.int8 else np.int32
+            self._presence = self._presence.astype(dtype)
+        self._presence[row, column] = score
+
+    def _grow(self, rows: bool) -> None:
+        num_rows, num_columns = self._presence.shape
+        if rows:
+            num_rows = num_rows * 2
+        else:
+            num_columns = num_columns * 2
+        presence = np.zeros((num_rows, num_columns), dtype=self._presence.dtype)
+        presence[
+            : self._presence.shape[0], : self._presence.shape[1]
+        ] = self._presence
+        self._presence = presence
+
+    def _spill(self) -> None:
+        """
+        Writes the rows held in memory to disk and starts a new block.
+        """
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix="EMD_factor_scores_")
+        Path(self._spill_dir).mkdir(parents=True, exist_ok=True)
+        spill_file = Path(
+            self._spill_dir, f"block_{uuid.uuid4().hex}.pkl"
+        )
+        with open(spill_file, "wb") as f:
+            pickle.dump(self._get_block(), f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._spill_files.append((str(spill_file), self._num_rows))
+        self._spilled_rows = self._spilled_rows + self._num_rows
+        self._reset_block()
+
+    def _get_block(self) -> Dict[str, Any]:
+        return {
+            "columns": self.get_columns(),
+            "presence": self._presence[: self._num_rows, : len(self._columns)],
+            "fields": {
+                name: list(values) for name, values in self._fields.items()
+            },
+        }
+
+    def _load_blocks(self, start: int = 0) -> List[Dict[str, Any]]:
+        """
+        Loads the blocks holding rows from start onwards, with the offset of
+        their first row.
+        """
+        blocks = []
+        offset = 0
+        for spill_file, num_rows in self._spill_files:
+            if offset + num_rows > start:
+                with open(spill_file, "rb") as f:
+                    blocks.append((offset, pickle.load(f)))
+            offset = offset + num_rows
+        blocks.append((offset, self._get_block()))
+        return blocks
+
+    def to_dataframe(self, start: int = 0) -> pd.DataFrame:
+        """
+        Materializes the accumulated rows as a DataFrame with one column per factor
+        and factor interaction followed by the metadata fields.
+
+        :param start: int index of the first row to include.
+        :returns: pd.DataFrame of factor scores.
+        """
+        columns = self.get_columns()
+        field_names = self.get_field_names()
+        blocks = self._load_blocks(start)
+        dtype = np.result_type(
+            *[block["presence"].dtype for _, block in blocks]
+        )
+        presence = np.zeros((max(0, len(self) - start), len(columns)), dtype=dtype)
+        fields = {name: [] for name in field_names}
+        row = 0
+        for offset, block in blocks:
+            block_rows = block["presence"].shape[0]
+            skip = min(block_rows, max(0, start - offset))
+            if skip == block_rows:
+                continue
+            num_rows = block_rows - skip
+            presence[row : row + num_rows, : len(block["columns"])] = block[
+                "presence"
+            ][skip:]
+            for name in field_names:
+                values = block["fields"].get(name, [])
+                values = [None] * (block_rows - len(values)) + values
+                fields[name].extend(values[skip:])
+            row = row + num_rows
+        factor_scores = pd.DataFrame(presence, columns=columns)
+        for name in field_names:
+            factor_scores[name] = fields[name]
+        return factor_scores
+
+    def to_sparse(self, start: int = 0) -> SparseFactorScores:
+        """
+        Materializes the accumulated rows as SparseFactorScores, without a dense
+        matrix of all rows.
+
+        :param start: int index of the first row to include.
+        :returns: SparseFactorScores of the factor scores.
+        """
+        columns = self.get_columns()
+        field_names = self.get_field_names()
+        presences = []
+        fields = {name: [] for name in field_names}
+        for offset, block in self._load_blocks(start):
+            block_rows = block["presence"].shape[0]
+            skip = min(block_rows, max(0, start - offset))
+            if skip == block_rows:
+                continue
+            presence = sparse.csr_matrix(block["presence"][skip:])
+            presence.resize((block_rows - skip, len(columns)))
+            presences.append(presence)
+            for name in field_names:
+                values = block["fields"].get(name, [])
+                values = [None] * (block_rows - len(values)) + values
+                fields[name].extend(values[skip:])
+        if len(presences) == 0:
+            presence = sparse.csr_matrix((0, len(columns)), dtype=np.int8)
+        else:
+            presence = sparse.vstack(presences, format="csr")
+        return SparseFactorScores(
+            presence, columns, pd.DataFrame(fields, index=range(presence.shape[0]))
+        )
+
+    def clear(self) -> None:
+        """
+        Removes all accumulated rows, including those spilled to disk.
+        """
+        for spill_file, _ in self._spill_files:
+            Path(spill_file).unlink(missing_ok=True)
+        self._spill_files = []
+        self._spilled_rows = 0
+        self._columns = {}
+        self._field_names = []
+        self._reset_block()
+
+    def close(self) -> None:
+        """
+        Removes spilled rows from disk.
+        """
+        self.clear()
+        if self._owns_spill_dir and self._spill_dir is not None:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
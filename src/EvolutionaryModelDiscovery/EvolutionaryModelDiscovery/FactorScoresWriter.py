@@ -0,0 +1,286 @@
+"""EvolutionaryModelDiscovery: Automated agent rule generation and
+importance evaluation for agent-based models with Genetic Programming.
+Copyright (C) 2018  Chathika Gunaratne
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>."""
+
+from typing import List, Union
+from pathlib import Path
+import csv
+import json
+import os
+import shutil
+
+import pandas as pd
+
+from .SparseFactorScores import SparseFactorScores, is_sparse_factor_scores_path
+
+PRIORITY_COLUMNS = ["Run", "Island", "Gen", "Rule"]
+
+
+def get_schema_path(factor_scores_path: str) -> str:
+    return f"{factor_scores_path}.columns"
+
+
+def get_low_fidelity_path(factor_scores_path: str) -> str:
+    """
+    :returns: str path of the file low-fidelity factor scores are written to,
+                next to the factor scores file.
+    """
+    path = Path(factor_scores_path)
+    return str(path.with_name(f"{path.stem}_LowFidelity{path.suffix}"))
+
+
+def get_random_forests_path(factor_scores_path: str) -> str:
+    """
+    :returns: str path of the directory random forests trained on the factor scores
+                are saved to, next to the factor scores file.
+    """
+    return f"{factor_scores_path}.models"
+
+
+def read_factor_scores_columns(factor_scores_path: str) -> List[str]:
+    """
+    Reads the columns of a factor scores file, including columns added after
+    its header was written.
+
+    :param factor_scores_path: str path to the factor scores .csv file.
+    :returns: List[str] of columns, empty if the file does not exist.
+    """
+    schema_path = get_schema_path(factor_scores_path)
+    if Path(schema_path).is_file():
+        with open(schema_path, "r") as f:
+            return json.load(f)
+    if Path(factor_scores_path).is_file():
+        with open(factor_scores_path, "r", newline="") as f:
+            return next(csv.reader(f), [])
+    return []
+
+
+def read_factor_scores(factor_scores_path: str) -> pd.DataFrame:
+    """
+    Reads a factor scores file, also while it is still being written to by a
+    FactorScoresWriter.
+
+    :param factor_scores_path: str path to the factor scores .csv file.
+    :returns: pd.DataFrame of factor scores.
+    """
+    if Path(get_schema_path(factor_scores_path)).is_file():
+        return pd.read_csv(
+            factor_scores_path,
+            header=None,
+            skiprows=1,
+            names=read_factor_scores_columns(factor_scores_path),
+        )
+    return pd.read_csv(factor_scores_path)
+
+
+class FactorScoresWriter:
+    """
+    Appends factor scores to a .csv file as soon as they are available.
+
+    New factor interaction columns are added after the existing columns, so rows
+    written earlier remain valid prefixes of later rows. Until the writer is
+    finalized, the full list of columns is kept in a small .columns file next to
+    the factor scores file; finalizing rewrites the header line to include them.
+    """
+
+    def __init__(self, factor_scores_path: str) -> None:
+        """
+        :param factor_scores_path: str path to the factor scores .csv file. Rows are
+                                        appended to the file if it already exists.
+        """
+        self._path = str(Path(factor_scores_path))
+        self._schema_path = get_schema_path(self._path)
+        self._columns = read_factor_scores_columns(self._path)
+        self._read_header()
+
+    def _read_header(self) -> None:
+        if Path(self._path).is_file():
+            with open(self._path, "r", newline="") as f:
+                self._header = next(csv.reader(f), [])
+            with open(self._path, "rb") as f:
+                self._header_size = len(f.readline())
+        else:
+            self._header = []
+            self._header_size = 0
+
+    def get_path(self) -> str:
+        return self._path
+
+    def get_columns(self) -> List[str]:
+        return list(self._columns)
+
+    def get_data_size(self) -> int:
+        """
+        :returns: int number of bytes of rows written after the header line.
+        """
+        if not Path(self._path).is_file():
+            return 0
+        return os.path.getsize(self._path) - self._header_size
+
+    def truncate(self, data_size: int) -> None:
+        """
+        Drops the rows written after the first data_size bytes following the header line.
+        Used to discard rows of generations that are re-run when resuming evolution.
+
+        :param data_size: int number of bytes of rows to keep, as returned by get_data_size.
+        """
+        if Path(self._path).is_file():
+            with open(self._path, "r+b") as f:
+                f.truncate(self._header_size + data_size)
+
+    def append(self, factor_scores: pd.DataFrame) -> None:
+        """
+        Appends rows of factor scores to the file.
+
+        :param factor_scores: pd.DataFrame of factor scores.
+        """
+        if factor_scores.shape[0] == 0:
+            return
+        new_columns = [
+            col for col in factor_scores.columns if col not in self._columns
+        ]
+        if len(new_columns) > 0:
+            if len(self._columns) == 0:
+                new_columns = [
+                    col for col in PRIORITY_COLUMNS if col in new_columns
+                ] + [col for col in new_columns if col not in PRIORITY_COLUMNS]
+            self._columns = self._columns + new_columns
+            if len(self._header) > 0:
+                # Header already written, record the added columns next to it
+                with open(self._schema_path, "w") as f:
+                    json.dump(self._columns, f)
+        write_header = len(self._header) == 0
+        factor_scores.reindex(columns=self._columns).to_csv(
+            self._path, mode="a", header=write_header, index=False
+        )
+        if write_header:
+            self._read_header()
+
+    def finalize(self) -> None:
+        """
+        Rewrites the header line to include columns added since it was written.
+        """
+        if self._header == self._columns:
+            return
+        tmp_path = f"{self._path}.tmp"
+        with open(self._path, "r", newline="") as reader, open(
+            tmp_path, "w", newline=""
+        ) as writer:
+            reader.readline()
+            csv.writer(writer, lineterminator=os.linesep).writerow(self._columns)
+            shutil.copyfileobj(reader, writer)
+        os.replace(tmp_path, self._path)
+        Path(self._schema_path).unlink(missing_ok=True)
+        self._read_header()
+
+
+class SparseFactorScoresWriter:
+    """
+    Appends factor scores to a .npz file written by SparseFactorScores.
+
+    Each appended batch of rows is stored as its own part in a .parts directory
+    next to the file as soon as it is available. Finalizing merges the parts into
+    the .npz file.
+    """
+
+    def __init__(self, factor_scores_path: str) -> None:
+        """
+        :param factor_scores_path: str path to the factor scores .npz file. Rows are
+                                        appended to the file if it already exists.
+        """
+        self._path = str(Path(factor_scores_path))
+        self._parts_dir = Path(f"{self._path}.parts")
+        self._parts = []
+        if self._parts_dir.is_dir():
+            # Not finalized, e.g. an interrupted experiment being resumed
+            self._parts = [
+                (str(part), len(SparseFactorScores.load(str(part))))
+                for part in sorted(self._parts_dir.glob("part_*.npz"))
+            ]
+        elif Path(self._path).is_file():
+            self._add_part(SparseFactorScores.load(self._path))
+
+    def _add_part(self, factor_scores: SparseFactorScores) -> None:
+        self._parts_dir.mkdir(parents=True, exist_ok=True)
+        part = self._parts_dir / f"part_{len(self._parts):06d}.npz"
+        factor_scores.save(str(part))
+        self._parts.append((str(part), len(factor_scores)))
+
+    def get_path(self) -> str:
+        return self._path
+
+    def get_data_size(self) -> int:
+        """
+        :returns: int number of rows written.
+        """
+        return sum(num_rows for _, num_rows in self._parts)
+
+    def truncate(self, data_size: int) -> None:
+        """
+        Drops the rows written after the first data_size rows.
+
+        :param data_size: int number of rows to keep, as returned by get_data_size.
+        """
+        kept = 0
+        for i, (part, num_rows) in enumerate(self._parts):
+            if kept + num_rows > data_size:
+                if kept < data_size:
+                    factor_scores = SparseFactorScores.load(part)
+                    SparseFactorScores(
+                        factor_scores.get_presence()[: data_size - kept],
+                        factor_scores.get_columns(),
+                        factor_scores.get_fields().iloc[: data_size - kept],
+                    ).save(part)
+                    self._parts[i] = (part, data_size - kept)
+                    i = i + 1
+                for dropped, _ in self._parts[i:]:
+                    Path(dropped).unlink(missing_ok=True)
+                self._parts = self._parts[:i]
+                return
+            kept = kept + num_rows
+
+    def append(self, factor_scores: pd.DataFrame) -> None:
+        """
+        Appends rows of factor scores to the file.
+
+        :param factor_scores: pd.DataFrame of factor scores.
+        """
+        if factor_scores.shape[0] == 0:
+            return
+        self._add_part(SparseFactorScores.from_dataframe(factor_scores))
+
+    def finalize(self) -> None:
+        """
+        Merges the parts written so far into the .npz file.
+        """
+        if not self._parts_dir.is_dir():
+            return
+        if len(self._parts) > 0:
+            SparseFactorScores.concat(
+                [SparseFactorScores.load(part) for part, _ in self._parts]
+            ).save(self._path)
+        else:
+            Path(self._path).unlink(missing_ok=True)
+        shutil.rmtree(self._parts_dir, ignore_errors=True)
+        self._parts = []
+
+
+def open_factor_scores_writer(
+    factor_scores_path: str,
+) -> Union[FactorScoresWriter, SparseFactorScoresWriter]:
+    """
+    :returns: SparseFactorScoresWriter for a .npz path, otherwise FactorScoresWriter.
+    """
+    if is_sparse_factor_scores_path(factor_scores_path):
+        return SparseFactorScoresWriter(factor_scores_path)
+    return FactorScoresWriter(factor_scores_path)
@@ -0,0 +1,160 @@
+"""EvolutionaryModelDiscovery: Automated agent rule generation and
+importance evaluation for agent-based models with Genetic Programming.
+Copyright (C) 2018  Chathika Gunaratne
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>."""
+
+from typing import Any, Dict, Optional
+from pathlib import Path
+import hashlib
+import pickle
+import sqlite3
+import threading
+
+from .Util import normalize_rule
+
+
+class FitnessCache:
+    """
+    Stores the fitness and factor presence record of every simulated rule so that
+    rules that have already been simulated are not simulated again.
+
+    Records are keyed by the normalized rule text and a hash of the simulation
+    context (model, setup commands, ticks, objective, etc.). When a cache path
+    is provided records are also persisted to an SQLite database on disk, so that
+    they can be reused by later runs and sessions.
+    """
+
+    def __init__(self, cache_path: str = None, version: str = None) -> None:
+        """
+        :param cache_path: str path to the on disk fitness store. If None, the
+                                cache is only held in memory.
+        :param version: str salt of the cache keys. Records stored under another
+                                version are not reused, change it to invalidate the
+                                cache when something the simulation context hash does
+                                not cover changes, such as data files read by the model.
+        """
+        self._cache_path = None if cache_path is None else str(Path(cache_path))
+        self._version = version
+        self._records = {}
+        self._lock = threading.Lock()
+        self._connection = None
+        self.hits = 0
+        self.misses = 0
+        self._connect()
+
+    def _connect(self) -> None:
+        if self._cache_path is None:
+            return
+        Path(self._cache_path).parent.absolute().mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(
+            self._cache_path, check_same_thread=False, timeout=60
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS fitness (key TEXT PRIMARY KEY, record BLOB)"
+        )
+        self._connection.commit()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Connections and locks cannot be shipped to other processes,
+        # reopen them on the other side instead.
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        state["_lock"] = None
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._connect()
+
+    def __len__(self) -> int:
+        if self._connection is None:
+            return len(self._records)
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM fitness"
+            ).fetchone()[0]
+
+    @staticmethod
+    def make_key(rule: str, context_hash: str, version: str = None) -> str:
+        """
+        Builds the cache key of a rule simulated under a given simulation context.
+
+        :param rule: str compiled rule.
+        :param context_hash: str hash of the simulation context.
+        :param version: str salt of the key, see FitnessCache.
+        :returns: str cache key.
+        """
+        if version is not None:
+            context_hash = f"{version}\n{context_hash}"
+        return hashlib.sha256(
+            f"{context_hash}\n{normalize_rule(rule)}".encode()
+        ).hexdigest()
+
+    def get(self, rule: str, context_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Looks up the record of a previously simulated rule.
+
+        :param rule: str compiled rule.
+        :param context_hash: str hash of the simulation context.
+        :returns: Dict record stored for the rule or None if the rule has not been simulated.
+        """
+        key = self.make_key(rule, context_hash, self._version)
+        with self._lock:
+            record = self._records.get(key)
+            if record is None and self._connection is not None:
+                row = self._connection.execute(
+                    "SELECT record FROM fitness WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    record = pickle.loads(row[0])
+                    self._records[key] = record
+            if record is None:
+                self.misses = self.misses + 1
+                return None
+            self.hits = self.hits + 1
+            return dict(record)
+
+    def put(self, rule: str, context_hash: str, record: Dict[str, Any]) -> None:
+        """
+        Stores the record of a simulated rule.
+
+        :param rule: str compiled rule.
+        :param context_hash: str hash of the simulation context.
+        :param record: Dict fitness and factor presence record of the rule.
+        """
+        key = self.make_key(rule, context_hash, self._version)
+        record = dict(record)
+        with self._lock:
+            self._records[key] = record
+            if self._connection is not None:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO fitness (key, record) VALUES (?, ?)",
+                    (key, pickle.dumps(record)),
+                )
+                self._connection.commit()
+
+    def clear(self) -> None:
+        """
+        Removes all records from the cache, including those on disk.
+        """
+        with self._lock:
+            self._records = {}
+            if self._connection is not None:
+                self._connection.execute("DELETE FROM fitness")
+                self._connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,192 @@
+"""EvolutionaryModelDiscovery: Automated agent rule generation and
+importance evaluation for agent-based models with Genetic Programming.
+Copyright (C) 2018  Chathika Gunaratne
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>."""
+
+from typing import List
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+from sklearn.ensemble import RandomForestRegressor
+
+from .PermutationImportance import get_permutation_importances
+
+
+class ImportanceTracker:
+    """
+    Estimates factor importances while a GP run evolves, to watch the importance
+    ranking of the factors converge and end runs once it is stable.
+
+    After each generation, the random forest is grown with warm_start by
+    trees_per_generation trees fitted on all factor scores so far, keeping the
+    trees of earlier generations instead of retraining the whole forest. Trees
+    are fitted on first order factors, the columns of which are known before
+    evolution starts, unlike factor interactions.
+    """
+
+    def __init__(
+        self,
+        factors: List[str],
+        trees_per_generation: int = 50,
+        tolerance: float = 0.01,
+        stable_generations: int = 3,
+        num_ranked: int = 20,
+        permutation_samples: int = None,
+    ) -> None:
+        """
+        :param factors: List[str] first order factors, such as the measureable factors
+                        of the ModelFactors.
+        :param trees_per_generation: int number of trees added to the forest after each
+                        generation.
+        :param tolerance: float the importance ranking is stable over a generation if
+                        the Spearman rank correlation of the num_ranked most important
+                        factors with the previous generation is at least 1 - tolerance.
+        :param stable_generations: int number of consecutive stable generations after
+                        which the ranking has converged, see is_stable.
+        :param num_ranked: int number of most important factors ranked.
+        :param permutation_samples: int number of sampled rules permutation accuracy
+                        importance is estimated on after each generation. If None,
+                        only Gini importance is estimated.
+        """
+        self._factors = list(factors)
+        self._trees_per_generation = trees_per_generation
+        self._tolerance = tolerance
+        self._stable_generations = stable_generations
+        self._num_ranked = num_ranked
+        self._permutation_samples = permutation_samples
+        self._features = np.empty((0, len(self._factors)))
+        self._fitness = np.empty(0)
+        self._rf = RandomForestRegressor(
+            n_estimators=0,
+            random_state=0,
+            n_jobs=multiprocessing.cpu_count(),
+            bootstrap=False,
+            warm_start=True,
+        )
+        self._history = []
+        self._permutation_history = []
+        self._stable_streak = 0
+
+    def update(self, gen: int, generation_scores: pd.DataFrame) -> None:
+        """
+        Adds the factor scores of a generation and grows the forest.
+
+        :param gen: int generation number.
+        :param generation_scores: pd.DataFrame of the factor scores of the generation.
+        """
+        generation_scores = generation_scores[
+            np.isfinite(generation_scores["Fitness"].astype(float))
+        ]
+        if len(generation_scores) == 0:
+            return
+        features = (
+            generation_scores.reindex(columns=self._factors)
+            .fillna(0)
+            .to_numpy(dtype=float)
+        )
+        self._features = np.vstack([self._features, features])
+        self._fitness = np.concatenate(
+            [self._fitness, generation_scores["Fitness"].to_numpy(dtype=float)]
+        )
+        self._rf.set_params(
+            n_estimators=self._rf.n_estimators + self._trees_per_generation
+        )
+        self._rf.fit(self._features, self._fitness)
+        importances = self._rf.feature_importances_
+        correlation = np.nan
+        if len(self._history) > 0:
+            previous = self._history[-1]["importances"]
+            ranked = np.argsort(importances)[::-1][: self._num_ranked]
+            if len(ranked) < 2 or np.allclose(previous[ranked], importances[ranked]):
+                correlation = 1.0
+            else:
+                correlation = stats.spearmanr(previous[ranked], importances[ranked])[0]
+        if correlation >= 1 - self._tolerance:
+            self._stable_streak = self._stable_streak + 1
+        else:
+            self._stable_streak = 0
+        self._history.append(
+            {
+                "gen": gen,
+                "importances": importances,
+                "correlation": correlation,
+                "rows": len(self._fitness),
+            }
+        )
+        if self._permutation_samples is not None:
+            self._permutation_history.append(
+                (
+                    gen,
+                    get_permutation_importances(
+                        self._rf,
+                        self._features,
+                        self._fitness,
+                        max_samples=self._permutation_samples,
+                        random_state=gen,
+                    ).mean(axis=0),
+                )
+            )
+
+    def is_stable(self) -> bool:
+        """
+        :returns: bool True if the importance ranking has been stable for the last
+                    stable_generations generations.
+        """
+        return self._stable_streak >= self._stable_generations
+
+    def get_num_trees(self) -> int:
+        return len(getattr(self._rf, "estimators_", []))
+
+    def get_gini_importances(self) -> pd.DataFrame:
+        """
+        :returns: pd.DataFrame of the Gini importance of the factors by tree of the
+                    current forest, as FactorImportances.get_gini_importances.
+        """
+        if len(self._history) == 0:
+            return pd.DataFrame(columns=self._factors)
+        GI = pd.DataFrame(
+            data=[tree.feature_importances_ for tree in self._rf.estimators_],
+            columns=self._factors,
+        )
+        return GI[GI.sum().sort_values(ascending=True).index]
+
+    def get_history(self) -> pd.DataFrame:
+        """
+        :returns: pd.DataFrame with one row per generation of the Gini importance of
+                    each factor, the rules trained on (Rows) and the rank correlation
+                    of the most important factors with the previous generation
+                    (Ranking_Correlation).
+        """
+        history = pd.DataFrame(
+            [entry["importances"] for entry in self._history], columns=self._factors
+        )
+        history.insert(
+            0, "Ranking_Correlation", [entry["correlation"] for entry in self._history]
+        )
+        history.insert(0, "Rows", [entry["rows"] for entry in self._history])
+        history.insert(0, "Gen", [entry["gen"] for entry in self._history])
+        return history
+
+    def get_permutation_history(self) -> pd.DataFrame:
+        """
+        :returns: pd.DataFrame with one row per generation of the mean permutation
+                    accuracy importance of each factor, empty unless permutation_samples
+                    is set.
+        """
+        history = pd.DataFrame(
+            [importances for _, importances in self._permutation_history],
+            columns=self._factors,
+        )
+        history.insert(0, "Gen", [gen for gen, _ in self._permutation_history])
+        return history
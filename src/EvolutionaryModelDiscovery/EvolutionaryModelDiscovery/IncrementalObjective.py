@@ -0,0 +1,63 @@
+"""EvolutionaryModelDiscovery: Automated agent rule generation and
+importance evaluation for agent-based models with Genetic Programming.
+Copyright (C) 2018  Chathika Gunaratne
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>."""
+
+from typing import Optional
+
+import pandas as pd
+
+
+class IncrementalObjective:
+    """
+    Objective function that receives simulation measurements while the simulation
+    is running, every chunk_ticks ticks, and can stop hopeless simulations early.
+
+    Subclasses implement __call__, which translates the measurements of a complete
+    simulation into fitness like a plain objective function, and may override update,
+    which is called after every chunk of ticks with the measurements so far. When
+    update returns a fitness value the simulation is stopped and that value is used
+    as its fitness.
+
+    The same object evaluates many simulations concurrently, so update and __call__
+    should not keep per-simulation state on the object.
+    """
+
+    def __init__(self, chunk_ticks: int = 50) -> None:
+        """
+        :param chunk_ticks: int number of ticks simulated between calls to update.
+        """
+        if chunk_ticks < 1:
+            raise ValueError(f"chunk_ticks must be positive, got {chunk_ticks}")
+        self.chunk_ticks = chunk_ticks
+
+    def get_chunk_ticks(self) -> int:
+        return self.chunk_ticks
+
+    def update(self, results: pd.DataFrame) -> Optional[float]:
+        """
+        Inspects the measurements of a running simulation.
+
+        :param results: pd.DataFrame of the simulation results so far, one row per tick.
+        :returns: None to continue the simulation, or the final fitness of the
+                    simulation to stop it early.
+        """
+        return None
+
+    def __call__(self, results: pd.DataFrame) -> float:
+        """
+        :param results: pd.DataFrame of the results of a complete simulation.
+        :returns: fitness of the simulation.
+        """
+        raise NotImplementedError(
+            "IncrementalObjective subclasses must implement __call__."
+        )
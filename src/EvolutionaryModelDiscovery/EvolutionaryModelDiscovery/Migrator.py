@@ -0,0 +1,123 @@
+"""EvolutionaryModelDiscovery: Automated agent rule generation and
+importance evaluation for agent-based models with Genetic Programming.
+Copyright (C) 2018  Chathika Gunaratne
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>."""
+
+from typing import Any, Dict, List, Union
+import queue
+
+from deap import tools
+
+TOPOLOGIES = ["ring", "complete"]
+
+
+def get_migration_targets(
+    topology: Union[str, Dict[int, List[int]]], num_islands: int
+) -> Dict[int, List[int]]:
+    """
+    Resolves a migration topology into the islands each island sends emigrants to.
+
+    :param topology: "ring" (island i sends to island i + 1), "complete" (every island
+                        sends to every other island) or a Dict mapping each island
+                        index to a List of target island indices.
+    :param num_islands: int number of islands.
+    :returns: Dict[int, List[int]] of target islands per island.
+    """
+    if topology == "ring":
+        return {
+            island: [(island + 1) % num_islands]
+            for island in range(num_islands)
+            if num_islands > 1
+        }
+    if topology == "complete":
+        return {
+            island: [target for target in range(num_islands) if target != island]
+            for island in range(num_islands)
+        }
+    if isinstance(topology, dict):
+        for island, targets in topology.items():
+            for target in [island] + list(targets):
+                if not 0 <= target < num_islands:
+                    raise ValueError(
+                        f"Island {target} of migration topology does not exist, "
+                        f"there are {num_islands} islands."
+                    )
+        return {island: list(targets) for island, targets in topology.items()}
+    raise ValueError(
+        f"Unknown migration topology {topology}, expected one of {TOPOLOGIES} or a dict."
+    )
+
+
+class Migrator:
+    """
+    Exchanges individuals between the islands of an island-model genetic program.
+
+    Every migration_interval generations, the best individuals of an island are sent
+    to its target islands and the individuals that have arrived from other islands
+    replace the worst individuals of its population. Islands do not wait for each
+    other, immigrants that arrive later are taken in at the next migration.
+    """
+
+    def __init__(
+        self,
+        island: int,
+        inboxes: List[Any],
+        targets: List[int],
+        migration_interval: int = 5,
+        migration_size: int = 1,
+    ) -> None:
+        """
+        :param island: int index of the island the migrator belongs to.
+        :param inboxes: List of queues, one per island, immigrants are put into.
+        :param targets: List[int] islands the best individuals are sent to.
+        :param migration_interval: int number of generations between migrations.
+        :param migration_size: int number of individuals sent to each target island.
+        """
+        self._island = island
+        self._inboxes = inboxes
+        self._targets = targets
+        self._migration_interval = max(1, migration_interval)
+        self._migration_size = migration_size
+
+    def get_island(self) -> int:
+        return self._island
+
+    def __call__(self, gen: int, population: List[Any]) -> List[Any]:
+        """
+        Migrates individuals if a migration is due at this generation.
+
+        :param gen: int generation the population belongs to.
+        :param population: List of evaluated gp individuals of the island.
+        :returns: List of gp individuals with the worst replaced by immigrants.
+        """
+        if gen % self._migration_interval != 0:
+            return population
+        if self._migration_size > 0 and len(self._targets) > 0:
+            emigrants = tools.selBest(population, self._migration_size)
+            for target in self._targets:
+                self._inboxes[target].put(emigrants)
+        immigrants = []
+        while True:
+            try:
+                immigrants.extend(self._inboxes[self._island].get_nowait())
+            except queue.Empty:
+                break
+        if len(immigrants) == 0:
+            return population
+        immigrants = tools.selBest(immigrants, min(len(immigrants), len(population)))
+        population = list(population)
+        worst = sorted(
+            range(len(population)), key=lambda i: population[i].fitness
+        )
+        for i, immigrant in zip(worst, immigrants):
+            population[i] = immigrant
+        return population
@@ -0,0 +1,209 @@
+"""EvolutionaryModelDiscovery: Automated agent rule generation and
+importance evaluation for agent-based models with Genetic Programming.
+Copyright (C) 2018  Chathika Gunaratne
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>."""
+
+from typing import Any, Dict, List, Tuple
+import copyreg
+import hashlib
+
+from deap import gp
+
+from .Factor import Factor
+from .FactorGenerator import FactorGenerator
+from .PrimitiveSetGenerator import PrimitiveSetGenerator
+from .Util import file_hash
+
+EVALUATION_CLASS_NAME = "EMD_model_evaluation"
+
+# Factor and type classes by factors key, kind and name. Classes are looked up
+# here when unpickled, so that a tree unpickled in another process refers to
+# the same classes as the primitive set of that process.
+_CLASSES = {}
+
+# ModelFactors by factors file hash and return type
+_CACHE = {}
+
+
+class _FactorClass(type):
+    """
+    Metaclass of the factor and type classes built in memory.
+    """
+
+
+def _reduce_factor_class(cls: _FactorClass) -> Tuple[Any, tuple]:
+    return _get_factor_class, cls._emd_spec
+
+
+copyreg.pickle(_FactorClass, _reduce_factor_class)
+
+
+def _get_factor_class(key: str, kind: str, name: str, netlogo_name: str = None) -> type:
+    """
+    Returns the class of a factor ("factor"), of an EMD type ("type") or of the
+    evaluated rule ("evaluation"), creating it on first use.
+
+    :param key: str hash of the factors the class belongs to.
+    :param kind: str kind of class.
+    :param name: str class name, the safe name of the factor or the EMD type.
+    :param netlogo_name: str NetLogo name of a factor.
+    """
+    spec = (key, kind, name, netlogo_name)
+    cls = _CLASSES.get(spec)
+    if cls is not None:
+        return cls
+    if kind == "factor":
+        # NetLogo code of a factor applied to its arguments, such as ( name (a) (b)  )
+        def __init__(self, *args: Any) -> None:
+            self.__name__ = "( {0} {1} ) ".format(
+                netlogo_name, "".join("({0}) ".format(arg) for arg in args)
+            )
+
+    elif kind == "evaluation":
+
+        def __init__(self, nl_string: Any) -> None:
+            self.__name__ = "{0}\n".format(str(nl_string))
+
+    else:
+
+        def __init__(self, nl_string: Any) -> None:
+            self.__name__ = str(nl_string)
+
+    def __str__(self) -> str:
+        return self.__name__
+
+    cls = _FactorClass(
+        name,
+        (object,),
+        {
+            "__init__": __init__,
+            "__str__": __str__,
+            "__repr__": __str__,
+            "__module__": __name__,
+            "_emd_spec": spec,
+        },
+    )
+    _CLASSES[spec] = cls
+    return cls
+
+
+def load_model_factors(factors_file_path: str, return_type: str) -> "ModelFactors":
+    """
+    Parses the factors of an annotated NetLogo model or .nls file. Parsed factors
+    are cached by the hash of the file, so that files already parsed are not
+    parsed again.
+
+    :param factors_file_path: str path to the .nlogo or .nls file with the factors.
+    :param return_type: str EMD type returned by the evolved rule.
+    :returns: ModelFactors of the file.
+    """
+    factors_file_path = str(factors_file_path).replace('"', "").replace("'", "")
+    cache_key = (file_hash(factors_file_path), return_type)
+    model_factors = _CACHE.get(cache_key)
+    if model_factors is None:
+        factor_generator = FactorGenerator()
+        factor_generator.generate(factors_file_path)
+        model_factors = ModelFactors(
+            factor_generator.get_factors(),
+            factor_generator.get_measureable_factors(),
+            factor_generator.get_negative_ops(),
+            factor_generator.get_interactions(),
+            factor_generator.get_commutative(),
+            factor_generator.get_associative(),
+            return_type,
+        )
+        _CACHE[cache_key] = model_factors
+    return model_factors
+
+
+class ModelFactors:
+    """
+    Factors, operators and their typing parsed from an annotated NetLogo model, with
+    the factor classes and DEAP primitive set built in memory.
+
+    ModelFactors are picklable and can be shipped to worker processes, the primitive
+    set is rebuilt from the parsed factors after unpickling.
+    """
+
+    def __init__(
+        self,
+        factors: List[Factor],
+        measureable_factors: List[str],
+        negative_ops: Dict[str, List[int]],
+        interactions: List[str],
+        commutative: List[str],
+        associative: List[str],
+        return_type: str,
+    ) -> None:
+        """
+        :param factors: List[Factor] factors and operators, in order of declaration.
+        :param measureable_factors: List[str] names of the factors that are not operators.
+        :param negative_ops: Dict mapping operator names to the polarity of each parameter.
+        :param interactions: List[str] names of factors annotated @interaction.
+        :param commutative: List[str] names of factors annotated @commutative.
+        :param associative: List[str] names of factors annotated @associative.
+        :param return_type: str EMD type returned by the evolved rule.
+        """
+        self._factors = list(factors)
+        self._return_type = return_type
+        self.classNames = [factor.get_safe_name() for factor in self._factors]
+        self.negativeOps = dict(negative_ops)
+        self.measureable_factors = list(measureable_factors)
+        self.interactions = list(interactions)
+        self.commutative = list(commutative)
+        self.associative = list(associative)
+        self._key = hashlib.sha256(
+            repr(
+                (
+                    [
+                        (
+                            factor.get_name(),
+                            factor.get_parameter_types(),
+                            factor.get_return_type(),
+                        )
+                        for factor in self._factors
+                    ],
+                    return_type,
+                )
+            ).encode()
+        ).hexdigest()
+        self._pset = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state["_pset"] = None
+        return state
+
+    def get_factors(self) -> List[Factor]:
+        return list(self._factors)
+
+    def get_return_type(self) -> str:
+        return self._return_type
+
+    def get_factor_class(self, factor: Factor) -> type:
+        return _get_factor_class(
+            self._key, "factor", factor.get_safe_name(), factor.get_name()
+        )
+
+    def get_type_class(self, type_name: str) -> type:
+        return _get_factor_class(self._key, "type", type_name)
+
+    def get_evaluation_class(self) -> type:
+        return _get_factor_class(self._key, "evaluation", EVALUATION_CLASS_NAME)
+
+    def get_DEAP_primitive_set(self) -> gp.PrimitiveSetTyped:
+        """
+        :returns: gp.PrimitiveSetTyped of the factors, built on first use.
+        """
+        if self._pset is None:
+            self._pset = PrimitiveSetGenerator().generate(self)
+        return self._pset
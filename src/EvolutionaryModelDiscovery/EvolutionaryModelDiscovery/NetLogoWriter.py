@@ -34,6 +34,8 @@ class NetLogoWriter:
         self._EMD_line = -1000
         self._original_model_path = model_path
         self._factors_file_path = model_path
+        self._model_dir = Path(model_path).parent.absolute()
+        self._model_name = Path(model_path).stem
 
         # find EMD entry point
         factors_file_replace = re.compile(
@@ -43,7 +45,8 @@ class NetLogoWriter:
             re.escape("return-type="), re.IGNORECASE
         )
         with open(self._original_model_path, "r") as file_reader:
-            for i, line in enumerate(file_reader):
+            model_lines = file_reader.readlines()
+            for i, line in enumerate(model_lines):
                 if (
                     "@emd" in line.lower()
                     and "@evolvenextline" in line.lower()
@@ -70,6 +73,10 @@ class NetLogoWriter:
         assert (
             self._EMD_line > 0
         ), "No @EMD @EvolveNextLine annotation detected!"
+        # Model is kept as a template around the evolved line so that
+        # rule injected models can be built without re-reading the model file.
+        self._model_prefix = "".join(model_lines[: self._EMD_line])
+        self._model_suffix = "".join(model_lines[self._EMD_line + 1 :])
 
     def get_factors_file_path(self) -> str:
         """
@@ -87,32 +94,40 @@ class NetLogoWriter:
         """
         return self._EMD_return_type
 
+    def get_model_source(self, new_rule: str) -> str:
+        """
+        Builds the source of the model with the new rule injected into the line following
+        the @EvolveNextLine annotation, without touching the filesystem.
+
+        :param new_rule: new rule to be injected into the model.
+        :returns: str NetLogo model source.
+        """
+        return f"{self._model_prefix}{new_rule}{self._model_suffix}"
+
+    def write_model(self, new_rule: str, model_path: str) -> None:
+        """
+        Streams the model with the new rule injected into a model file.
+
+        :param new_rule: new rule to be injected into the model.
+        :param model_path: str path of the model file to write.
+        """
+        with open(model_path, "w") as file:
+            file.write(self._model_prefix)
+            file.write(new_rule)
+            file.write(self._model_suffix)
+
     def inject_new_rule(self, new_rule: str) -> str:
         """
         Injects new rule into the line following the @EvolveNextLine annotation and saves it as a
-        .EMD.nlogo model file.
+        .EMD.nlogo model file next to the original model.
 
         :param new_rule: new rule to be injected into the model.
         :returns: path to modified model file.
         """
-
-        with open(self._original_model_path, "r") as file:
-            data = file.readlines()
-            file.close()
-        dir = Path(self._original_model_path).parent.absolute()
-        model_name = Path(self._original_model_path).stem
         uniq = slugify(uuid.uuid4().hex)
-        rule_injected_model_path = Path(dir, f"{model_name}_{uniq}.EMD.nlogo")
-        rule_injected_model_path.parent.absolute().mkdir(
-            parents=True, exist_ok=True
+        rule_injected_model_path = Path(
+            self._model_dir, f"{self._model_name}_{uniq}.EMD.nlogo"
         )
-        if not (Path.is_file(rule_injected_model_path)):
-            # Model already injected with this rule. Using cached version.
-            if self._EMD_line >= 0:
-                data[self._EMD_line] = new_rule
-                # And write everything to new model file.
-                with open(rule_injected_model_path, "w") as file:
-                    file.writelines(data)
-                    file.flush()
-                    file.close()
+        self._model_dir.mkdir(parents=True, exist_ok=True)
+        self.write_model(new_rule, str(rule_injected_model_path))
         return str(rule_injected_model_path)
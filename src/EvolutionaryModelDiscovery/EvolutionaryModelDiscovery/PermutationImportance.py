@@ -0,0 +1,151 @@
+"""EvolutionaryModelDiscovery: Automated agent rule generation and
+importance evaluation for agent-based models with Genetic Programming.
+Copyright (C) 2018  Chathika Gunaratne
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>."""
+
+from typing import Any, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
+import threading
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+def get_permutation_importances(
+    estimator: Any,
+    features: Union[np.ndarray, pd.DataFrame, sparse.spmatrix],
+    y: Union[np.ndarray, pd.Series],
+    n_iter: int = 10,
+    max_samples: int = None,
+    num_procs: int = None,
+    random_state: int = None,
+    max_workers: int = None,
+) -> np.ndarray:
+    """
+    Calculates permutation accuracy importance of the features of a fitted regressor,
+    as the decrease of its R^2 score when the values of a feature are shuffled.
+
+    Shuffles of every feature in every iteration are scored in parallel by a pool
+    of threads, tree ensembles release the GIL while predicting. Each thread holds
+    one copy of the feature matrix and shuffles a column in place, restoring it
+    once the shuffle is scored, instead of copying the whole matrix per shuffle.
+    Sparse feature matrices are not densified: a thread's copy is held in CSC
+    layout, where shuffling a column only moves the row indices of its nonzeros,
+    so copies take the memory of the nonzeros only.
+
+    :param estimator: fitted scikit-learn regressor.
+    :param features: feature matrix, dense or scipy.sparse.
+    :param y: fitness the estimator predicts.
+    :param n_iter: int number of shuffles of each feature.
+    :param max_samples: int number of rows to randomly subsample the features to.
+                        If None, all rows are used.
+    :param num_procs: int number of threads, defaults to the number of cores.
+    :param random_state: int seed of the row subsample and the shuffles.
+    :param max_workers: int most threads, and so copies of the feature matrix, at a
+                        time, to bound the memory taken by copies of large dense
+                        feature matrices. If None, num_procs threads are used.
+    :returns: np.ndarray of score decreases, one row per iteration and one column
+                per feature.
+    """
+    seed_sequence = np.random.SeedSequence(random_state)
+    subsample_seed, shuffle_seed = seed_sequence.spawn(2)
+    y = np.asarray(y, dtype=np.float64)
+    num_rows, num_features = features.shape
+    rows = None
+    if max_samples is not None and max_samples < num_rows:
+        rows = np.sort(
+            np.random.default_rng(subsample_seed).choice(
+                num_rows, max_samples, replace=False
+            )
+        )
+        y = y[rows]
+        num_rows = max_samples
+    if isinstance(features, pd.DataFrame):
+        features = features.to_numpy()
+    if rows is not None:
+        features = features[rows]
+    # Float32 as trees predict on, sparse features in CSC layout so that their
+    # columns can be shuffled in place
+    if sparse.issparse(features):
+        features = sparse.csc_matrix(features, dtype=np.float32)
+        features.sort_indices()
+    else:
+        features = np.ascontiguousarray(features, dtype=np.float32)
+    base_score = estimator.score(features, y)
+
+    # One seed per shuffle, so that results do not depend on thread scheduling
+    shuffle_seeds = [
+        feature_seed.spawn(n_iter) for feature_seed in shuffle_seed.spawn(num_features)
+    ]
+    copies = threading.local()
+
+    def score_sparse_shuffle(
+        shuffled: sparse.csc_matrix, feature: int, permutation: np.ndarray
+    ) -> float:
+        start, end = features.indptr[feature], features.indptr[feature + 1]
+        # Row i of the shuffled column takes the value of row permutation[i]
+        destinations = np.empty(num_rows, dtype=features.indices.dtype)
+        destinations[permutation] = np.arange(num_rows, dtype=features.indices.dtype)
+        shuffled_rows = destinations[features.indices[start:end]]
+        order = np.argsort(shuffled_rows)
+        try:
+            shuffled.indices[start:end] = shuffled_rows[order]
+            shuffled.data[start:end] = features.data[start:end][order]
+            return estimator.score(shuffled, y)
+        finally:
+            shuffled.indices[start:end] = features.indices[start:end]
+            shuffled.data[start:end] = features.data[start:end]
+
+    def score_shuffle(shuffle: Tuple[int, int]) -> float:
+        feature, iteration = shuffle
+        if not hasattr(copies, "features"):
+            copies.features = features.copy()
+        rng = np.random.default_rng(shuffle_seeds[feature][iteration])
+        permutation = rng.permutation(num_rows)
+        if sparse.issparse(features):
+            return base_score - score_sparse_shuffle(
+                copies.features, feature, permutation
+            )
+        shuffled = copies.features
+        column = features[:, feature]
+        try:
+            shuffled[:, feature] = column[permutation]
+            return base_score - estimator.score(shuffled, y)
+        finally:
+            shuffled[:, feature] = column
+
+    if num_procs is None:
+        num_procs = multiprocessing.cpu_count()
+    if max_workers is not None:
+        num_procs = min(num_procs, max_workers)
+    # Parallelism is across shuffles, predictions run on a single thread each
+    n_jobs = getattr(estimator, "n_jobs", None)
+    if n_jobs is not None:
+        estimator.set_params(n_jobs=1)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, num_procs)) as executor:
+            decreases = list(
+                executor.map(
+                    score_shuffle,
+                    [
+                        (feature, iteration)
+                        for iteration in range(n_iter)
+                        for feature in range(num_features)
+                    ],
+                )
+            )
+    finally:
+        if n_jobs is not None:
+            estimator.set_params(n_jobs=n_jobs)
+    return np.array(decreases).reshape(n_iter, num_features)
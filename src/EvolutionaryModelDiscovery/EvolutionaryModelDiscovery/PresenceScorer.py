@@ -0,0 +1,154 @@
+"""EvolutionaryModelDiscovery: Automated agent rule generation and
+importance evaluation for agent-based models with Genetic Programming.
+Copyright (C) 2018  Chathika Gunaratne
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>."""
+
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+
+class PresenceScorer:
+    """
+    Scores factor and factor interaction presence of gp trees in a single pass.
+
+    The primitive set of the ModelFactors is translated once into tables indexed by
+    node code: arity, measurable factor column, interaction flag and the polarity
+    of each parameter of negative operators. Scoring a tree then walks it with
+    an integer stack, adding the polarity of every measurable factor to its column
+    of a NumPy vector. Factor interactions, whose names depend on the subtree, are
+    counted in a Dict.
+    """
+
+    def __init__(self, model_factors: "EvolutionaryModelDiscovery.ModelFactors") -> None:
+        """
+        :param model_factors: ModelFactors parsed from the model by EMD.
+        """
+        pset = model_factors.get_DEAP_primitive_set()
+        self._factors = list(model_factors.measureable_factors)
+        factor_columns = {factor: i for i, factor in enumerate(self._factors)}
+        interactions = set(model_factors.interactions)
+        self._codes = {}
+        self._arity = []
+        self._columns = []
+        self._is_interaction = []
+        self._signs = []
+        nodes = [
+            node
+            for nodes in list(pset.primitives.values()) + list(pset.terminals.values())
+            for node in nodes
+        ]
+        for node in nodes:
+            if node.name in self._codes:
+                continue
+            self._codes[node.name] = len(self._arity)
+            self._arity.append(node.arity)
+            self._columns.append(factor_columns.get(node.name, -1))
+            self._is_interaction.append(node.name in interactions)
+            self._signs.append(model_factors.negativeOps.get(node.name))
+
+    def get_factors(self) -> List[str]:
+        """
+        :returns: List[str] measurable factors, in the order of the score vector.
+        """
+        return self._factors
+
+    def score(
+        self, individual: List[Any], out: np.ndarray = None
+    ) -> Tuple[np.ndarray, Dict[str, int]]:
+        """
+        Scores factor and factor interaction presence as coefficient of the rule.
+
+        :param individual: gp tree in prefix order, such as a DEAP PrimitiveTree.
+        :param out: np.ndarray to write the measurable factor scores into, allocated
+                        if not given.
+        :returns: Tuple of the np.ndarray of measurable factor scores and the Dict
+                        mapping factor interaction name to presence score.
+        """
+        if out is None:
+            out = np.zeros(len(self._factors), dtype=np.int64)
+        else:
+            out[:] = 0
+        arity = self._arity
+        columns = self._columns
+        is_interaction = self._is_interaction
+        signs = self._signs
+        names = [node.name for node in individual]
+        codes = [self._codes[name] for name in names]
+        interactions = {}
+        # Nodes being processed, by code, parameters found so far and polarity
+        stack_codes = [codes[0]]
+        stack_params = [0]
+        stack_polarities = [1]
+        interaction_start = -1
+        interaction_root = -1
+        polarity = 1
+        for i in range(1, len(codes)):
+            code = codes[i]
+            if interaction_start < 0:
+                parent_signs = signs[stack_codes[-1]]
+                if parent_signs is not None:
+                    polarity = stack_polarities[-1] * parent_signs[stack_params[-1]]
+                if columns[code] >= 0:
+                    out[columns[code]] += polarity
+                if is_interaction[code]:
+                    interaction_start = i
+                    interaction_root = len(stack_codes)
+            stack_params[-1] += 1
+            if arity[code] > 0:
+                stack_codes.append(code)
+                stack_params.append(0)
+                stack_polarities.append(polarity)
+                continue
+            # Terminal found, pop the parents it completes
+            while stack_params[-1] == arity[stack_codes[-1]]:
+                stack_codes.pop()
+                stack_params.pop()
+                stack_polarities.pop()
+                if len(stack_codes) == 0:
+                    break
+                polarity = stack_polarities[-1]
+                if len(stack_codes) == interaction_root:
+                    # Interactions are named by the names of their subtree nodes
+                    key = str(names[interaction_start : i + 1])
+                    interactions[key] = interactions.get(key, 0) + polarity
+                    interaction_start = -1
+                    interaction_root = -1
+                    polarity = 1
+        return out, interactions
+
+    def score_batch(
+        self, individuals: List[List[Any]]
+    ) -> Tuple[np.ndarray, List[Dict[str, int]]]:
+        """
+        Scores factor and factor interaction presence of a whole population.
+
+        :param individuals: List of gp trees.
+        :returns: Tuple of the np.ndarray of measurable factor scores, one row per
+                        individual, and the List of factor interaction scores Dicts.
+        """
+        scores = np.zeros((len(individuals), len(self._factors)), dtype=np.int64)
+        interactions = [
+            self.score(individual, scores[row])[1]
+            for row, individual in enumerate(individuals)
+        ]
+        return scores, interactions
+
+    def to_dict(
+        self, scores: np.ndarray, interactions: Dict[str, int]
+    ) -> Dict[str, int]:
+        """
+        :returns: Dict[str, int] mapping factor/factor-interaction name to presence score.
+        """
+        presence = dict(zip(self._factors, scores.tolist()))
+        presence.update(interactions)
+        return presence
@@ -12,61 +12,50 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>."""
 
-from .Util import *
+from deap import gp
 
 
 class PrimitiveSetGenerator:
-
-    model_factor_path = ""
-
     def __init__(self):
         """
-        Responsible for generating the genetic program primitive set required by 
-        deap and writing it to ModelFactors.py using the factor and operator classes 
-        already written by FactorGenerator.
+        Responsible for building the genetic program primitive set required by
+        deap from the factor and operator classes of ModelFactors.
 
         """
-        self.model_factor_path = get_model_factors_path()
 
-    def generate(self, factors, final_return_type):
-        with open(self.model_factor_path, "a+") as f:
-            f.write("\nclass EMD_model_evaluation:")
-            f.write('\n\t__name__ = ""')
-            f.write("\n\tdef __init__(self, nl_string):")
-            f.write('\n\t\tself.__name__ = "{0}\\n".format(str(nl_string))')
-            f.write("\n\tdef __str__(self):")
-            f.write("\n\t\treturn self.__name__")
-            f.write("\n\tdef __repr__(self):")
-            f.write("\n\t\treturn self.__name__")
-            f.write("\nfrom deap import gp")
-            f.write("\ndef get_DEAP_primitive_set():")
-            f.write(
-                '\n\tpset = gp.PrimitiveSetTyped("main", [], EMD_model_evaluation)'
-            )
-            for factor in factors:
-                parameter_string = " [ "
-                for parameter_type in factor.get_parameter_types():
-                    parameter_string = parameter_string + "{0},".format(
-                        parameter_type
-                    )
-                parameter_string = "{0} ]".format(parameter_string[:-1])
-                if len(factor.get_parameter_types()) == 0:
-                    f.write(
-                        '\n\tpset.addTerminal({1}({0}()), {1}, name = "{0}")'.format(
-                            factor.get_safe_name(), factor.get_return_type()
-                        )
-                    )
-                else:
-                    f.write(
-                        '\n\tpset.addPrimitive({0}, {1}, {2}, name = "{0}")'.format(
-                            factor.get_safe_name(),
-                            parameter_string,
-                            factor.get_return_type(),
-                        )
-                    )
-            f.write(
-                "\n\tpset.addPrimitive(EMD_model_evaluation, [{0}], EMD_model_evaluation)".format(
-                    final_return_type
+    def generate(
+        self, model_factors: "EvolutionaryModelDiscovery.ModelFactors"
+    ) -> gp.PrimitiveSetTyped:
+        """
+        :param model_factors: ModelFactors to build the primitive set of.
+        :returns: gp.PrimitiveSetTyped with a terminal per factor without parameters,
+                    a primitive per factor with parameters and the rule evaluation
+                    primitive as root.
+        """
+        evaluation_class = model_factors.get_evaluation_class()
+        pset = gp.PrimitiveSetTyped("main", [], evaluation_class)
+        for factor in model_factors.get_factors():
+            factor_class = model_factors.get_factor_class(factor)
+            return_class = model_factors.get_type_class(factor.get_return_type())
+            if len(factor.get_parameter_types()) == 0:
+                pset.addTerminal(
+                    return_class(factor_class()),
+                    return_class,
+                    name=factor.get_safe_name(),
+                )
+            else:
+                pset.addPrimitive(
+                    factor_class,
+                    [
+                        model_factors.get_type_class(parameter_type)
+                        for parameter_type in factor.get_parameter_types()
+                    ],
+                    return_class,
+                    name=factor.get_safe_name(),
                 )
-            )
-            f.write("\n\treturn pset")
+        pset.addPrimitive(
+            evaluation_class,
+            [model_factors.get_type_class(model_factors.get_return_type())],
+            evaluation_class,
+        )
+        return pset
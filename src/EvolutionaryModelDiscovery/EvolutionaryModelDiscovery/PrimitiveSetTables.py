@@ -0,0 +1,109 @@
+"""EvolutionaryModelDiscovery: Automated agent rule generation and
+importance evaluation for agent-based models with Genetic Programming.
+Copyright (C) 2018  Chathika Gunaratne
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>."""
+
+from typing import Any, List, Tuple
+import weakref
+
+from deap import gp
+
+_TABLES = weakref.WeakKeyDictionary()
+
+
+def get_primitive_set_tables(pset: gp.PrimitiveSetTyped) -> "PrimitiveSetTables":
+    """
+    :returns: PrimitiveSetTables of the primitive set, rebuilt if primitives or
+                terminals were added since they were last built.
+    """
+    tables = _TABLES.get(pset)
+    if tables is None or not tables.is_current():
+        tables = PrimitiveSetTables(pset)
+        _TABLES[pset] = tables
+    return tables
+
+
+class PrimitiveSetTables:
+    """
+    Type-reachability tables of a strongly typed primitive set.
+
+    For an EMD type and a window [low, high] of leaf depths, relative to a node of
+    that type, the tables tell whether a subtree of that type can be closed with
+    all of its leaves inside the window, and which primitives and terminals can
+    start such a subtree. Entries are computed on first use and kept, so that
+    tree generation can pick only nodes that lead to a valid tree.
+    """
+
+    def __init__(self, pset: gp.PrimitiveSetTyped) -> None:
+        self._pset = pset
+        self._version = (pset.prims_count, pset.terms_count)
+        self._candidates = {}
+
+    def is_current(self) -> bool:
+        return self._version == (self._pset.prims_count, self._pset.terms_count)
+
+    def is_feasible(self, type_: Any, low: int, high: int) -> bool:
+        """
+        :returns: bool True if a subtree of type_ can have all of its leaves at
+                    depths between low and high below its root.
+        """
+        terminals, primitives = self.get_candidates(type_, low, high)
+        return len(terminals) > 0 or len(primitives) > 0
+
+    def get_candidates(
+        self, type_: Any, low: int, high: int
+    ) -> Tuple[List[Any], List[gp.Primitive]]:
+        """
+        :returns: Tuple of the List of terminals and the List of primitives of type_
+                    that can start a subtree with all of its leaves at depths between
+                    low and high below its root.
+        """
+        low = max(0, low)
+        key = (type_, low, high)
+        candidates = self._candidates.get(key)
+        if candidates is None:
+            terminals = []
+            primitives = []
+            if high >= 0:
+                if low == 0:
+                    terminals = list(self._pset.terminals[type_])
+                if high >= 1:
+                    primitives = [
+                        prim
+                        for prim in self._pset.primitives[type_]
+                        if all(
+                            self.is_feasible(arg, low - 1, high - 1)
+                            for arg in prim.args
+                        )
+                    ]
+            candidates = (terminals, primitives)
+            self._candidates[key] = candidates
+        return candidates
+
+    def get_heights(self, type_: Any, min_: int, max_: int) -> Tuple[int, List[int]]:
+        """
+        Finds the heights between min_ and max_ trees of type_ can be generated with.
+        If no tree of type_ can have all of its leaves at depth min_ or deeper, the
+        lowest leaf depth is relaxed towards the root until one can.
+
+        :returns: Tuple of the lowest leaf depth and the List of heights, empty if
+                    no tree of type_ fits within max_.
+        """
+        for low in range(min_, -1, -1):
+            heights = [
+                height
+                for height in range(max(low, min_), max_ + 1)
+                if self.is_feasible(type_, low, height)
+            ]
+            if len(heights) > 0:
+                return low, heights
+        return 0, []
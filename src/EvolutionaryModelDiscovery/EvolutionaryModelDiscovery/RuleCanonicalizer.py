@@ -0,0 +1,73 @@
+"""EvolutionaryModelDiscovery: Automated agent rule generation and
+importance evaluation for agent-based models with Genetic Programming.
+Copyright (C) 2018  Chathika Gunaratne
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>."""
+
+from typing import Any, Iterable, List
+
+
+class RuleCanonicalizer:
+    """
+    Rewrites gp trees into a normal form, so that rules that only differ in the
+    argument order of @commutative factors or in the nesting of @associative
+    factors get the same canonical form.
+
+    Nested applications of an associative factor are flattened into a single
+    application, and the arguments of a commutative factor are sorted.
+    """
+
+    def __init__(
+        self, commutative: Iterable[str] = (), associative: Iterable[str] = ()
+    ) -> None:
+        """
+        :param commutative: names of factors whose arguments can be reordered.
+        :param associative: names of factors whose nested applications can be regrouped.
+        """
+        self._commutative = set(commutative)
+        self._associative = set(associative)
+
+    def is_identity(self) -> bool:
+        """
+        :returns: bool True if no factor is commutative or associative, so that
+                    trees are already in normal form.
+        """
+        return len(self._commutative) == 0 and len(self._associative) == 0
+
+    def canonicalize(self, individual: List[Any]) -> str:
+        """
+        :param individual: gp tree in prefix order, such as a DEAP PrimitiveTree.
+        :returns: str canonical form of the tree.
+        """
+        # Walk the prefix list backwards, so the arguments of a node are on the
+        # stack, first argument on top, by the time the node is reached.
+        stack = []
+        for node in reversed(individual):
+            if node.arity == 0:
+                stack.append((node.name, None))
+                continue
+            args = []
+            for _ in range(node.arity):
+                arg_name, arg_args = stack.pop()
+                if node.name in self._associative and arg_name == node.name:
+                    args.extend(arg_args)
+                else:
+                    args.append(self._to_string(arg_name, arg_args))
+            if node.name in self._commutative:
+                args.sort()
+            stack.append((node.name, args))
+        return self._to_string(*stack.pop())
+
+    @staticmethod
+    def _to_string(name: str, args: List[str]) -> str:
+        if args is None:
+            return name
+        return "{0}({1})".format(name, ",".join(args))
@@ -12,8 +12,14 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>."""
 
-from typing import Callable, Any, List, Dict
+from typing import Callable, Any, List, Dict, Union
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import functools
+import math
 import multiprocessing
+import os
+import pickle
 import random
 from inspect import isclass
 
@@ -24,12 +30,30 @@ import numpy as np
 from .Util import *
 from .ABMEvaluator import (
     set_objective_function,
+    get_objective_function,
     set_model_factors,
     set_model_init_data,
     set_netlogo_writer,
+    set_fitness_cache,
+    get_fitness_cache,
+    set_workspace_pool,
+    set_replicate_procs,
+    set_racing,
+    get_racing,
+    set_racing_reference,
+    score_population_presence,
+    get_individual_rule_key,
+    get_equivalent_record,
     evaluate,
 )
+from .FitnessCache import FitnessCache
+from .WorkspacePool import WorkspacePool
+from .FactorScoreAccumulator import FactorScoreAccumulator
 from .NetLogoWriter import NetLogoWriter
+from .SurrogateModel import SurrogateModel
+from .PrimitiveSetTables import get_primitive_set_tables
+
+REEVALUATION_POLICIES = ["keep", "resample", "reevaluate"]
 
 
 class SimpleDEAPGP:
@@ -43,8 +67,8 @@ class SimpleDEAPGP:
         Genetic program that handles the evolution of the agent-based model rule.
 
         :param model_init_data: Dict of model initialization properties.
-        :param ModelFactors: ModelFactors module generated by EvolutionaryModelDiscovery 
-                                by parsing the annotated NetLogo model files
+        :param ModelFactors: ModelFactors parsed by EvolutionaryModelDiscovery from the
+                                annotated NetLogo model files
         """
 
         self._mutation_rate = 0.2
@@ -52,6 +76,18 @@ class SimpleDEAPGP:
         self._generations = 10
         self._run_count = 1
         self._pop_init_size = 5
+        self._workspace_max_uses = 100
+        self._checkpoint_path = None
+        self._checkpoint_interval = 1
+        self._depth = None
+        self._is_minimize = True
+        self._steady_state = False
+        self._multi_fidelity = None
+        self._surrogate = None
+        self._surrogate_model = None
+        self._reevaluation = "keep"
+        self._collapse_duplicates = True
+        self._model_init_data = model_init_data
         set_model_init_data(model_init_data)
         set_model_factors(ModelFactors)
         set_netlogo_writer(netlogo_writer)
@@ -123,7 +159,172 @@ class SimpleDEAPGP:
     def set_objective_function(self, objective_function: Callable) -> None:
         set_objective_function(objective_function)
 
+    def set_fitness_cache(self, fitness_cache: FitnessCache) -> None:
+        set_fitness_cache(fitness_cache)
+
+    def set_workspace_max_uses(self, workspace_max_uses: int) -> None:
+        self._workspace_max_uses = workspace_max_uses
+
+    def set_checkpoint(
+        self, checkpoint_path: str, checkpoint_interval: int = 1
+    ) -> None:
+        """
+        Enables snapshots of the evolution state that evolve() can be resumed from.
+
+        :param checkpoint_path: str path of the snapshot file, overwritten by each snapshot.
+                                    None disables snapshots.
+        :param checkpoint_interval: int number of generations between snapshots. A snapshot
+                                    of the last generation is always taken.
+        """
+        self._checkpoint_path = checkpoint_path
+        self._checkpoint_interval = max(1, checkpoint_interval)
+
+    def set_racing(
+        self,
+        initial_replicates: int = None,
+        top_fraction: float = 0.25,
+        confidence: float = 0.95,
+    ) -> None:
+        """
+        Enables replicate racing. Replicates are simulated in batches of
+        initial_replicates, and a rule gets no further replicates once its fitness
+        so far, aggregated over the replicates run like its final fitness, shows
+        with the given confidence that it cannot reach the top_fraction of the
+        current population. The number of replicates each rule was simulated with
+        is recorded in a Replicates factor scores column.
+
+        :param initial_replicates: int number of replicates per batch, at least 2.
+                                    None disables racing.
+        :param top_fraction: float fraction of the population a rule must be able to
+                                    reach to be simulated further.
+        :param confidence: float confidence of the check that ends a race.
+        """
+        if initial_replicates is None:
+            set_racing(None)
+            return
+        if initial_replicates < 2:
+            raise ValueError(
+                f"Racing needs at least 2 initial replicates, got {initial_replicates}"
+            )
+        set_racing(
+            {
+                "initial_replicates": initial_replicates,
+                "top_fraction": top_fraction,
+                "confidence": confidence,
+            }
+        )
+
+    def set_multi_fidelity(
+        self, ticks_fraction: float = None, promote_fraction: float = 0.5
+    ) -> None:
+        """
+        Enables multi-fidelity evaluation. Every generation, the individuals are first
+        simulated for ticks_fraction of ticks_to_run, and only the promote_fraction
+        with the best low-fidelity fitness are simulated for the full ticks_to_run.
+        Individuals that are not promoted get the worst fitness among the promoted
+        individuals of their generation for selection only. They are left out of the
+        factor scores, the statistics, the hall of fame and the racing reference, and
+        counted in the "unsimulated" logbook column.
+
+        :param ticks_fraction: float fraction of ticks_to_run simulated for pre-screening.
+                                    None disables multi-fidelity evaluation.
+        :param promote_fraction: float fraction of each generation promoted to full
+                                    length simulations.
+        """
+        if ticks_fraction is None:
+            self._multi_fidelity = None
+            return
+        if not 0 < ticks_fraction < 1:
+            raise ValueError(
+                f"ticks_fraction must be between 0 and 1, got {ticks_fraction}"
+            )
+        if self._model_init_data["ticks_to_run"] < 0:
+            raise ValueError(
+                "Multi-fidelity evaluation needs a positive ticks_to_run."
+            )
+        self._multi_fidelity = {
+            "ticks_fraction": ticks_fraction,
+            "promote_fraction": promote_fraction,
+        }
+
+    def set_surrogate(
+        self,
+        simulate_fraction: float = None,
+        exploration_fraction: float = 0.1,
+        min_samples: int = 50,
+    ) -> None:
+        """
+        Enables surrogate pre-screening. Once min_samples rules have been simulated,
+        a random forest regressor trained on their factor presence scores predicts the
+        fitness of each generation's individuals, retrained after every generation.
+        Only the simulate_fraction with the best predicted fitness, plus a random
+        exploration_fraction of the rest, are simulated. The other individuals keep
+        their predicted fitness for selection only. They are left out of the factor
+        scores, the statistics, the hall of fame and the racing reference, and
+        counted in the "unsimulated" logbook column. Simulated individuals get a
+        Predicted_Fitness column.
+
+        :param simulate_fraction: float fraction of each generation simulated. None
+                                    disables surrogate pre-screening.
+        :param exploration_fraction: float fraction of the individuals not predicted
+                                    to be among the best that are simulated anyway.
+        :param min_samples: int number of simulated rules before predictions are used.
+        """
+        if simulate_fraction is None:
+            self._surrogate = None
+            return
+        if not 0 < simulate_fraction <= 1:
+            raise ValueError(
+                f"simulate_fraction must be between 0 and 1, got {simulate_fraction}"
+            )
+        self._surrogate = {
+            "simulate_fraction": simulate_fraction,
+            "exploration_fraction": exploration_fraction,
+            "min_samples": min_samples,
+        }
+
+    def set_steady_state(self, steady_state: bool) -> None:
+        """
+        Switches between generational evolution and asynchronous steady-state
+        evolution. In steady-state evolution a new offspring is bred from the current
+        population and submitted for evaluation as soon as an evaluation worker frees
+        up, and each evaluated offspring replaces the worst individual of the
+        population. Every population size evaluations count as one generation, so
+        the number of evaluations is the same in both modes.
+
+        :param steady_state: bool True for steady-state evolution.
+        """
+        self._steady_state = steady_state
+
+    def set_reevaluation(
+        self, reevaluation: str = "keep", collapse_duplicates: bool = True
+    ) -> None:
+        """
+        Sets what happens to offspring that were neither crossed over nor mutated,
+        and so are clones of an already evaluated individual.
+
+        :param reevaluation: str "keep" reuses the fitness of the clone. "resample"
+                                simulates the clone again and averages the fitness
+                                over all its simulations, for noisy models. "reevaluate"
+                                simulates the clone again and replaces its fitness.
+                                Clones are recorded in the factor scores under every
+                                policy, kept clones with their kept fitness and a Kept
+                                column. With a fitness cache, resampling and
+                                reevaluating reuse the cached fitness.
+        :param collapse_duplicates: bool True to simulate identical or equivalent
+                                trees (see get_rule_key) that are evaluated together
+                                only once and share the result.
+        """
+        if reevaluation not in REEVALUATION_POLICIES:
+            raise ValueError(
+                f"Unknown reevaluation policy {reevaluation}, expected one of "
+                f"{REEVALUATION_POLICIES}."
+            )
+        self._reevaluation = reevaluation
+        self._collapse_duplicates = collapse_duplicates
+
     def set_depth(self, min: int, max: int) -> None:
+        self._depth = (min, max)
         self._toolbox.register(
             "expr_init", genGrow, pset=self._pset, min_=min, max_=max
         )
@@ -132,6 +333,7 @@ class SimpleDEAPGP:
         )
 
     def set_is_minimize(self, is_minimize: bool):
+        self._is_minimize = is_minimize
         if is_minimize:
             self._toolbox.register(
                 "individual",
@@ -150,8 +352,65 @@ class SimpleDEAPGP:
             "population", tools.initRepeat, list, self._toolbox.individual
         )
 
+    def get_config(self) -> Dict[str, Any]:
+        """
+        Returns the settings of the genetic program, including the objective function
+        and fitness cache, so that an equivalent genetic program can be set up elsewhere,
+        e.g. in another process. Snapshot settings are not included.
+
+        :returns: Dict of settings accepted by set_config.
+        """
+        return {
+            "mutation_rate": self._mutation_rate,
+            "crossover_rate": self._crossover_rate,
+            "generations": self._generations,
+            "population_size": self._pop_init_size,
+            "depth": self._depth,
+            "is_minimize": self._is_minimize,
+            "workspace_max_uses": self._workspace_max_uses,
+            "steady_state": self._steady_state,
+            "multi_fidelity": self._multi_fidelity,
+            "surrogate": self._surrogate,
+            "reevaluation": self._reevaluation,
+            "collapse_duplicates": self._collapse_duplicates,
+            "racing": get_racing(),
+            "objective_function": get_objective_function(),
+            "fitness_cache": get_fitness_cache(),
+        }
+
+    def set_config(self, config: Dict[str, Any]) -> None:
+        """
+        Applies settings returned by get_config.
+
+        :param config: Dict of genetic program settings.
+        """
+        self.set_mutation_rate(config["mutation_rate"])
+        self.set_crossover_rate(config["crossover_rate"])
+        self.set_generations(config["generations"])
+        self.set_population_size(config["population_size"])
+        if config["depth"] is not None:
+            self.set_depth(*config["depth"])
+        self.set_is_minimize(config["is_minimize"])
+        self.set_workspace_max_uses(config["workspace_max_uses"])
+        self.set_steady_state(config["steady_state"])
+        self._multi_fidelity = config["multi_fidelity"]
+        self._surrogate = config["surrogate"]
+        self.set_reevaluation(config["reevaluation"], config["collapse_duplicates"])
+        set_racing(config["racing"])
+        self.set_objective_function(config["objective_function"])
+        self.set_fitness_cache(config["fitness_cache"])
+
     def evolve(
-        self, num_procs: int = multiprocessing.cpu_count(), verbose=__debug__
+        self,
+        num_procs: int = multiprocessing.cpu_count(),
+        verbose=__debug__,
+        replicate_procs: int = 1,
+        generation_callback: Callable = None,
+        resume_from: Union[str, Dict[str, Any]] = None,
+        checkpoint_metadata: Callable = None,
+        migrate: Callable = None,
+        low_fidelity_callback: Callable = None,
+        stop_condition: Callable = None,
     ):
         """
         Chathika: made logging, stat collection, and multiprocessing related
@@ -162,6 +421,25 @@ class SimpleDEAPGP:
 
         :param verbose: Whether or not to log the statistics.
         :param num_procs: number of processes.
+        :param replicate_procs: number of replicates of each individual simulated
+                    concurrently. The num_procs available workspaces are split
+                    into num_procs // replicate_procs concurrent individuals, each
+                    running up to replicate_procs replicates at a time.
+        :param generation_callback: Callable called with the generation number and
+                    a pandas dataframe of the factor scores of that generation
+                    as soon as each generation has been evaluated.
+        :param resume_from: path to, or state loaded by load_checkpoint from, a
+                    snapshot taken by set_checkpoint to continue evolution from.
+        :param checkpoint_metadata: Callable returning a dict stored with each
+                    snapshot under "metadata".
+        :param migrate: Callable called with the generation number and the evaluated
+                    population after each generation, returning the population with
+                    individuals exchanged with other islands, see Migrator.
+        :param low_fidelity_callback: Callable called with the generation number and a
+                    pandas dataframe of the low-fidelity factor scores of that
+                    generation, with a Promoted column, see set_multi_fidelity.
+        :param stop_condition: Callable called with the generation number after each
+                    generation, ending evolution early when it returns True.
         :returns: The final population
         :returns: A class:`~deap.tools.Logbook` with the statistics of the
                 evolution
@@ -207,41 +485,104 @@ class SimpleDEAPGP:
         .. [Back2000] Back, Fogel and Michalewicz, "Evolutionary Computation 1 :
         Basic Algorithms and Operators", 2000.
         """
-        population = self._toolbox.population(n=self._pop_init_size)
-        logbook = tools.Logbook()
-        logbook.header = ["gen", "nevals"] + (
-            self._stats.fields if self._stats else []
+        if self._steady_state and self._multi_fidelity is not None:
+            raise ValueError(
+                "Multi-fidelity evaluation is not supported in steady-state evolution."
+            )
+        if self._steady_state and self._surrogate is not None:
+            raise ValueError(
+                "Surrogate pre-screening is not supported in steady-state evolution."
+            )
+        self._surrogate_model = (
+            None
+            if self._surrogate is None
+            else SurrogateModel(min_samples=self._surrogate["min_samples"])
         )
-        # Evaluate the individuals with an invalid fitness
-        invalid_ind = [ind for ind in population if not ind.fitness.valid]
-        factorScores = pd.DataFrame()
         num_procs = multiprocessing.cpu_count() if num_procs < 1 else num_procs
+        replicate_procs = min(max(1, replicate_procs), num_procs)
+        individual_procs = max(1, num_procs // replicate_procs)
+        # Workspaces are shared by all evaluations of this evolution
+        workspace_pool = WorkspacePool(
+            individual_procs * replicate_procs, self._workspace_max_uses
+        )
+        set_workspace_pool(workspace_pool)
+        set_replicate_procs(replicate_procs)
+        try:
+            if self._steady_state:
+                return self._evolve_steady_state(
+                    individual_procs,
+                    verbose,
+                    generation_callback,
+                    resume_from,
+                    checkpoint_metadata,
+                    migrate,
+                    stop_condition,
+                )
+            return self._evolve(
+                individual_procs,
+                verbose,
+                generation_callback,
+                resume_from,
+                checkpoint_metadata,
+                migrate,
+                low_fidelity_callback,
+                stop_condition,
+            )
+        finally:
+            set_racing_reference(None, self._is_minimize)
+            set_workspace_pool(None)
+            set_replicate_procs(1)
+            workspace_pool.close()
 
-        with multiprocessing.pool.ThreadPool(num_procs) as pool:
-            results = list(pool.imap(evaluate, invalid_ind))
-        fitnesses = []
-        factorScores = pd.DataFrame()
-        for result in results:
-            fitnesses.append(result.Fitness)
-            fs = result
-            fs["Gen"] = 0
-            fs["Fitness"] = fs.Fitness[0]
-            factorScores = factorScores.append(
-                fs, ignore_index=True, sort=False
+    def _evolve(
+        self,
+        num_procs: int,
+        verbose: bool,
+        generation_callback: Callable,
+        resume_from: Union[str, Dict[str, Any]],
+        checkpoint_metadata: Callable,
+        migrate: Callable = None,
+        low_fidelity_callback: Callable = None,
+        stop_condition: Callable = None,
+    ):
+        if resume_from is not None:
+            state = self._resume(resume_from, verbose)
+            population = state["population"]
+            logbook = state["logbook"]
+            factor_scores = state["factor_scores"]
+            start_gen = state["gen"] + 1
+            self._update_racing_reference(population)
+            if self._surrogate_model is not None:
+                self._train_surrogate(factor_scores)
+        else:
+            population = self._toolbox.population(n=self._pop_init_size)
+            logbook = self._new_logbook()
+            # Evaluate the individuals with an invalid fitness
+            invalid_ind = [ind for ind in population if not ind.fitness.valid]
+            factor_scores = FactorScoreAccumulator()
+            cached = self._evaluate_individuals(
+                invalid_ind, 0, num_procs, factor_scores, low_fidelity_callback
             )
-        for ind, fit in zip(invalid_ind, fitnesses):
-            ind.fitness.values = fit
+            if generation_callback is not None:
+                generation_callback(0, factor_scores.to_dataframe())
 
-        if self.hof is not None:
-            self.hof.update(population)
+            if self.hof is not None:
+                self.hof.update(self._get_simulated(population))
+            self._update_racing_reference(population)
 
-        record = self._stats.compile(population) if self._stats else {}
-        logbook.record(gen=0, nevals=len(invalid_ind), **record)
-        if verbose:
-            print(logbook.stream)
+            record = self._compile_stats(population)
+            logbook.record(
+                gen=0, nevals=len(invalid_ind) - cached, cached=cached, **record
+            )
+            if verbose:
+                print(logbook.stream)
+            self._checkpoint(
+                0, population, logbook, factor_scores, checkpoint_metadata
+            )
+            start_gen = 1
 
         # Begin the generational process
-        for gen in range(1, self._generations + 1):
+        for gen in range(start_gen, self._generations + 1):
             # Select the next generation individuals
             offspring = self._toolbox.select(population, len(population))
 
@@ -252,45 +593,544 @@ class SimpleDEAPGP:
                 self._crossover_rate,
                 self._mutation_rate,
             )
+            # varAnd invalidates the fitness of crossed over and mutated offspring,
+            # the rest are clones, handled according to the reevaluation policy.
+            # Clones with a predicted or pre-screened fitness are always evaluated.
+            resampled = []
+            kept = []
             for off in offspring:
-                del off.fitness.values
+                if getattr(off, "simulations", 0) == 0:
+                    del off.fitness.values
+                elif self._reevaluation == "reevaluate":
+                    del off.fitness.values
+                elif self._reevaluation == "resample" and off.fitness.valid:
+                    resampled.append(off)
+                elif off.fitness.valid:
+                    kept.append(off)
 
             # Evaluate the individuals with an invalid fitness
             invalid_ind = [ind for ind in offspring if not ind.fitness.valid]
 
-            with multiprocessing.pool.ThreadPool(num_procs) as pool:
-                results = list(pool.imap(evaluate, invalid_ind))
-            fitnesses = []
-            for result in results:
-                fitnesses.append(result.Fitness)
-                fs = result
-                fs["Gen"] = gen
-                fs["Fitness"] = fs.Fitness[0]
-                factorScores = factorScores.append(
-                    fs, ignore_index=True, sort=False
+            generation_start = len(factor_scores)
+            cached = self._evaluate_individuals(
+                invalid_ind, gen, num_procs, factor_scores, low_fidelity_callback
+            )
+            cached = cached + self._resample(resampled, gen, num_procs, factor_scores)
+            self._record_kept(kept, gen, factor_scores)
+            if generation_callback is not None:
+                generation_callback(
+                    gen, factor_scores.to_dataframe(start=generation_start)
                 )
-            for ind, fit in zip(invalid_ind, fitnesses):
-                ind.fitness.values = fit
 
             # Update the hall of fame with the generated individuals
             if self.hof is not None:
-                self.hof.update(offspring)
+                self.hof.update(self._get_simulated(offspring))
 
             # Replace the current population by the offspring
             population[:] = offspring
+            if migrate is not None:
+                population[:] = migrate(gen, population)
+            self._update_racing_reference(population)
 
             # Append the current generation statistics to the logbook
-            record = self._stats.compile(population) if self._stats else {}
-            logbook.record(gen=gen, nevals=len(invalid_ind), **record)
+            record = self._compile_stats(population)
+            logbook.record(
+                gen=gen,
+                nevals=len(invalid_ind) + len(resampled) - cached,
+                cached=cached,
+                **record,
+            )
             if verbose:
                 print(logbook.stream)
+            self._checkpoint(
+                gen, population, logbook, factor_scores, checkpoint_metadata
+            )
+            if stop_condition is not None and stop_condition(gen):
+                break
             # purge(".",".*.EMD.nlogo")
+        factor_scores_df = factor_scores.to_dataframe()
+        factor_scores.close()
         return (
             population,
             logbook,
-            factorScores,
+            factor_scores_df,
         )
 
+    def _evolve_steady_state(
+        self,
+        num_procs: int,
+        verbose: bool,
+        generation_callback: Callable,
+        resume_from: Union[str, Dict[str, Any]],
+        checkpoint_metadata: Callable,
+        migrate: Callable = None,
+        stop_condition: Callable = None,
+    ):
+        """
+        Asynchronous steady-state evolution, see set_steady_state. Generation
+        callbacks, statistics, migrations and snapshots happen every population size
+        evaluations, without waiting for evaluations still in progress.
+        """
+        pop_size = self._pop_init_size
+        total_births = pop_size * (self._generations + 1)
+        if resume_from is not None:
+            state = self._resume(resume_from, verbose)
+            population = state["population"]
+            logbook = state["logbook"]
+            factor_scores = state["factor_scores"]
+            births = (state["gen"] + 1) * pop_size
+            unevaluated = []
+            self._update_racing_reference(population)
+        else:
+            population = []
+            logbook = self._new_logbook()
+            factor_scores = FactorScoreAccumulator()
+            births = 0
+            unevaluated = self._toolbox.population(n=pop_size)
+        submitted = births
+        generation_start = len(factor_scores)
+        generation_hits = self._get_cache_hits()
+        stopped = False
+        with ThreadPoolExecutor(num_procs) as executor:
+            in_flight = {}
+            while births < total_births and not stopped:
+                # Keep every worker busy, breeding from the individuals evaluated so far
+                while len(in_flight) < num_procs and submitted < total_births:
+                    if len(unevaluated) > 0:
+                        ind = unevaluated.pop()
+                    elif len(population) > 0:
+                        ind = self._breed(population)
+                    else:
+                        break
+                    in_flight[executor.submit(evaluate, ind)] = ind
+                    submitted = submitted + 1
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    ind = in_flight.pop(future)
+                    gen = births // pop_size
+                    self._record_evaluation(
+                        ind, future.result(), gen, factor_scores, Birth=births
+                    )
+                    ind.simulations = 1
+                    births = births + 1
+                    if len(population) < pop_size:
+                        population.append(ind)
+                    else:
+                        worst = min(
+                            range(len(population)),
+                            key=lambda i: population[i].fitness,
+                        )
+                        population[worst] = ind
+                    if self.hof is not None:
+                        self.hof.update([ind])
+                    if births % pop_size != 0:
+                        continue
+                    # Population size evaluations done, close the generation
+                    if generation_callback is not None:
+                        generation_callback(
+                            gen, factor_scores.to_dataframe(start=generation_start)
+                        )
+                    generation_start = len(factor_scores)
+                    if migrate is not None and gen > 0:
+                        population[:] = migrate(gen, population)
+                    self._update_racing_reference(population)
+                    record = self._compile_stats(population)
+                    cached = self._get_cache_hits() - generation_hits
+                    generation_hits = generation_hits + cached
+                    logbook.record(
+                        gen=gen, nevals=pop_size - cached, cached=cached, **record
+                    )
+                    if verbose:
+                        print(logbook.stream)
+                    self._checkpoint(
+                        gen, population, logbook, factor_scores, checkpoint_metadata
+                    )
+                    if stop_condition is not None and stop_condition(gen):
+                        # Evaluations still in progress are left unrecorded
+                        stopped = True
+                        break
+        factor_scores_df = factor_scores.to_dataframe()
+        factor_scores.close()
+        return (
+            population,
+            logbook,
+            factor_scores_df,
+        )
+
+    def _breed(self, population: List[Any]) -> Any:
+        """
+        Breeds a single offspring from tournament selected parents of the population.
+        """
+        parents = [
+            self._toolbox.clone(ind) for ind in self._toolbox.select(population, 2)
+        ]
+        offspring = algorithms.varAnd(
+            parents, self._toolbox, self._crossover_rate, self._mutation_rate
+        )[0]
+        del offspring.fitness.values
+        return offspring
+
+    def _get_simulated(self, individuals: List[Any]) -> List[Any]:
+        """
+        Returns the individuals with a simulated fitness, leaving out those that were
+        not simulated at full length: those only assigned a predicted fitness by
+        surrogate pre-screening and those rejected by multi-fidelity pre-screening,
+        whose fitness is only for selection.
+        """
+        return [ind for ind in individuals if getattr(ind, "simulations", 0) > 0]
+
+    def _compile_stats(self, population: List[Any]) -> Dict[str, Any]:
+        """
+        Compiles the statistics of the simulated individuals of the population,
+        recording how many individuals were left out under "unsimulated".
+        """
+        simulated = self._get_simulated(population)
+        record = (
+            self._stats.compile(simulated) if self._stats and len(simulated) > 0 else {}
+        )
+        record["unsimulated"] = len(population) - len(simulated)
+        return record
+
+    def _get_cache_hits(self) -> int:
+        """
+        :returns: int number of evaluations served from the fitness cache so far,
+                    0 without a fitness cache.
+        """
+        fitness_cache = get_fitness_cache()
+        return 0 if fitness_cache is None else fitness_cache.hits
+
+    def _update_racing_reference(self, population: List[Any]) -> None:
+        simulated = self._get_simulated(population)
+        set_racing_reference(
+            [ind.fitness.values[0] for ind in simulated] if len(simulated) > 0 else None,
+            self._is_minimize,
+        )
+
+    def _new_logbook(self) -> tools.Logbook:
+        logbook = tools.Logbook()
+        logbook.header = ["gen", "nevals", "cached", "unsimulated"] + (
+            self._stats.fields if self._stats else []
+        )
+        return logbook
+
+    def _resume(
+        self, resume_from: Union[str, Dict[str, Any]], verbose: bool
+    ) -> Dict[str, Any]:
+        """
+        Loads a snapshot and restores the hall of fame and random number generator states.
+        """
+        state = (
+            load_checkpoint(resume_from)
+            if isinstance(resume_from, (str, Path))
+            else resume_from
+        )
+        self.hof = state["hof"]
+        random.setstate(state["random_state"])
+        np.random.set_state(state["numpy_random_state"])
+        if verbose:
+            print(f"Resuming evolution after generation {state['gen']}")
+        return state
+
+    def _checkpoint(
+        self,
+        gen: int,
+        population: List[Any],
+        logbook: tools.Logbook,
+        factor_scores: FactorScoreAccumulator,
+        checkpoint_metadata: Callable,
+    ) -> None:
+        """
+        Snapshots the evolution state if a snapshot is due at this generation.
+        """
+        if self._checkpoint_path is None or not (
+            gen % self._checkpoint_interval == 0 or gen == self._generations
+        ):
+            return
+        state = {
+            "gen": gen,
+            "population": population,
+            "hof": self.hof,
+            "logbook": logbook,
+            "factor_scores": factor_scores,
+            "random_state": random.getstate(),
+            "numpy_random_state": np.random.get_state(),
+            "metadata": {}
+            if checkpoint_metadata is None
+            else checkpoint_metadata(),
+        }
+        # Write and then rename so that a crash never leaves a partial snapshot
+        checkpoint_path = Path(self._checkpoint_path)
+        checkpoint_path.parent.absolute().mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{checkpoint_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, checkpoint_path)
+
+    def _evaluate_individuals(
+        self,
+        individuals: List[Any],
+        gen: int,
+        num_procs: int,
+        factor_scores: FactorScoreAccumulator,
+        low_fidelity_callback: Callable = None,
+    ) -> int:
+        """
+        Evaluates individuals in parallel, assigns their fitness and records
+        their factor presence scores.
+
+        :param individuals: List of gp individuals to evaluate.
+        :param gen: int generation the individuals belong to.
+        :param num_procs: int number of individuals evaluated concurrently.
+        :param factor_scores: FactorScoreAccumulator recording the evaluations.
+        :param low_fidelity_callback: Callable receiving the low-fidelity factor scores
+                                    if multi-fidelity evaluation is enabled.
+        :returns: int number of individuals whose fitness was served from the fitness
+                    cache instead of simulated.
+        """
+        predicted_fitness = {}
+        predicted_only = []
+        if self._surrogate_model is not None and self._surrogate_model.is_ready():
+            individuals, predicted_fitness, predicted_only = self._surrogate_screen(
+                individuals
+            )
+        rejected = []
+        if self._multi_fidelity is not None and len(individuals) > 0:
+            individuals, rejected = self._prescreen(
+                individuals, gen, num_procs, low_fidelity_callback
+            )
+        hits = self._get_cache_hits()
+        results = self._map_evaluate(evaluate, individuals, num_procs)
+        cached = self._get_cache_hits() - hits
+        for ind, result in zip(individuals, results):
+            ind.simulations = 1
+            fields = {}
+            if id(ind) in predicted_fitness:
+                fields["Predicted_Fitness"] = predicted_fitness[id(ind)]
+            presence = self._record_evaluation(
+                ind, result, gen, factor_scores, **fields
+            )
+            if self._surrogate_model is not None:
+                self._surrogate_model.add(presence, ind.fitness.values[0])
+        if len(rejected) > 0:
+            worst = min(ind.fitness for ind in individuals)
+            for ind in rejected:
+                ind.fitness.values = worst.values
+                ind.simulations = 0
+        for ind in predicted_only:
+            ind.simulations = 0
+        if self._surrogate_model is not None and len(individuals) > 0:
+            self._surrogate_model.fit()
+        return cached
+
+    def _resample(
+        self,
+        individuals: List[Any],
+        gen: int,
+        num_procs: int,
+        factor_scores: FactorScoreAccumulator,
+    ) -> int:
+        """
+        Simulates already evaluated individuals again, records the new simulations
+        and assigns the mean fitness over all simulations of each individual.
+
+        :returns: int number of individuals whose simulation was served from the
+                    fitness cache.
+        """
+        hits = self._get_cache_hits()
+        results = self._map_evaluate(evaluate, individuals, num_procs)
+        cached = self._get_cache_hits() - hits
+        for ind, result in zip(individuals, results):
+            previous = ind.fitness.values[0]
+            simulations = ind.simulations
+            self._record_evaluation(ind, result, gen, factor_scores, Resampled=True)
+            ind.fitness.values = (
+                (previous * simulations + ind.fitness.values[0]) / (simulations + 1),
+            )
+            ind.simulations = simulations + 1
+        return cached
+
+    def _record_kept(
+        self,
+        individuals: List[Any],
+        gen: int,
+        factor_scores: FactorScoreAccumulator,
+    ) -> None:
+        """
+        Records clones that keep their fitness without being simulated again, so that
+        the factor scores have a row for every individual of every generation.
+        """
+        for ind in individuals:
+            result = get_equivalent_record(ind, {"Fitness": ind.fitness.values})
+            self._record_evaluation(ind, result, gen, factor_scores, Kept=True)
+
+    def _map_evaluate(
+        self, evaluate_individual: Callable, individuals: List[Any], num_procs: int
+    ) -> List[pd.Series]:
+        """
+        Evaluates individuals in parallel. If collapse_duplicates is set, individuals
+        with the same rule key (see get_rule_key), such as identical trees or, with
+        @commutative and @associative factors, equivalent trees, are evaluated once
+        and share the simulation results, with or without a fitness cache.
+
+        :returns: List of evaluation results, one per individual.
+        """
+        if not self._collapse_duplicates:
+            with multiprocessing.pool.ThreadPool(num_procs) as pool:
+                return list(pool.imap(evaluate_individual, individuals))
+        keys = [get_individual_rule_key(ind) for ind in individuals]
+        first = {}
+        for key, ind in zip(keys, individuals):
+            first.setdefault(key, ind)
+        with multiprocessing.pool.ThreadPool(num_procs) as pool:
+            unique_results = dict(
+                zip(first, pool.imap(evaluate_individual, first.values()))
+            )
+        results = []
+        for key, ind in zip(keys, individuals):
+            result = unique_results[key]
+            if str(ind) != str(first[key]):
+                result = get_equivalent_record(ind, result.to_dict())
+            results.append(result)
+        return results
+
+    def _surrogate_screen(self, individuals: List[Any]) -> tuple:
+        """
+        Predicts the fitness of individuals and picks those to simulate: the best
+        predicted ones and a random share of the rest.
+
+        :returns: Tuple of the List of individuals to simulate, the Dict by individual
+                    id of the predicted fitness of all individuals, and the List of
+                    individuals that are not simulated, which are assigned their
+                    predicted fitness for selection only.
+        """
+        predictions = self._surrogate_model.predict(
+            score_population_presence(individuals)
+        )
+        num_simulated = max(
+            1, math.ceil(len(individuals) * self._surrogate["simulate_fraction"])
+        )
+        order = np.argsort(predictions if self._is_minimize else -predictions)
+        rest = [int(i) for i in order[num_simulated:]]
+        explored = random.sample(
+            rest, int(round(len(rest) * self._surrogate["exploration_fraction"]))
+        )
+        simulated = set(int(i) for i in order[:num_simulated]) | set(explored)
+        predicted_fitness = {
+            id(ind): float(prediction)
+            for ind, prediction in zip(individuals, predictions)
+        }
+        predicted_only = []
+        for i, ind in enumerate(individuals):
+            if i not in simulated:
+                ind.fitness.values = (float(predictions[i]),)
+                predicted_only.append(ind)
+        return (
+            [individuals[i] for i in sorted(simulated)],
+            predicted_fitness,
+            predicted_only,
+        )
+
+    def _train_surrogate(self, factor_scores: FactorScoreAccumulator) -> None:
+        """
+        Trains the surrogate model on previously recorded factor scores.
+        """
+        factor_scores_df = factor_scores.to_dataframe()
+        columns = factor_scores.get_columns()
+        for presence, fitness in zip(
+            factor_scores_df[columns].to_dict("records"), factor_scores_df["Fitness"]
+        ):
+            self._surrogate_model.add(presence, fitness)
+        self._surrogate_model.fit()
+
+    def _prescreen(
+        self,
+        individuals: List[Any],
+        gen: int,
+        num_procs: int,
+        low_fidelity_callback: Callable,
+    ) -> tuple:
+        """
+        Simulates individuals for a fraction of ticks_to_run and splits them into
+        those promoted to full length simulations and those rejected.
+
+        :returns: Tuple of the List of promoted and the List of rejected individuals.
+        """
+        low_fidelity_ticks = max(
+            1,
+            int(
+                self._model_init_data["ticks_to_run"]
+                * self._multi_fidelity["ticks_fraction"]
+            ),
+        )
+        low_fidelity_evaluate = functools.partial(
+            evaluate, ticks_to_run=low_fidelity_ticks
+        )
+        results = self._map_evaluate(low_fidelity_evaluate, individuals, num_procs)
+        low_fidelity_scores = FactorScoreAccumulator()
+        for ind, result in zip(individuals, results):
+            self._record_evaluation(ind, result, gen, low_fidelity_scores)
+        num_promoted = max(
+            1,
+            math.ceil(len(individuals) * self._multi_fidelity["promote_fraction"]),
+        )
+        # Fitness compares by weighted values, greater is better
+        order = sorted(
+            range(len(individuals)),
+            key=lambda i: individuals[i].fitness,
+            reverse=True,
+        )
+        promoted = set(order[:num_promoted])
+        if low_fidelity_callback is not None:
+            low_fidelity_df = low_fidelity_scores.to_dataframe()
+            low_fidelity_df["Promoted"] = [
+                i in promoted for i in range(len(individuals))
+            ]
+            low_fidelity_callback(gen, low_fidelity_df)
+        low_fidelity_scores.close()
+        for ind in individuals:
+            del ind.fitness.values
+        return (
+            [individuals[i] for i in sorted(promoted)],
+            [individuals[i] for i in order[num_promoted:]],
+        )
+
+    def _record_evaluation(
+        self,
+        ind: Any,
+        result: pd.Series,
+        gen: int,
+        factor_scores: FactorScoreAccumulator,
+        **fields: Any,
+    ) -> Dict[str, int]:
+        """
+        Assigns the fitness of an evaluated individual and records its factor
+        presence scores.
+
+        :returns: Dict of the factor presence scores of the individual.
+        """
+        record = result.to_dict()
+        fitness = record.pop("Fitness")
+        rule = record.pop("Rule")
+        if "Replicates" in record:
+            fields["Replicates"] = record.pop("Replicates")
+        ind.fitness.values = fitness
+        factor_scores.append(
+            record, Fitness=fitness[0], Rule=rule, Gen=gen, **fields
+        )
+        return record
+
+
+def load_checkpoint(checkpoint_path: str) -> Dict[str, Any]:
+    """
+    Loads an evolution snapshot taken by SimpleDEAPGP.
+
+    :param checkpoint_path: str path of the snapshot file.
+    :returns: Dict evolution state, including the generation number under "gen" and
+                caller supplied metadata under "metadata".
+    """
+    with open(checkpoint_path, "rb") as f:
+        return pickle.load(f)
+
 
 def genGrow(pset, min_: int, max_: int, type_: Any = None) -> List[Any]:
     """Generate an expression where each leaf might have a different depth
@@ -334,49 +1174,38 @@ def generate(
                 is assumed.
     :returns: A grown tree with leaves at possibly different depths
             dependending on the condition function.
-    :raises: TypeError if no primitives or terminals of required type
+    :raises: TypeError if no tree of the required type fits within max_
     """
-    validTree = False
-    while not validTree:
-        if type_ is None:
-            type_ = pset.ret
-        expr = []
-        height = random.randint(min_, max_)
-        stack = [(0, type_)]
-        validTree = True
-        while len(stack) != 0:
-            depth, type_ = stack.pop()
-            if condition(height, depth):
-                if len(pset.terminals[type_]) > 0:
-                    term = random.choice(pset.terminals[type_])
-                    if isclass(term):
-                        term = term()
-                    expr.append(term)
-                else:
-                    if len(pset.primitives[type_]) > 0:
-                        prim = random.choice(pset.primitives[type_])
-                        expr.append(prim)
-                        for arg in reversed(prim.args):
-                            stack.append((depth + 1, arg))
-                    else:
-                        raise TypeError(
-                            f"Invalid tree! No primitives or terminals of type {type_}"
-                        )
-            else:
-                if len(pset.primitives[type_]) > 0:
-                    prim = random.choice(pset.primitives[type_])
-                    expr.append(prim)
-                    for arg in reversed(prim.args):
-                        stack.append((depth + 1, arg))
-                elif len(pset.terminals[type_]) > 0:
-                    term = random.choice(pset.terminals[type_])
-                    if isclass(term):
-                        term = term()
-                    expr.append(term)
-                else:
-                    raise TypeError(
-                        f"Invalid tree! No primitives or terminals of type {type_}"
-                    )
+    if type_ is None:
+        type_ = pset.ret
+    # Nodes are only drawn from those that can still close their subtree with all
+    # leaves between min_ and height, so every tree is valid on the first try
+    tables = get_primitive_set_tables(pset)
+    low, heights = tables.get_heights(type_, min_, max_)
+    if len(heights) == 0:
+        raise TypeError(
+            f"Invalid tree! No tree of type {type_} fits within depth {max_}"
+        )
+    height = random.choice(heights)
+    expr = []
+    stack = [(0, type_)]
+    while len(stack) != 0:
+        depth, type_ = stack.pop()
+        terminals, primitives = tables.get_candidates(
+            type_, low - depth, height - depth
+        )
+        if len(terminals) > 0 and (
+            len(primitives) == 0 or condition(height, depth)
+        ):
+            term = random.choice(terminals)
+            if isclass(term):
+                term = term()
+            expr.append(term)
+        else:
+            prim = random.choice(primitives)
+            expr.append(prim)
+            for arg in reversed(prim.args):
+                stack.append((depth + 1, arg))
     return expr
 
 
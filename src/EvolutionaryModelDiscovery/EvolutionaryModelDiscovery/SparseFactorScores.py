@@ -0,0 +1,202 @@
+"""EvolutionaryModelDiscovery: Automated agent rule generation and
+importance evaluation for agent-based models with Genetic Programming.
+Copyright (C) 2018  Chathika Gunaratne
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>."""
+
+from typing import List
+from pathlib import Path
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Factor scores columns that describe an evaluation rather than factor presence
+METADATA_COLUMNS = [
+    "Run",
+    "Island",
+    "Seed",
+    "Gen",
+    "Rule",
+    "Fitness",
+    "Replicates",
+    "Birth",
+    "Predicted_Fitness",
+    "Resampled",
+    "Kept",
+    "Promoted",
+]
+
+
+class SparseFactorScores:
+    """
+    Factor scores with the factor presence scores held in a scipy.sparse CSR matrix,
+    one row per evaluated rule and one column per factor or factor interaction of
+    a column vocabulary, and the metadata (fitness, rule, generation, ...) in a
+    pandas DataFrame. Stored on disk as a single compressed .npz file.
+    """
+
+    def __init__(
+        self, presence: sparse.csr_matrix, columns: List[str], fields: pd.DataFrame
+    ) -> None:
+        """
+        :param presence: scipy.sparse matrix of factor presence scores.
+        :param columns: List[str] factor or factor interaction of each presence column.
+        :param fields: pd.DataFrame of metadata, one row per presence row.
+        """
+        if presence.shape != (fields.shape[0], len(columns)):
+            raise ValueError(
+                f"Presence matrix of shape {presence.shape} does not match "
+                f"{fields.shape[0]} rows and {len(columns)} columns."
+            )
+        self._presence = sparse.csr_matrix(presence)
+        self._columns = list(columns)
+        self._fields = fields.reset_index(drop=True)
+
+    def __len__(self) -> int:
+        return self._presence.shape[0]
+
+    def get_presence(self) -> sparse.csr_matrix:
+        return self._presence
+
+    def get_columns(self) -> List[str]:
+        """
+        :returns: List[str] column vocabulary of the presence matrix.
+        """
+        return list(self._columns)
+
+    def get_fields(self) -> pd.DataFrame:
+        return self._fields
+
+    def get_column_presence(self, columns: List[str]) -> sparse.csr_matrix:
+        """
+        :param columns: List[str] factors or factor interactions.
+        :returns: scipy.sparse.csr_matrix of their presence scores, all zero for
+                    those not in the column vocabulary.
+        """
+        index = {column: i for i, column in enumerate(self._columns)}
+        selection = sparse.lil_matrix((len(self._columns), len(columns)), dtype=np.int8)
+        for i, column in enumerate(columns):
+            if column in index:
+                selection[index[column], i] = 1
+        return (self._presence @ selection.tocsr()).astype(self._presence.dtype)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        :returns: pd.DataFrame of the metadata followed by sparse presence columns.
+        """
+        presence = pd.DataFrame.sparse.from_spmatrix(
+            self._presence, columns=self._columns
+        )
+        return pd.concat([self._fields, presence], axis=1)
+
+    @classmethod
+    def from_dataframe(cls, factor_scores: pd.DataFrame) -> "SparseFactorScores":
+        """
+        :param factor_scores: pd.DataFrame with the METADATA_COLUMNS it has and one
+                                column per factor or factor interaction.
+        """
+        columns = [col for col in factor_scores.columns if col not in METADATA_COLUMNS]
+        presence = factor_scores[columns].fillna(0).to_numpy()
+        if not np.issubdtype(presence.dtype, np.integer):
+            presence = presence.astype(np.int32)
+        return cls(
+            sparse.csr_matrix(presence),
+            columns,
+            factor_scores[
+                [col for col in factor_scores.columns if col in METADATA_COLUMNS]
+            ],
+        )
+
+    @classmethod
+    def concat(cls, parts: List["SparseFactorScores"]) -> "SparseFactorScores":
+        """
+        Stacks factor scores, merging their column vocabularies in order of appearance.
+        """
+        columns = {}
+        for part in parts:
+            for column in part.get_columns():
+                columns.setdefault(column, len(columns))
+        presences = []
+        for part in parts:
+            # Remap the part's columns onto the merged vocabulary
+            presence = part.get_presence().tocoo()
+            remap = np.array(
+                [columns[column] for column in part.get_columns()], dtype=np.int64
+            )
+            presences.append(
+                sparse.csr_matrix(
+                    (presence.data, (presence.row, remap[presence.col])),
+                    shape=(presence.shape[0], len(columns)),
+                )
+            )
+        if len(presences) == 0:
+            return cls(sparse.csr_matrix((0, 0), dtype=np.int8), [], pd.DataFrame())
+        return cls(
+            sparse.vstack(presences, format="csr"),
+            list(columns),
+            pd.concat([part.get_fields() for part in parts], ignore_index=True),
+        )
+
+    def save(self, path: str) -> None:
+        """
+        Writes the factor scores to a compressed .npz file.
+
+        :param path: str path of the .npz file.
+        """
+        arrays = {
+            "data": self._presence.data,
+            "indices": self._presence.indices,
+            "indptr": self._presence.indptr,
+            "shape": np.array(self._presence.shape),
+            "columns": np.array(self._columns, dtype=str),
+            "field_names": np.array(list(self._fields.columns), dtype=str),
+        }
+        for i, name in enumerate(self._fields.columns):
+            arrays[f"field_{i}"] = _encode_field(self._fields[name])
+        # Write and then rename, so that readers never see a partial file
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SparseFactorScores":
+        """
+        :param path: str path of a .npz file written by save.
+        """
+        with np.load(path, allow_pickle=False) as arrays:
+            presence = sparse.csr_matrix(
+                (arrays["data"], arrays["indices"], arrays["indptr"]),
+                shape=tuple(arrays["shape"]),
+            )
+            fields = pd.DataFrame(
+                {
+                    name: arrays[f"field_{i}"]
+                    for i, name in enumerate(arrays["field_names"].tolist())
+                },
+                index=range(presence.shape[0]),
+            )
+            return cls(presence, arrays["columns"].tolist(), fields)
+
+
+def is_sparse_factor_scores_path(factor_scores_path: str) -> bool:
+    return Path(factor_scores_path).suffix == ".npz"
+
+
+def _encode_field(values: pd.Series) -> np.ndarray:
+    # Metadata is stored without pickling, as numbers where possible, otherwise as text
+    if values.dtype != object:
+        return values.to_numpy()
+    try:
+        return values.astype(float).to_numpy()
+    except (TypeError, ValueError):
+        return values.fillna("").astype(str).to_numpy(dtype=str)
@@ -0,0 +1,100 @@
+"""EvolutionaryModelDiscovery: Automated agent rule generation and
+importance evaluation for agent-based models with Genetic Programming.
+Copyright (C) 2018  Chathika Gunaratne
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>."""
+
+from typing import List, Mapping
+
+import numpy as np
+
+
+class SurrogateModel:
+    """
+    Random forest regressor predicting the fitness of a rule from its factor presence
+    scores, retrained as simulated rules accumulate. Used to decide which rules are
+    worth simulating.
+    """
+
+    def __init__(
+        self, min_samples: int = 50, max_samples: int = 10000, num_trees: int = 100
+    ) -> None:
+        """
+        :param min_samples: int number of simulated rules needed before the first fit.
+        :param max_samples: int number of most recently simulated rules trained on.
+        :param num_trees: int number of trees of the random forest.
+        """
+        self._min_samples = min_samples
+        self._max_samples = max_samples
+        self._num_trees = num_trees
+        self._columns = {}
+        self._presence = []
+        self._fitness = []
+        self._model = None
+        self._model_columns = {}
+
+    def __len__(self) -> int:
+        return len(self._fitness)
+
+    def add(self, presence: Mapping[str, int], fitness: float) -> None:
+        """
+        Adds the factor presence scores and simulated fitness of a rule to the training data.
+        """
+        for name in presence:
+            if name not in self._columns:
+                self._columns[name] = len(self._columns)
+        self._presence.append(dict(presence))
+        self._fitness.append(fitness)
+        if len(self._fitness) > self._max_samples:
+            del self._presence[0]
+            del self._fitness[0]
+
+    def is_ready(self) -> bool:
+        return self._model is not None
+
+    def fit(self) -> None:
+        """
+        Retrains the regressor on the training data, once there is enough of it.
+        """
+        if len(self._fitness) < self._min_samples:
+            return
+        # Imported on first use, scikit-learn is only needed once a surrogate is trained
+        from sklearn.ensemble import RandomForestRegressor
+
+        self._model_columns = dict(self._columns)
+        model = RandomForestRegressor(n_estimators=self._num_trees, n_jobs=-1)
+        model.fit(
+            self._to_matrix(self._presence, self._model_columns),
+            np.asarray(self._fitness, dtype=float),
+        )
+        self._model = model
+
+    def predict(self, presences: List[Mapping[str, int]]) -> np.ndarray:
+        """
+        :param presences: List of factor presence scores of rules.
+        :returns: np.ndarray of predicted fitness, one per rule.
+        """
+        if self._model is None:
+            raise RuntimeError("Surrogate model has not been fit yet.")
+        return self._model.predict(self._to_matrix(presences, self._model_columns))
+
+    @staticmethod
+    def _to_matrix(
+        presences: List[Mapping[str, int]], columns: Mapping[str, int]
+    ) -> np.ndarray:
+        # Factors the regressor has not seen are left out
+        matrix = np.zeros((len(presences), max(1, len(columns))))
+        for row, presence in enumerate(presences):
+            for name, score in presence.items():
+                column = columns.get(name)
+                if column is not None:
+                    matrix[row, column] = score
+        return matrix
@@ -12,11 +12,12 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>."""
 
-from typing import List
+from typing import Any, Callable, List, Set
 import re
-import pkg_resources
+import hashlib
 import functools
 import inspect
+import pickle
 import warnings
 from pathlib import Path
 import shutil
@@ -29,35 +30,148 @@ def netlogo_EMD_line_to_array(netlogo_EMD_line):
     return re.sub("[\s;]", "", netlogo_EMD_line).split("@")
 
 
-def get_model_factors_module_name() -> str:
-    return f"ModelFactors"
+def normalize_rule(rule: str) -> str:
+    """
+    Normalizes a compiled NetLogo rule by collapsing whitespace so that
+    rules differing only in spacing are treated as the same rule.
+    """
+    return " ".join(str(rule).split())
 
 
-def get_model_factors_path() -> str:
-    fpath = f"{get_model_factors_module_name()}.py"
-    model_factors_file_path = pkg_resources.resource_filename(
-        "EvolutionaryModelDiscovery", fpath
-    )
-    return str(model_factors_file_path)
+def file_hash(path: str) -> str:
+    """
+    Returns the sha256 hex digest of a file's contents.
+    """
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
 
 
-def get_lock_fpath() -> str:
-    lock_fpath = pkg_resources.resource_filename(
-        "EvolutionaryModelDiscovery", ".lock"
-    )
-    return lock_fpath
+def callable_fingerprint(func: Callable) -> str:
+    """
+    Returns a str identifying what a callable computes. Functions are identified
+    by their bytecode and constants, including those of nested functions, their
+    default arguments, the pickled contents of their closure, and the module
+    globals their code refers to: functions and classes recursively, modules by
+    name and other values pickled. Bound methods and functools.partial objects
+    are identified by their function and their pickled instance or arguments,
+    callable objects by the functions of their class and their pickled
+    attributes, and builtins by their qualified name.
+
+    The fingerprint does not cover state read at call time through other means,
+    such as data files, environment variables, the contents of imported modules
+    or objects reached through attributes of arguments. Bytecode differs between
+    Python versions, so fingerprints do too.
+
+    :raises TypeError: if the callable refers to a value that cannot be pickled,
+                        so that no fingerprint can be given for it.
+    """
+    sha = hashlib.sha256()
+    _update_fingerprint(sha, func, set())
+    return sha.hexdigest()
+
+
+def _update_fingerprint(sha: "hashlib._Hash", value: Any, seen: Set[int]) -> None:
+    if id(value) in seen:
+        # Recursive reference, e.g. a function calling itself
+        sha.update(b"<recursion>")
+        return
+    if inspect.ismodule(value):
+        sha.update(f"<module {value.__name__}>".encode())
+    elif isinstance(value, functools.partial):
+        seen.add(id(value))
+        _update_fingerprint(sha, value.func, seen)
+        sha.update(_pickle((value.args, value.keywords)))
+    elif inspect.ismethod(value):
+        seen.add(id(value))
+        _update_fingerprint(sha, value.__func__, seen)
+        _update_fingerprint(sha, value.__self__, seen)
+    elif inspect.isfunction(value):
+        seen.add(id(value))
+        sha.update(f"<function {value.__qualname__}>".encode())
+        _update_code(sha, value.__code__)
+        sha.update(_pickle((value.__defaults__, value.__kwdefaults__)))
+        for cell in value.__closure__ or ():
+            _update_fingerprint(sha, cell.cell_contents, seen)
+        func_globals = value.__globals__
+        for name in sorted(_get_code_names(value.__code__)):
+            if name in func_globals:
+                sha.update(f"<global {name}>".encode())
+                _update_fingerprint(sha, func_globals[name], seen)
+    elif inspect.isclass(value):
+        seen.add(id(value))
+        sha.update(f"<class {value.__module__}.{value.__qualname__}>".encode())
+        if value.__module__ != "builtins":
+            for klass in value.__mro__:
+                if klass.__module__ == "builtins":
+                    continue
+                for name, attribute in sorted(vars(klass).items()):
+                    if inspect.isfunction(attribute) or isinstance(
+                        attribute, (staticmethod, classmethod)
+                    ):
+                        sha.update(f"<attribute {name}>".encode())
+                        _update_fingerprint(
+                            sha, getattr(attribute, "__func__", attribute), seen
+                        )
+    elif inspect.isbuiltin(value) or callable(value) and not hasattr(
+        value, "__dict__"
+    ):
+        # Builtins and extension callables, such as numpy ufuncs
+        sha.update(
+            "<builtin {0}.{1}>".format(
+                getattr(value, "__module__", None),
+                getattr(value, "__qualname__", getattr(value, "__name__", None)),
+            ).encode()
+        )
+        if getattr(value, "__self__", None) is not None and not inspect.ismodule(
+            value.__self__
+        ):
+            sha.update(_pickle(value.__self__))
+    elif callable(value):
+        # Callable object, identified by its class and attributes
+        seen.add(id(value))
+        _update_fingerprint(sha, type(value), seen)
+        for name, attribute in sorted(vars(value).items()):
+            sha.update(f"<attribute {name}>".encode())
+            _update_fingerprint(sha, attribute, seen)
+    elif isinstance(value, (set, frozenset)):
+        # Set order depends on string hash randomization
+        for item in sorted(_pickle(item) for item in value):
+            sha.update(item)
+    else:
+        sha.update(_pickle(value))
+
+
+def _update_code(sha: "hashlib._Hash", code: Any) -> None:
+    sha.update(code.co_code)
+    sha.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            _update_code(sha, const)
+        elif isinstance(const, frozenset):
+            # Set order depends on string hash randomization
+            sha.update(repr(sorted(repr(item) for item in const)).encode())
+        else:
+            sha.update(repr(const).encode())
 
 
-def remove_model_factors_file():
-    try:
-        Path(get_model_factors_path()).unlink()
-    except FileNotFoundError:
-        pass
+def _get_code_names(code: Any) -> Set[str]:
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names.update(_get_code_names(const))
+    return names
 
 
-def create_model_factors_file():
-    if Path.exists(Path(get_model_factors_path())):
-        open(get_model_factors_path(), "w+")
+def _pickle(value: Any) -> bytes:
+    try:
+        return pickle.dumps(value, protocol=4)
+    except Exception as e:
+        raise TypeError(
+            f"Cannot fingerprint a callable referring to {type(value).__name__}: {e}"
+        ) from e
 
 
 def slugify(value):
@@ -0,0 +1,135 @@
+"""EvolutionaryModelDiscovery: Automated agent rule generation and
+importance evaluation for agent-based models with Genetic Programming.
+Copyright (C) 2018  Chathika Gunaratne
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>."""
+
+from typing import Any, Callable, Iterator
+from contextlib import contextmanager
+import queue
+import threading
+
+import nl4py
+
+
+class WorkspacePool:
+    """
+    Bounded pool of NL4Py headless workspaces shared by the evaluation workers
+    of a genetic program. Workspaces are created lazily, handed out to one worker
+    at a time and recycled after a configurable number of uses.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        max_uses: int = 100,
+        create_workspace: Callable = None,
+    ) -> None:
+        """
+        :param size: int maximum number of live workspaces.
+        :param max_uses: int number of simulations a workspace runs before it is
+                            deleted and replaced by a fresh one. Values below 1
+                            disable recycling.
+        :param create_workspace: Callable returning a new workspace
+                            (default: nl4py.create_headless_workspace).
+        """
+        if size < 1:
+            raise ValueError(f"Workspace pool size must be positive, got {size}")
+        self._size = size
+        self._max_uses = max_uses
+        self._create_workspace = (
+            nl4py.create_headless_workspace
+            if create_workspace is None
+            else create_workspace
+        )
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._uses = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def __enter__(self) -> "WorkspacePool":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def get_size(self) -> int:
+        return self._size
+
+    @contextmanager
+    def workspace(self) -> Iterator[Any]:
+        """
+        Checks a workspace out of the pool for the duration of the with block.
+        Workspaces that raise while checked out are discarded rather than reused.
+        """
+        workspace = self._checkout()
+        try:
+            yield workspace
+        except BaseException:
+            self._discard(workspace)
+            raise
+        else:
+            self._checkin(workspace)
+
+    def _checkout(self) -> Any:
+        if self._closed:
+            raise RuntimeError("Workspace pool is closed.")
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            workspace = self._create_workspace()
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._uses[id(workspace)] = 0
+        return workspace
+
+    def _checkin(self, workspace: Any) -> None:
+        with self._lock:
+            uses = self._uses[id(workspace)] + 1
+            self._uses[id(workspace)] = uses
+        if self._closed or (self._max_uses > 0 and uses >= self._max_uses):
+            self._discard(workspace)
+        else:
+            self._idle.put(workspace)
+            self._slots.release()
+
+    def _discard(self, workspace: Any) -> None:
+        try:
+            self._delete(workspace)
+        finally:
+            self._slots.release()
+
+    def _delete(self, workspace: Any) -> None:
+        with self._lock:
+            self._uses.pop(id(workspace), None)
+        try:
+            workspace.deleteWorkspace()
+        except Exception:
+            pass
+
+    def close(self) -> None:
+        """
+        Deletes all idle workspaces. Workspaces still checked out are deleted
+        when they are returned.
+        """
+        self._closed = True
+        while True:
+            try:
+                workspace = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._delete(workspace)
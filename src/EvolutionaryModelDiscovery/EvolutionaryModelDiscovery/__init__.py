@@ -13,10 +13,14 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.'''
 
 from datetime import time
-from typing import Callable, List, Union
+from typing import Any, Callable, Dict, List, Union
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 import atexit
 import importlib
+import multiprocessing
+import queue
+import random
 import time
 import numpy as np
 
@@ -24,19 +28,114 @@ import nl4py
 import pandas as pd
 
 from .NetLogoWriter import NetLogoWriter
-from .FactorGenerator import FactorGenerator
-from .PrimitiveSetGenerator import PrimitiveSetGenerator
-from .FactorImportances import FactorImportances
+from .ModelFactors import ModelFactors, load_model_factors
+from .FitnessCache import FitnessCache
+from .FactorScoresWriter import FactorScoresWriter, open_factor_scores_writer, get_low_fidelity_path, \
+                                get_random_forests_path
+from .SparseFactorScores import SparseFactorScores
+from .Migrator import Migrator, get_migration_targets
+from .IncrementalObjective import IncrementalObjective
 from .SimpleDEAPGP import *
+from .ABMEvaluator import set_simulation_slots
 from .Util import *
 
 
+# Classes of the factor importance analysis stack (scikit-learn, SciPy stats, networkx),
+# imported on first use so that GP runs and their worker processes do not load it
+_LAZY_CLASSES = {'FactorImportances': '.FactorImportances', 
+                 'ImportanceTracker': '.ImportanceTracker'}
+
+def _load_lazy_class(name: str) -> type:
+    module = importlib.import_module(_LAZY_CLASSES[name], __name__)
+    globals()[name] = getattr(module, name)
+    return globals()[name]
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_CLASSES:
+        return _load_lazy_class(name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
 def exit_handler() -> None:
-    remove_model_factors_file()
-    purge('.','.EMD.nlogo')
+    # Processes running GP runs in parallel leave the models to the main process
+    if multiprocessing.parent_process() is None:
+        purge('.','.EMD.nlogo')
 
 atexit.register(exit_handler)
 
+_PROCESS_GP = None
+_PROCESS_GENERATION_QUEUE = None
+
+def _init_run_process(netlogo_path : str, model_init_data : Dict[str, Any], 
+                    model_factors : ModelFactors, gp_config : Dict[str, Any], 
+                    simulation_slots : Any, generation_queue : Any) -> None:
+    """
+    Sets up the genetic program of a process evolving GP runs in parallel, using the 
+    model factors already parsed by the main process.
+    """
+    global _PROCESS_GP, _PROCESS_GENERATION_QUEUE
+    netlogo_writer = NetLogoWriter(model_init_data['model_path'])
+    nl4py.initialize(netlogo_path)
+    _PROCESS_GP = SimpleDEAPGP(model_init_data, model_factors, netlogo_writer)
+    _PROCESS_GP.set_config(gp_config)
+    _PROCESS_GENERATION_QUEUE = generation_queue
+    set_simulation_slots(simulation_slots)
+
+def _seed_process(seed_sequence : np.random.SeedSequence) -> int:
+    """
+    Seeds the random and numpy.random generators of the process from a SeedSequence.
+
+    :returns: int seed both generators were seeded with
+    """
+    seed = int(seed_sequence.generate_state(1)[0])
+    random.seed(seed)
+    np.random.seed(seed)
+    return seed
+
+def _get_island_seeds(seed : int, num_runs : int, 
+                    num_islands : int) -> List[List[np.random.SeedSequence]]:
+    """
+    :returns: List by run of List by island of the SeedSequence of each island, the 
+                children of the SeedSequence of each run, see set_seed
+    """
+    return [run_seed.spawn(num_islands) 
+                for run_seed in np.random.SeedSequence(seed).spawn(num_runs)]
+
+def _evolve_run(run : int, num_procs : int, replicate_procs : int, 
+                    migrator : Migrator = None, 
+                    seed_sequence : np.random.SeedSequence = None) -> tuple:
+    """
+    Evolves a single GP run, or one island of it if a migrator is given, in a process set 
+    up by _init_run_process, sending the factor scores of each generation to the main 
+    process as soon as they are available. 
+    
+    Spawned processes import the user's script again, along with any seeding it does, so 
+    the process is reseeded from seed_sequence to give each run its own random numbers.
+    """
+    seed = None if seed_sequence is None else _seed_process(seed_sequence)
+    if migrator is None:
+        print('--- Starting GP Run {} ---'.format(run))
+    else:
+        print('--- Starting GP Run {} Island {} ---'.format(run, migrator.get_island()))
+
+    def send_generation(gen : int, generation_scores : pd.DataFrame, 
+                    low_fidelity : bool = False) -> None:
+        generation_scores['Run'] = run
+        if migrator is not None:
+            generation_scores['Island'] = migrator.get_island()
+        if seed is not None:
+            generation_scores['Seed'] = seed
+        _PROCESS_GENERATION_QUEUE.put((low_fidelity, generation_scores))
+
+    def send_low_fidelity_generation(gen : int, generation_scores : pd.DataFrame) -> None:
+        send_generation(gen, generation_scores, low_fidelity=True)
+
+    population, logbook, _ = _PROCESS_GP.evolve(num_procs=num_procs, 
+                                    replicate_procs=replicate_procs,
+                                    generation_callback=send_generation,
+                                    migrate=migrator,
+                                    low_fidelity_callback=send_low_fidelity_generation)
+    return population, logbook
+
 class EvolutionaryModelDiscovery:
     
     def __init__(self, netlogo_path : str, model_path : str, setup_commands : List[str], 
@@ -78,11 +177,17 @@ class EvolutionaryModelDiscovery:
             'agg_func' : agg_func
         }
         self.replications = 1
-        ModelFactors, netlogo_writer = self._parse_model_into_factors()
+        self.islands = {'num_islands' : 1}
+        self.netlogo_path = netlogo_path
+        self.model_factors, netlogo_writer = self._parse_model_into_factors()
         # Starting NL4Py
         nl4py.initialize(netlogo_path)
-        self.gp = SimpleDEAPGP(self.model_init_data, ModelFactors, netlogo_writer)
+        self.gp = SimpleDEAPGP(self.model_init_data, self.model_factors, netlogo_writer)
         self.factor_scores_file_name = 'FactorScores.csv'
+        self.seed = None
+        self.importance_tracking = None
+        self.importance_trackers = {}
+        self._generation_reports = {}
     
     def set_mutation_rate(self, mutation_rate : float) -> None:
         self.gp.set_mutation_rate(mutation_rate)
@@ -96,81 +201,508 @@ class EvolutionaryModelDiscovery:
     def set_replications(self, replications : int) -> None:
         self.replications = replications
 
+    def set_seed(self, seed : int = None) -> None:
+        """
+        Seeds GP runs evolved in parallel processes (see evolve(parallel_runs=...)). Each 
+        run seeds the random and numpy.random generators of its process with its own child 
+        of numpy.random.SeedSequence(seed), recorded in a Seed factor scores column, so that 
+        runs differ from each other and an experiment can be repeated with the same seed. 
+        Each island (see set_islands) is seeded with its own child of the SeedSequence of 
+        its run. 
+        Runs evolved one after another in the main process use its generators as they are.
+
+        :param seed: int entropy of the seed sequence, None for fresh entropy every evolve
+        """
+        self.seed = seed
+
+    def set_racing(self, initial_replicates : int = None, top_fraction : float = 0.25, 
+                    confidence : float = 0.95) -> None:
+        """
+        Races the replicates of each rule (setup_commands given as List[List[str]]). 
+        Replicates are simulated in batches of initial_replicates and a rule stops getting 
+        further replicates once, with the given confidence, its fitness so far (aggregated 
+        by agg_func over the replicates run) cannot reach the top_fraction of the current 
+        population. Factor scores get a Replicates column 
+        with the number of replicates each rule was simulated with.
+
+        :param initial_replicates: int number of replicates per batch (at least 2), None disables racing
+        :param top_fraction: float fraction of the population a rule must be able to reach
+        :param confidence: float confidence of the check that stops simulating a rule
+        """
+        self.gp.set_racing(initial_replicates, top_fraction, confidence)
+
+    def set_multi_fidelity(self, ticks_fraction : float = None, promote_fraction : float = 0.5) -> None:
+        """
+        Pre-screens every generation with short simulations of ticks_fraction of 
+        ticks_to_run, and only simulates the promote_fraction of the generation with the 
+        best short simulation fitness for the full ticks_to_run. Individuals that are 
+        not promoted get the worst fitness of the promoted individuals of their generation 
+        for selection only, and are left out of the logbook statistics and hall of fame. 
+        Only full length results are written to the factor scores file, the short 
+        simulation results are written next to it to a _LowFidelity file with a Promoted column.
+
+        :param ticks_fraction: float fraction of ticks_to_run for pre-screening, None disables it
+        :param promote_fraction: float fraction of each generation promoted to full length simulations
+        """
+        self.gp.set_multi_fidelity(ticks_fraction, promote_fraction)
+
+    def set_surrogate(self, simulate_fraction : float = None, exploration_fraction : float = 0.1, 
+                    min_samples : int = 50) -> None:
+        """
+        Pre-screens offspring with a random forest surrogate that predicts fitness from 
+        factor presence scores, retrained after every generation once min_samples rules 
+        have been simulated. Only the simulate_fraction of each generation with the best 
+        predicted fitness, plus an exploration_fraction of the rest, are simulated; the 
+        others keep their predicted fitness for selection only and are not written to 
+        the factor scores, the logbook statistics or the hall of fame. Simulated rules 
+        get a Predicted_Fitness column to audit the surrogate.
+
+        :param simulate_fraction: float fraction of each generation simulated, None disables the surrogate
+        :param exploration_fraction: float fraction of the remaining offspring simulated anyway
+        :param min_samples: int number of simulated rules before the surrogate is used
+        """
+        self.gp.set_surrogate(simulate_fraction, exploration_fraction, min_samples)
+
+    def set_steady_state(self, steady_state : bool) -> None:
+        """
+        Enables asynchronous steady-state evolution. Instead of waiting for the slowest 
+        simulation of each generation, a new offspring is bred by tournament selection 
+        and submitted as soon as an evaluation worker frees up, replacing the worst 
+        individual once evaluated. Every population size evaluations are tagged as one 
+        Gen, and factor scores get a Birth column with the order of evaluation.
+
+        :param steady_state: bool True for steady-state evolution, False for generational
+        """
+        self.gp.set_steady_state(steady_state)
+
+    def set_reevaluation(self, reevaluation : str = "keep", collapse_duplicates : bool = True) -> None:
+        """
+        Sets how offspring that were neither crossed over nor mutated are evaluated in
+        generational evolution. "keep" reuses their fitness without simulating them,
+        "resample" simulates them again and averages their fitness over all their
+        simulations (for noisy models), "reevaluate" simulates them again and replaces
+        their fitness. Every offspring gets a factor scores row, kept rules with a Kept 
+        column and resampled rules with a Resampled column.
+
+        :param reevaluation: str one of "keep", "resample" or "reevaluate"
+        :param collapse_duplicates: bool True to simulate identical rules evaluated together only once,
+                                    or equivalent rules with @commutative and @associative factors
+        """
+        self.gp.set_reevaluation(reevaluation, collapse_duplicates)
+
+    def set_islands(self, num_islands : int, migration_interval : int = 5, 
+                    migration_size : int = 1, topology : Union[str, Dict[int, List[int]]] = 'ring') -> None:
+        """
+        Evolves each GP run as an island model: num_islands populations of the set 
+        population size, each evolved in its own process with its own num_procs 
+        evaluation workers. Every migration_interval generations the migration_size best 
+        individuals of each island replace the worst individuals of its target islands.
+        Factor scores get an Island column. Each island is seeded separately, see set_seed.
+
+        :param num_islands: int number of islands, 1 disables the island model
+        :param migration_interval: int number of generations between migrations
+        :param migration_size: int number of individuals sent to each target island
+        :param topology: 'ring', 'complete' or Dict of island index to target island indices
+        """
+        get_migration_targets(topology, num_islands)
+        self.islands = {'num_islands' : num_islands, 
+                        'migration_interval' : migration_interval,
+                        'migration_size' : migration_size, 
+                        'topology' : topology}
+
+    def set_importance_tracking(self, trees_per_generation : int = 50, tolerance : float = 0.01, 
+                    stable_generations : int = 3, stop_when_stable : bool = False, 
+                    permutation_samples : int = None) -> None:
+        """
+        Tracks the importance of the factors while evolving, with an ImportanceTracker per 
+        GP run that grows a random forest by trees_per_generation trees after each 
+        generation, see get_importance_tracker. The importance ranking is stable once the 
+        rank correlation of the most important factors between generations has been at 
+        least 1 - tolerance for stable_generations generations. Runs resumed from a 
+        snapshot are tracked from the generation they are resumed at. With islands (see 
+        set_islands), the factor scores of all islands of a run are tracked together, once 
+        every island has finished the generation.
+
+        :param trees_per_generation: int number of trees added after each generation, 0 disables tracking
+        :param tolerance: float tolerance of the rank correlation between generations
+        :param stable_generations: int number of consecutive stable generations
+        :param stop_when_stable: bool True to end each GP run once its importance ranking is 
+                                    stable. Not supported with parallel_runs > 1 or islands.
+        :param permutation_samples: int number of sampled rules permutation accuracy importance 
+                                    is also estimated on after each generation
+        """
+        self.importance_tracking = None
+        if trees_per_generation > 0:
+            self.importance_tracking = {'trees_per_generation' : trees_per_generation,
+                                        'tolerance' : tolerance,
+                                        'stable_generations' : stable_generations,
+                                        'stop_when_stable' : stop_when_stable,
+                                        'permutation_samples' : permutation_samples}
+
+    def get_importance_tracker(self, run : int = None) -> 'ImportanceTracker':
+        """
+        :param run: int GP run, the last run tracked if None
+        :returns: ImportanceTracker of the run, see set_importance_tracking
+        """
+        if len(self.importance_trackers) == 0:
+            raise Exception(('Importance tracking not enabled or GP not run. Do '
+                                    'EvolutionaryModelDiscovery.set_importance_tracking() '
+                                    'and EvolutionaryModelDiscovery.evolve() first.'))
+        return self.importance_trackers[max(self.importance_trackers) if run is None else run]
+
+    def _track_importances(self, run : int, gen : int, generation_scores : pd.DataFrame, 
+                    num_reports : int = 1) -> None:
+        """
+        Updates the ImportanceTracker of a run with the factor scores of a generation, sent 
+        in num_reports parts, such as one per island. The parts are tracked together as one 
+        generation once all of them have arrived.
+        """
+        if self.importance_tracking is None:
+            return
+        if num_reports > 1:
+            reports = self._generation_reports.setdefault((run, gen), [])
+            reports.append(generation_scores)
+            if len(reports) < num_reports:
+                return
+            generation_scores = pd.concat(self._generation_reports.pop((run, gen)), 
+                                    ignore_index=True)
+        if run not in self.importance_trackers:
+            ImportanceTracker = _load_lazy_class('ImportanceTracker')
+            self.importance_trackers[run] = ImportanceTracker(
+                self.model_factors.measureable_factors,
+                trees_per_generation=self.importance_tracking['trees_per_generation'],
+                tolerance=self.importance_tracking['tolerance'],
+                stable_generations=self.importance_tracking['stable_generations'],
+                permutation_samples=self.importance_tracking['permutation_samples'])
+        self.importance_trackers[run].update(gen, generation_scores)
+
     def set_population_size(self, population_size : int) -> None:
         self.gp.set_population_size(population_size)
 
     def set_objective_function(self, objective_function : Callable) -> None:
+        """
+        Sets the callable translating the measurements of a simulation into fitness.
+        An IncrementalObjective receives the measurements every chunk_ticks ticks 
+        while the simulation runs, and can stop hopeless simulations early.
+
+        :param objective_function: Callable taking a pandas DataFrame of measurements 
+                                        and returning fitness, or an IncrementalObjective
+        """
         self.gp.set_objective_function(objective_function)
 
     def set_depth(self, min : int, max : int) -> None:
         self.gp.set_depth(min,max)
 
+    def set_workspace_max_uses(self, workspace_max_uses : int) -> None:
+        """
+        Sets how many simulations a pooled NetLogo workspace runs before it is 
+        replaced by a fresh one. Values below 1 keep workspaces for the whole evolution.
+
+        :param workspace_max_uses: int number of simulations per workspace
+        """
+        self.gp.set_workspace_max_uses(workspace_max_uses)
+
+    def set_fitness_cache(self, cache_path : str = None, cache_version : str = None) -> None:
+        """
+        Enables reuse of the fitness of rules that have already been simulated. 
+        Cached records are keyed by the rule and a hash of the model, setup commands, 
+        ticks and objective function, so changing any of these invalidates them. The 
+        objective function is hashed by its bytecode, closure and the globals it refers 
+        to. Data files read by the model or the objective function are not hashed, 
+        change cache_version when they change. Objective functions referring to values 
+        that cannot be pickled are not cached, with a warning. Rules served from the 
+        cache are counted in the "cached" logbook column instead of "nevals".
+
+        :param cache_path: str path to an on disk fitness store shared across runs and 
+                                sessions. If None, fitness is only cached in memory.
+        :param cache_version: str salt of the cache keys, records cached under another 
+                                version are not reused
+        """
+        self.gp.set_fitness_cache(FitnessCache(cache_path, cache_version))
+
     def set_factor_scores_file_name (self, name : str) -> None:
+        """
+        :param name: str path of the factor scores file. A .npz path stores the factor 
+                        presence scores as a sparse matrix with a column vocabulary, see 
+                        SparseFactorScores, instead of a .csv file.
+        """
         self.factor_scores_file_name = str(Path(name))
 
     def set_is_minimize(self, is_minimize : bool) -> None:
         self.gp.set_is_minimize(is_minimize)
         
-    def _parse_model_into_factors(self) -> 'EvolutionaryModelDiscovery.ModelFactors':
+    def _parse_model_into_factors(self) -> tuple:
         """
         Parses NetLogo model and EMD annotations into Python classes 
-        for syntax tree representation
+        for syntax tree representation, built in memory
         """
 
         netlogo_writer = NetLogoWriter(self.model_init_data['model_path'])
-        #  Evolutionary Model Discovery Initializing
-        #Reset Factors files
-        create_model_factors_file()
         # Parsing NetLogo model into syntax tree primitives and Python classes
-        # by reading in annotations from .nlogo file and generate EMD factors
-        factor_generator = FactorGenerator()
-        factor_generator.generate(netlogo_writer.get_factors_file_path())
-        # Generate the ModelFactors.py file, Loading parsed primitives as Python classes
-        primitive_set_generator = PrimitiveSetGenerator()
-        primitive_set_generator.generate(factor_generator.get_factors(),netlogo_writer.get_EMD_return_type())
-        module_name = get_model_factors_module_name()
-        ModelFactors = importlib.import_module(f'EvolutionaryModelDiscovery.{module_name}')        
-        return ModelFactors, netlogo_writer
+        # by reading in annotations from .nlogo file
+        model_factors = load_model_factors(netlogo_writer.get_factors_file_path(), 
+                                            netlogo_writer.get_EMD_return_type())
+        return model_factors, netlogo_writer
     
-    def evolve(self, num_procs : int = -1) -> pd.DataFrame:
+    def set_checkpoint(self, checkpoint_path : str, checkpoint_interval : int = 1) -> None:
+        """
+        Snapshots the state of the genetic program (population, hall of fame, logbook, 
+        factor scores, generation and random number generator states) every 
+        checkpoint_interval generations, so that evolve(resume_from=checkpoint_path) can 
+        continue an interrupted experiment.
+
+        :param checkpoint_path: str path of the snapshot file, overwritten by each snapshot
+        :param checkpoint_interval: int number of generations between snapshots
+        """
+        self.gp.set_checkpoint(checkpoint_path, checkpoint_interval)
+
+    def evolve(self, num_procs : int = -1, replicate_procs : int = 1, 
+                    resume_from : str = None, parallel_runs : int = 1) -> pd.DataFrame:
         '''
         Conduct evolution using initialized genetic program
 
-        :returns: pandas DataFrame with genetic program results
+        :param num_procs: int number of simulations run concurrently (default: number of CPUs)
+        :param replicate_procs: int number of replicates of each rule simulated concurrently. 
+                                    num_procs is split into num_procs // replicate_procs rules 
+                                    evaluated at a time, each running up to replicate_procs 
+                                    of its setup_commands replicates at once.
+        :param resume_from: str path to a snapshot taken by set_checkpoint. Evolution continues
+                                    from the GP run and generation the snapshot was taken at, 
+                                    and factor scores written after the snapshot are discarded.
+        :param parallel_runs: int number of GP runs (see set_replications) evolved at the same 
+                                    time, each in its own process. The runs share num_procs, 
+                                    so that a run in its last few evaluations leaves the 
+                                    remaining simulation slots to the others. Factor scores of 
+                                    all runs are written to the same file as generations finish.
+                                    Each run is seeded separately, see set_seed.
+                                    Snapshots are not taken and resume_from is not supported 
+                                    when parallel_runs > 1 or with islands (see set_islands).
+        :returns: pandas DataFrame with genetic program results. With parallel_runs > 1 
+                                    or islands it holds the results of all runs.
         '''
         # Begining evolution
-        for run in range(self.replications):
-            print('--- Starting GP Run {} ---'.format(run))             
-            self.population, self.logbook, self.factor_scores = self.gp.evolve(num_procs=num_procs)
-            self.factor_scores['Run'] = run
-            for priority_col in ['Rule','Gen','Run']:
-                col = self.factor_scores[priority_col]
-                self.factor_scores.drop(labels=[priority_col], axis=1,inplace = True)
-                self.factor_scores.insert(0, priority_col, col)
-            if Path(self.factor_scores_file_name).is_file():
-                old_factor_scores = pd.read_csv(self.factor_scores_file_name)
-                old_factor_scores.append(self.factor_scores,ignore_index=True, 
-                            sort=False).to_csv(self.factor_scores_file_name,index=False)
-            else:
-                self.factor_scores.to_csv(self.factor_scores_file_name,  header=True,index=False)
+        self.importance_trackers = {}
+        self._generation_reports = {}
+        parallel_runs = min(parallel_runs, self.replications)
+        num_islands = self.islands['num_islands']
+        if parallel_runs > 1 or num_islands > 1:
+            if resume_from is not None:
+                raise ValueError('resume_from is not supported with parallel_runs > 1 or islands.')
+            if parallel_runs > 1 and num_islands > 1:
+                raise ValueError('parallel_runs > 1 is not supported with islands.')
+            if self.importance_tracking is not None and self.importance_tracking['stop_when_stable']:
+                raise ValueError(('Stopping when importances are stable is not supported with '
+                                    'parallel_runs > 1 or islands.'))
+            factor_scores_writer = open_factor_scores_writer(self.factor_scores_file_name)
+            low_fidelity_writer = open_factor_scores_writer(get_low_fidelity_path(self.factor_scores_file_name))
+            try:
+                if num_islands > 1:
+                    self._evolve_islands(num_procs, replicate_procs, factor_scores_writer, 
+                                    low_fidelity_writer)
+                else:
+                    self._evolve_parallel(num_procs, replicate_procs, parallel_runs, 
+                                    factor_scores_writer, low_fidelity_writer)
+            finally:
+                factor_scores_writer.finalize()
+                low_fidelity_writer.finalize()
+            print('--- Genetic program runs finished, output written to {} ---'.format(
+                                                    self.factor_scores_file_name))
+            return self.factor_scores
+        factor_scores_writer = open_factor_scores_writer(self.factor_scores_file_name)
+        low_fidelity_writer = open_factor_scores_writer(get_low_fidelity_path(self.factor_scores_file_name))
+        start_run = 0
+        resume_state = None
+        if resume_from is not None:
+            resume_state = load_checkpoint(resume_from)
+            start_run = resume_state['metadata']['run']
+            factor_scores_writer.truncate(resume_state['metadata']['factor_scores_data_size'])
+            low_fidelity_writer.truncate(resume_state['metadata'].get('low_fidelity_data_size', 0))
+        try:
+            for run in range(start_run, self.replications):
+                print('--- Starting GP Run {} ---'.format(run))
+
+                def checkpoint_metadata() -> Dict[str, Any]:
+                    return {'run' : run, 
+                            'factor_scores_data_size' : factor_scores_writer.get_data_size(),
+                            'low_fidelity_data_size' : low_fidelity_writer.get_data_size()}
+
+                def write_generation(gen : int, generation_scores : pd.DataFrame) -> None:
+                    # Factor scores are written as soon as each generation finishes
+                    generation_scores['Run'] = run
+                    factor_scores_writer.append(generation_scores)
+                    self._track_importances(run, gen, generation_scores)
+
+                def importances_stable(gen : int) -> bool:
+                    return (self.importance_tracking is not None 
+                            and self.importance_tracking['stop_when_stable']
+                            and run in self.importance_trackers 
+                            and self.importance_trackers[run].is_stable())
+
+                def write_low_fidelity_generation(gen : int, generation_scores : pd.DataFrame) -> None:
+                    generation_scores['Run'] = run
+                    low_fidelity_writer.append(generation_scores)
+
+                self.population, self.logbook, self.factor_scores = self.gp.evolve(
+                                        num_procs=num_procs, replicate_procs=replicate_procs,
+                                        generation_callback=write_generation,
+                                        low_fidelity_callback=write_low_fidelity_generation,
+                                        resume_from=resume_state,
+                                        checkpoint_metadata=checkpoint_metadata,
+                                        stop_condition=importances_stable)
+                resume_state = None
+                self.factor_scores['Run'] = run
+                for priority_col in ['Rule','Gen','Run']:
+                    col = self.factor_scores[priority_col]
+                    self.factor_scores.drop(labels=[priority_col], axis=1,inplace = True)
+                    self.factor_scores.insert(0, priority_col, col)
+        finally:
+            factor_scores_writer.finalize()
+            low_fidelity_writer.finalize()
         print('--- Genetic program runs finished, output written to {} ---'.format(
                                                 self.factor_scores_file_name))
         return self.factor_scores
+
+    def _evolve_parallel(self, num_procs : int, replicate_procs : int, parallel_runs : int, 
+                    factor_scores_writer : FactorScoresWriter, 
+                    low_fidelity_writer : FactorScoresWriter) -> None:
+        """
+        Evolves the GP runs in parallel_runs processes sharing num_procs simulation slots, 
+        writing the factor scores of each generation as soon as a run sends them.
+        """
+        num_procs = multiprocessing.cpu_count() if num_procs < 1 else num_procs
+        run_seeds = np.random.SeedSequence(self.seed).spawn(self.replications)
+        # Spawned rather than forked processes, so that each opens its own NetLogo connection
+        context = multiprocessing.get_context('spawn')
+        with context.Manager() as manager:
+            generation_queue = manager.Queue()
+            executor = ProcessPoolExecutor(max_workers=parallel_runs, mp_context=context,
+                                    initializer=_init_run_process,
+                                    initargs=(self.netlogo_path, self.model_init_data, 
+                                                self.model_factors, self.gp.get_config(),
+                                                manager.BoundedSemaphore(num_procs), 
+                                                generation_queue))
+            try:
+                run_results, all_scores = self._collect_runs(executor, generation_queue, 
+                                    factor_scores_writer, low_fidelity_writer,
+                                    {run : (run, num_procs, replicate_procs, None, run_seeds[run]) 
+                                        for run in range(self.replications)})
+            except BaseException:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+            executor.shutdown()
+        self.population, self.logbook = run_results[self.replications - 1]
+        self._set_parallel_factor_scores(all_scores)
+
+    def _evolve_islands(self, num_procs : int, replicate_procs : int, 
+                    factor_scores_writer : FactorScoresWriter, 
+                    low_fidelity_writer : FactorScoresWriter) -> None:
+        """
+        Evolves each GP run as self.islands['num_islands'] populations in separate processes, 
+        each evaluating num_procs simulations at a time, that exchange their best individuals.
+        """
+        num_procs = multiprocessing.cpu_count() if num_procs < 1 else num_procs
+        num_islands = self.islands['num_islands']
+        targets = get_migration_targets(self.islands['topology'], num_islands)
+        island_seeds = _get_island_seeds(self.seed, self.replications, num_islands)
+        # Spawned rather than forked processes, so that each opens its own NetLogo connection
+        context = multiprocessing.get_context('spawn')
+        all_scores = []
+        with context.Manager() as manager:
+            generation_queue = manager.Queue()
+            executor = ProcessPoolExecutor(max_workers=num_islands, mp_context=context,
+                                    initializer=_init_run_process,
+                                    initargs=(self.netlogo_path, self.model_init_data, 
+                                                self.model_factors, self.gp.get_config(), None, generation_queue))
+            try:
+                for run in range(self.replications):
+                    # Fresh inboxes, so that no immigrants are carried over between runs
+                    inboxes = [manager.Queue() for _ in range(num_islands)]
+                    island_results, run_scores = self._collect_runs(executor, generation_queue,
+                                    factor_scores_writer, low_fidelity_writer,
+                                    {island : (run, num_procs, replicate_procs, 
+                                                Migrator(island, inboxes, targets.get(island, []),
+                                                    self.islands['migration_interval'],
+                                                    self.islands['migration_size']),
+                                                island_seeds[run][island])
+                                        for island in range(num_islands)})
+                    all_scores.extend(run_scores)
+            except BaseException:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+            executor.shutdown()
+        self.population = [ind for island in sorted(island_results) 
+                                    for ind in island_results[island][0]]
+        self.logbook = [island_results[island][1] for island in sorted(island_results)]
+        self._set_parallel_factor_scores(all_scores)
+
+    def _collect_runs(self, executor : ProcessPoolExecutor, generation_queue : Any, 
+                    factor_scores_writer : FactorScoresWriter, 
+                    low_fidelity_writer : FactorScoresWriter,
+                    tasks : Dict[Any, tuple]) -> tuple:
+        """
+        Submits _evolve_run tasks and writes the factor scores, and low-fidelity factor 
+        scores, of each generation the tasks send until all of them have finished.
+
+        :returns: Dict of task results by task key and List of generation factor scores
+        """
+        futures = {executor.submit(_evolve_run, *args) : key for key, args in tasks.items()}
+        pending = set(futures)
+        results = {}
+        all_scores = []
+        while len(pending) > 0 or not generation_queue.empty():
+            try:
+                low_fidelity, generation_scores = generation_queue.get(timeout=1)
+            except queue.Empty:
+                # Tasks only finish after sending all of their generations
+                for future in [future for future in pending if future.done()]:
+                    results[futures[future]] = future.result()
+                    pending.remove(future)
+                continue
+            if low_fidelity:
+                low_fidelity_writer.append(generation_scores)
+                continue
+            factor_scores_writer.append(generation_scores)
+            all_scores.append(generation_scores)
+            if len(generation_scores) > 0:
+                # Islands of a run each send their part of every generation
+                self._track_importances(int(generation_scores['Run'].iloc[0]), 
+                                        int(generation_scores['Gen'].max()), generation_scores,
+                                        self.islands['num_islands'] 
+                                            if 'Island' in generation_scores.columns else 1)
+        return results, all_scores
+
+    def _set_parallel_factor_scores(self, all_scores : List[pd.DataFrame]) -> None:
+        self.factor_scores = pd.concat(all_scores, ignore_index=True)
+        sort_cols = [col for col in ['Run', 'Island'] if col in self.factor_scores.columns]
+        self.factor_scores = self.factor_scores.sort_values(by=sort_cols, kind='stable', 
+                                    ignore_index=True)
+        for priority_col in ['Rule','Gen'] + sort_cols[::-1]:
+            col = self.factor_scores[priority_col]
+            self.factor_scores.drop(labels=[priority_col], axis=1,inplace = True)
+            self.factor_scores.insert(0, priority_col, col)
         
     def get_factor_importances_calculator(self,
-                                 factor_scores : Union[pd.DataFrame, str] = None) -> FactorImportances:
+                                 factor_scores : Union[pd.DataFrame, str] = None,
+                                 num_trees : Union[int, str] = 520) -> 'FactorImportances':
         """
         Returns FactorImportances object with trained Random Forest that can be used 
         to calculate Gini importance and permutation accuracy importance of factors.
 
         :param factor_scores: pandas dataframe or csv file location of factor scores generated by 
-                                    genetic program.
+                                    genetic program. Random forests trained on the factor scores of the 
+                                    last run or of a factor scores file are saved next to that file 
+                                    and reused by later calculators.
+        :param num_trees: int number of trees of the random forests, or "auto" to grow them until 
+                                    their out-of-bag error and importance ranking converge.
         """
+        FactorImportances = _load_lazy_class('FactorImportances')
         try:
             if factor_scores is None:
-                return FactorImportances(self.factor_scores)
+                return FactorImportances(self.factor_scores, self.model_factors, 
+                                         get_random_forests_path(self.factor_scores_file_name),
+                                         num_trees=num_trees)
             else:
-                return FactorImportances(factor_scores)
+                return FactorImportances(factor_scores, self.model_factors, num_trees=num_trees)
         except AttributeError:
             raise Exception(('Either factor scores do not exist or GP not run. Do '
                                     'EvolutionaryModelDiscovery.evolve() first.'))
@@ -36,7 +36,6 @@ setup(
         "pandas",
         "networkx",
         "scipy",
-        "scikit-learn",
-        "eli5"
+        "scikit-learn"
     ]
 )
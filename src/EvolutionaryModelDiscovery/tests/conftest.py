@@ -0,0 +1,50 @@
+from pathlib import Path
+import importlib.util
+import sys
+import types
+
+import pytest
+
+# EvolutionaryModelDiscovery imports nl4py, which needs a NetLogo installation.
+# Without it, a stand in is installed that fails only when NetLogo is started, so
+# that the tests that do not run models still run.
+if importlib.util.find_spec("nl4py") is None:
+
+    def _netlogo_unavailable(*args, **kwargs):
+        raise RuntimeError("nl4py is not installed, NetLogo cannot be started.")
+
+    nl4py = types.ModuleType("nl4py")
+    nl4py.initialize = _netlogo_unavailable
+    nl4py.create_headless_workspace = _netlogo_unavailable
+    sys.modules["nl4py"] = nl4py
+
+MODEL_PATH = (
+    Path(__file__).parents[3] / "examples" / "Polarization" / "polarization.nlogo"
+)
+
+
+@pytest.fixture
+def model_init_data():
+    return {
+        "model_path": str(MODEL_PATH),
+        "setup_commands": ["setup"],
+        "measurement_commands": ["ticks", "polarization"],
+        "ticks_to_run": 20,
+        "go_command": "go",
+        "agg_func": sum,
+    }
+
+
+@pytest.fixture
+def gp(model_init_data):
+    from EvolutionaryModelDiscovery.NetLogoWriter import NetLogoWriter
+    from EvolutionaryModelDiscovery.ModelFactors import load_model_factors
+    from EvolutionaryModelDiscovery.SimpleDEAPGP import SimpleDEAPGP
+
+    netlogo_writer = NetLogoWriter(model_init_data["model_path"])
+    model_factors = load_model_factors(
+        netlogo_writer.get_factors_file_path(), netlogo_writer.get_EMD_return_type()
+    )
+    gp = SimpleDEAPGP(model_init_data, model_factors, netlogo_writer)
+    gp.set_depth(1, 6)
+    return gp
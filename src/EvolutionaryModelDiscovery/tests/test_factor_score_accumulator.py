@@ -0,0 +1,74 @@
+import pickle
+
+import numpy as np
+
+from EvolutionaryModelDiscovery.FactorScoreAccumulator import FactorScoreAccumulator
+
+
+def fill(accumulator, num_rows):
+    for row in range(num_rows):
+        # A new factor interaction column every third row
+        presence = {"fa": 1, "fb": -row % 3, f"['fc', 'f{row // 3}']": 1}
+        accumulator.append(presence, Gen=row // 10, Fitness=float(row))
+
+
+def test_rows_and_columns_grow():
+    accumulator = FactorScoreAccumulator(initial_rows=2, initial_columns=2)
+    fill(accumulator, 30)
+    factor_scores = accumulator.to_dataframe()
+    assert len(accumulator) == 30
+    assert factor_scores.shape == (30, 2 + 10 + 2)
+    assert list(factor_scores.columns[:3]) == ["fa", "fb", "['fc', 'f0']"]
+    assert factor_scores["fa"].tolist() == [1] * 30
+    assert factor_scores["['fc', 'f9']"].tolist() == [0] * 27 + [1] * 3
+    assert factor_scores["Fitness"].tolist() == [float(row) for row in range(30)]
+
+
+def test_new_fields_are_none_in_earlier_rows():
+    accumulator = FactorScoreAccumulator()
+    accumulator.append({"fa": 1}, Gen=0)
+    accumulator.append({"fa": 1}, Gen=1, Kept=True)
+    factor_scores = accumulator.to_dataframe()
+    assert factor_scores["Kept"].tolist() == [None, True]
+
+
+def test_scores_overflowing_int8_widen_the_dtype():
+    accumulator = FactorScoreAccumulator()
+    accumulator.append({"fa": 1}, Gen=0)
+    accumulator.append({"fa": 300, "fb": -40000}, Gen=0)
+    factor_scores = accumulator.to_dataframe()
+    assert factor_scores["fa"].tolist() == [1, 300]
+    assert factor_scores["fb"].tolist() == [0, -40000]
+
+
+def test_spilled_rows_are_reloaded(tmp_path):
+    in_memory = FactorScoreAccumulator(initial_rows=4, initial_columns=4)
+    spilling = FactorScoreAccumulator(
+        initial_rows=4, initial_columns=4, memory_limit=32, spill_dir=tmp_path
+    )
+    fill(in_memory, 30)
+    fill(spilling, 30)
+    assert len(list(tmp_path.iterdir())) > 0
+    expected = in_memory.to_dataframe()
+    assert spilling.to_dataframe().equals(expected)
+    assert spilling.to_dataframe(start=25).equals(
+        expected.iloc[25:].reset_index(drop=True)
+    )
+    sparse_scores = spilling.to_sparse(start=7)
+    assert np.array_equal(
+        sparse_scores.get_presence().toarray(),
+        expected.iloc[7:][spilling.get_columns()].to_numpy(),
+    )
+    spilling.close()
+    assert len(list(tmp_path.iterdir())) == 0
+
+
+def test_pickled_accumulator_keeps_spilled_rows(tmp_path):
+    accumulator = FactorScoreAccumulator(
+        initial_rows=4, memory_limit=32, spill_dir=tmp_path / "spill"
+    )
+    fill(accumulator, 30)
+    expected = accumulator.to_dataframe()
+    copy = pickle.loads(pickle.dumps(accumulator))
+    accumulator.close()
+    assert copy.to_dataframe().equals(expected)
@@ -0,0 +1,78 @@
+from pathlib import Path
+
+import pandas as pd
+
+from EvolutionaryModelDiscovery.FactorScoresWriter import (
+    FactorScoresWriter,
+    get_schema_path,
+    open_factor_scores_writer,
+    read_factor_scores,
+)
+from EvolutionaryModelDiscovery.SparseFactorScores import SparseFactorScores
+
+
+def get_factor_scores(gen, **presence):
+    return pd.DataFrame(
+        [dict(presence, Fitness=0.5, Rule="rule", Gen=gen, Run=0)]
+    )
+
+
+def test_header_starts_with_the_priority_columns(tmp_path):
+    path = tmp_path / "FactorScores.csv"
+    FactorScoresWriter(path).append(get_factor_scores(0, fa=1))
+    assert Path(path).read_text().splitlines()[0] == "Run,Gen,Rule,fa,Fitness"
+
+
+def test_new_columns_are_readable_before_finalizing(tmp_path):
+    path = str(tmp_path / "FactorScores.csv")
+    writer = FactorScoresWriter(path)
+    writer.append(get_factor_scores(0, fa=1))
+    writer.append(get_factor_scores(1, fb=-1))
+    assert Path(get_schema_path(path)).is_file()
+    factor_scores = read_factor_scores(path)
+    assert factor_scores.columns.tolist() == writer.get_columns()
+    assert factor_scores["fa"].fillna(0).tolist() == [1, 0]
+    assert factor_scores["fb"].fillna(0).tolist() == [0, -1]
+    writer.finalize()
+    assert not Path(get_schema_path(path)).is_file()
+    assert pd.read_csv(path).equals(factor_scores)
+
+
+def test_reopened_file_is_appended_to(tmp_path):
+    path = str(tmp_path / "FactorScores.csv")
+    writer = FactorScoresWriter(path)
+    writer.append(get_factor_scores(0, fa=1))
+    # Interrupted before finalizing, new columns only in the schema file
+    writer.append(get_factor_scores(1, fb=1))
+    writer = FactorScoresWriter(path)
+    writer.append(get_factor_scores(2, fa=2, fc=1))
+    writer.finalize()
+    factor_scores = pd.read_csv(path)
+    assert factor_scores["Gen"].tolist() == [0, 1, 2]
+    assert factor_scores.columns.tolist() == [
+        "Run", "Gen", "Rule", "fa", "Fitness", "fb", "fc"
+    ]
+
+
+def test_truncate_drops_later_rows(tmp_path):
+    path = str(tmp_path / "FactorScores.csv")
+    writer = FactorScoresWriter(path)
+    writer.append(get_factor_scores(0, fa=1))
+    data_size = writer.get_data_size()
+    writer.append(get_factor_scores(1, fa=1))
+    writer.truncate(data_size)
+    writer.append(get_factor_scores(2, fa=1))
+    assert read_factor_scores(path)["Gen"].tolist() == [0, 2]
+
+
+def test_sparse_writer_merges_parts(tmp_path):
+    path = str(tmp_path / "FactorScores.npz")
+    writer = open_factor_scores_writer(path)
+    writer.append(get_factor_scores(0, fa=1))
+    writer.append(get_factor_scores(1, fb=-1))
+    writer.append(get_factor_scores(2, fa=1))
+    writer.truncate(2)
+    writer.finalize()
+    factor_scores = SparseFactorScores.load(path).to_dataframe()
+    assert factor_scores["Gen"].tolist() == [0, 1]
+    assert factor_scores["fb"].tolist() == [0, -1]
@@ -0,0 +1,74 @@
+import pickle
+
+from EvolutionaryModelDiscovery import ABMEvaluator, FitnessCache
+
+RECORD = {"Fitness": (0.5,), "fa": 1}
+
+
+def test_rules_differing_in_whitespace_share_a_record():
+    cache = FitnessCache()
+    cache.put("( fa  (1) )\n", "context", RECORD)
+    assert cache.get("( fa (1) )", "context") == RECORD
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_records_are_keyed_by_context_and_version():
+    cache = FitnessCache()
+    cache.put("rule", "context", RECORD)
+    assert cache.get("rule", "other context") is None
+    assert FitnessCache.make_key("rule", "context") != FitnessCache.make_key(
+        "rule", "context", "v2"
+    )
+    assert (cache.hits, cache.misses) == (0, 1)
+
+
+def test_records_are_copies():
+    cache = FitnessCache()
+    cache.put("rule", "context", RECORD)
+    cache.get("rule", "context")["fa"] = 2
+    assert cache.get("rule", "context") == RECORD
+
+
+def test_records_persist_across_sessions(tmp_path):
+    cache_path = tmp_path / "cache" / "fitness.sqlite"
+    cache = FitnessCache(cache_path, "v1")
+    cache.put("rule", "context", RECORD)
+    cache.close()
+    assert FitnessCache(cache_path, "v1").get("rule", "context") == RECORD
+    assert len(FitnessCache(cache_path, "v1")) == 1
+    # Records stored under another version are not reused
+    assert FitnessCache(cache_path, "v2").get("rule", "context") is None
+
+
+def test_clear_removes_records_on_disk(tmp_path):
+    cache_path = tmp_path / "fitness.sqlite"
+    cache = FitnessCache(cache_path)
+    cache.put("rule", "context", RECORD)
+    cache.clear()
+    assert len(cache) == 0
+    assert FitnessCache(cache_path).get("rule", "context") is None
+
+
+def test_unpickled_cache_reopens_its_store(tmp_path):
+    cache = FitnessCache(tmp_path / "fitness.sqlite")
+    cache.put("rule", "context", RECORD)
+    copy = pickle.loads(pickle.dumps(cache))
+    copy.put("other rule", "context", RECORD)
+    assert copy.get("rule", "context") == RECORD
+    assert len(cache) == 2
+
+
+def test_cache_hits_are_not_counted_as_evaluations(gp, monkeypatch):
+    monkeypatch.setattr(
+        ABMEvaluator, "simulate", lambda *args, new_rule: (float(len(new_rule)),)
+    )
+    monkeypatch.setattr(ABMEvaluator, "FITNESS_CACHE", None)
+    gp.set_fitness_cache(FitnessCache())
+    gp.set_population_size(10)
+    gp.set_generations(3)
+    gp.set_reevaluation("reevaluate")
+    population, logbook, factor_scores = gp.evolve(num_procs=1, verbose=False)
+    hits = ABMEvaluator.get_fitness_cache().hits
+    assert hits > 0
+    assert sum(logbook.select("cached")) == hits
+    assert sum(logbook.select("nevals")) + hits == 10 * 4
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from EvolutionaryModelDiscovery import ImportanceTracker
+
+FACTORS = ["fa", "fb", "fc"]
+
+
+def get_generation_scores(gen, num_rules=40):
+    rng = np.random.default_rng(gen)
+    generation_scores = pd.DataFrame(
+        rng.integers(0, 3, size=(num_rules, len(FACTORS))), columns=FACTORS
+    )
+    # Factor interactions are not tracked
+    generation_scores["['fa', 'fb']"] = 1
+    generation_scores["Fitness"] = (
+        3.0 * generation_scores["fa"] + generation_scores["fb"]
+    )
+    generation_scores["Gen"] = gen
+    return generation_scores
+
+
+def test_forest_grows_by_generation():
+    tracker = ImportanceTracker(FACTORS, trees_per_generation=5)
+    for gen in range(3):
+        tracker.update(gen, get_generation_scores(gen))
+    assert tracker.get_num_trees() == 15
+    history = tracker.get_history()
+    assert history.columns.tolist() == ["Gen", "Rows", "Ranking_Correlation"] + FACTORS
+    assert history["Rows"].tolist() == [40, 80, 120]
+    assert np.isnan(history["Ranking_Correlation"][0])
+    assert history.loc[2, "fa"] > history.loc[2, "fb"] > history.loc[2, "fc"]
+    gini_importances = tracker.get_gini_importances()
+    assert gini_importances.shape == (15, 3)
+    assert gini_importances.columns[-1] == "fa"
+
+
+def test_rules_without_a_finite_fitness_are_skipped():
+    tracker = ImportanceTracker(FACTORS, trees_per_generation=5)
+    generation_scores = get_generation_scores(0)
+    generation_scores.loc[:9, "Fitness"] = np.nan
+    tracker.update(0, generation_scores)
+    tracker.update(1, generation_scores.iloc[:10])
+    assert tracker.get_history()["Rows"].tolist() == [30]
+
+
+def test_ranking_becomes_stable():
+    tracker = ImportanceTracker(FACTORS, trees_per_generation=5, stable_generations=2)
+    stable = []
+    for gen in range(6):
+        tracker.update(gen, get_generation_scores(gen))
+        stable.append(tracker.is_stable())
+    assert not stable[0]
+    assert stable[-1]
+    assert stable.index(True) >= 2
+
+
+def test_permutation_importances_are_tracked_when_sampled():
+    tracker = ImportanceTracker(FACTORS, trees_per_generation=5)
+    tracker.update(0, get_generation_scores(0))
+    assert tracker.get_permutation_history().shape == (0, 4)
+    tracker = ImportanceTracker(
+        FACTORS, trees_per_generation=5, permutation_samples=20
+    )
+    tracker.update(0, get_generation_scores(0))
+    tracker.update(1, get_generation_scores(1))
+    permutation_history = tracker.get_permutation_history()
+    assert permutation_history["Gen"].tolist() == [0, 1]
+    assert permutation_history.loc[1, "fa"] > permutation_history.loc[1, "fc"]
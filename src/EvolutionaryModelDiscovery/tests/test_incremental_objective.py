@@ -0,0 +1,51 @@
+import pytest
+
+from EvolutionaryModelDiscovery import IncrementalObjective
+from EvolutionaryModelDiscovery.ABMEvaluator import run_incremental
+
+REPORTERS = ["ticks", "count turtles"]
+
+
+class AbsoluteStopWorkspace:
+    """
+    Stands in for a NetLogo workspace whose schedule_reporters runs the model until
+    the absolute stop tick, or until the model stops on its own at halt_tick.
+    """
+
+    def __init__(self, halt_tick=None):
+        self.ticks = 0
+        self.halt_tick = halt_tick
+
+    def schedule_reporters(self, reporters, start, interval, stop, go_command):
+        measures = []
+        while self.ticks < stop and self.ticks != self.halt_tick:
+            self.ticks = self.ticks + 1
+            measures.append([self.ticks, 10])
+        return measures
+
+    def report(self, reporter):
+        assert reporter == "ticks"
+        return float(self.ticks)
+
+
+class TicksObjective(IncrementalObjective):
+    def __call__(self, results):
+        return len(results)
+
+
+def test_chunks_run_until_ticks_to_run():
+    workspace = AbsoluteStopWorkspace()
+    fitness = run_incremental(workspace, TicksObjective(30), REPORTERS, 100, "go")
+    assert fitness == 100
+    assert workspace.ticks == 100
+
+
+def test_simulation_stopping_on_its_own_ends_the_run():
+    workspace = AbsoluteStopWorkspace(halt_tick=45)
+    assert run_incremental(workspace, TicksObjective(30), REPORTERS, 100, "go") == 45
+
+
+def test_empty_chunk_before_ticks_to_run_raises():
+    workspace = AbsoluteStopWorkspace(halt_tick=60)
+    with pytest.raises(RuntimeError):
+        run_incremental(workspace, TicksObjective(30), REPORTERS, 100, "go")
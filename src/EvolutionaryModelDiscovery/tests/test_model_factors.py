@@ -0,0 +1,67 @@
+import pickle
+
+import pytest
+from deap import gp
+
+from EvolutionaryModelDiscovery.ModelFactors import load_model_factors
+
+FACTORS = """
+; @EMD @operator @return-type=value @parameter-type=value @parameter-type=value @structure=+,- @commutative
+to-report subtract [a b]
+  report (word a " - " b)
+end
+
+; @EMD @factor @return-type=value
+to-report fa
+  report "a"
+end
+
+; @EMD @factor @return-type=value @interaction
+to-report fb
+  report "b"
+end
+"""
+
+RULE = "EMD_model_evaluation(subtract(fa, subtract(fb, fa)))"
+
+
+@pytest.fixture
+def factors_file_path(tmp_path):
+    factors_file_path = tmp_path / "Factors.nls"
+    factors_file_path.write_text(FACTORS)
+    return str(factors_file_path)
+
+
+def test_factors_are_parsed_without_writing_files(factors_file_path, tmp_path):
+    model_factors = load_model_factors(factors_file_path, "emdvalue")
+    assert model_factors.measureable_factors == ["fa", "fb"]
+    assert model_factors.negativeOps == {"subtract": [1, -1]}
+    assert model_factors.interactions == ["fb"]
+    assert model_factors.commutative == ["subtract"]
+    pset = model_factors.get_DEAP_primitive_set()
+    rule = gp.compile(gp.PrimitiveTree.from_string(RULE, pset), pset)
+    assert str(rule) == (
+        "( subtract (( fa  ) ) (( subtract (( fb  ) ) (( fa  ) )  ) )  ) \n"
+    )
+    assert [path.name for path in tmp_path.iterdir()] == ["Factors.nls"]
+
+
+def test_parsed_factors_are_cached_by_file_contents(factors_file_path, tmp_path):
+    model_factors = load_model_factors(factors_file_path, "emdvalue")
+    copy_path = tmp_path / "Copy.nls"
+    copy_path.write_text(FACTORS)
+    assert load_model_factors(str(copy_path), "emdvalue") is model_factors
+
+
+def test_model_factors_and_trees_are_picklable(factors_file_path):
+    model_factors = load_model_factors(factors_file_path, "emdvalue")
+    pset = model_factors.get_DEAP_primitive_set()
+    ind = gp.PrimitiveTree.from_string(RULE, pset)
+    copy = pickle.loads(pickle.dumps(model_factors))
+    copy_pset = copy.get_DEAP_primitive_set()
+    assert copy_pset is not pset
+    assert sorted(copy_pset.mapping) == sorted(pset.mapping)
+    # Factor classes are shared, so unpickled trees compile with either primitive set
+    assert copy.get_evaluation_class() is model_factors.get_evaluation_class()
+    copy_ind = pickle.loads(pickle.dumps(ind))
+    assert str(gp.compile(copy_ind, copy_pset)) == str(gp.compile(ind, pset))
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+from sklearn.ensemble import RandomForestRegressor
+
+from EvolutionaryModelDiscovery.PermutationImportance import (
+    get_permutation_importances,
+)
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    # Sparse presence scores, the fitness only depends on the first two factors
+    features = rng.integers(-2, 3, size=(300, 5)) * (rng.random((300, 5)) < 0.3)
+    y = 2.0 * features[:, 0] - features[:, 1] + rng.normal(0, 0.1, 300)
+    estimator = RandomForestRegressor(n_estimators=20, random_state=0, n_jobs=2)
+    estimator.fit(features.astype(np.float32), y)
+    return estimator, features, y
+
+
+def test_fitness_factors_are_the_most_important(data):
+    estimator, features, y = data
+    importances = get_permutation_importances(
+        estimator, features, y, n_iter=3, random_state=0
+    )
+    assert importances.shape == (3, 5)
+    mean_importances = importances.mean(axis=0)
+    assert mean_importances[0] > mean_importances[1] > mean_importances[2:].max()
+    # Predictions ran on a single thread each, the estimator gets its own back
+    assert estimator.n_jobs == 2
+
+
+def test_sparse_features_give_the_dense_importances(data):
+    estimator, features, y = data
+    dense = get_permutation_importances(
+        estimator, pd.DataFrame(features), y, n_iter=3, random_state=0
+    )
+    for matrix in [sparse.csr_matrix(features), sparse.csc_matrix(features)]:
+        assert np.allclose(
+            get_permutation_importances(
+                estimator, matrix, y, n_iter=3, random_state=0
+            ),
+            dense,
+        )
+
+
+def test_importances_do_not_depend_on_threads(data):
+    estimator, features, y = data
+    importances = [
+        get_permutation_importances(
+            estimator, features, y, n_iter=2, num_procs=num_procs, random_state=0
+        )
+        for num_procs in [1, 4]
+    ]
+    assert np.array_equal(*importances)
+    assert np.array_equal(
+        get_permutation_importances(
+            estimator, features, y, n_iter=2, max_workers=1, random_state=0
+        ),
+        importances[0],
+    )
+
+
+def test_features_are_left_unshuffled(data):
+    estimator, features, y = data
+    dense = features.astype(np.float32)
+    sparse_features = sparse.csc_matrix(dense)
+    for matrix in [dense, sparse_features]:
+        get_permutation_importances(
+            estimator, matrix, y, n_iter=2, max_samples=100, random_state=0
+        )
+    assert np.array_equal(dense, features)
+    assert np.array_equal(sparse_features.toarray(), features)
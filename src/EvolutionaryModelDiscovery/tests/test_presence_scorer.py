@@ -0,0 +1,125 @@
+import random
+
+import pytest
+from deap import gp
+
+from EvolutionaryModelDiscovery.ModelFactors import load_model_factors
+from EvolutionaryModelDiscovery.PresenceScorer import PresenceScorer
+
+# Factors with an interaction operator, a negating operator and an interaction
+# factor that takes no parameters
+FACTORS = """
+; @EMD @operator @return-type=value @parameter-type=value @parameter-type=value @interaction
+to-report multiply [a b]
+  report (word a " * " b)
+end
+
+; @EMD @operator @return-type=value @parameter-type=value @parameter-type=value
+to-report add [a b]
+  report (word a " + " b)
+end
+
+; @EMD @operator @return-type=value @parameter-type=value @parameter-type=value @structure=+,-
+to-report subtract [a b]
+  report (word a " - " b)
+end
+
+; @EMD @factor @return-type=value
+to-report fa
+  report "a"
+end
+
+; @EMD @factor @return-type=value
+to-report fb
+  report "b"
+end
+
+; @EMD @factor @return-type=value @interaction
+to-report fc
+  report "c"
+end
+"""
+
+
+@pytest.fixture
+def model_factors(tmp_path):
+    factors_file_path = tmp_path / "Factors.nls"
+    factors_file_path.write_text(FACTORS)
+    return load_model_factors(str(factors_file_path), "emdvalue")
+
+
+def score_factor_presence(ind, model_factors):
+    """
+    The stack based scoring PresenceScorer replaced.
+    """
+    presence_dict = {factor: 0 for factor in model_factors.measureable_factors}
+    stack = [{"param_num": 0, "obj": ind[0], "polarity": 1}]
+    interaction = None
+    interactionRoot = None
+    polarity = 1
+    for child in range(1, len(ind)):
+        childString = ind[child].name
+        parent = stack[-1]
+        if interaction is None:
+            if parent["obj"].name in model_factors.negativeOps:
+                polarity = (
+                    parent["polarity"]
+                    * model_factors.negativeOps[parent["obj"].name][
+                        parent["param_num"]
+                    ]
+                )
+            if childString in model_factors.measureable_factors:
+                presence_dict[childString] = presence_dict[childString] + polarity
+            if childString in model_factors.interactions:
+                interaction = [childString]
+                interactionRoot = len(stack)
+        else:
+            interaction.append(childString)
+        stack[-1]["param_num"] = stack[-1]["param_num"] + 1
+        parent = stack[-1]
+        if ind[child].arity == 0:
+            while parent["param_num"] == parent["obj"].arity:
+                stack.pop()
+                if len(stack) == 0:
+                    break
+                parent = stack[-1]
+                polarity = parent["polarity"]
+                if len(stack) == interactionRoot:
+                    interactionString = str(interaction)
+                    presence_dict[interactionString] = (
+                        presence_dict.get(interactionString, 0) + polarity
+                    )
+                    interaction = None
+                    interactionRoot = None
+                    polarity = 1
+        else:
+            stack.append({"param_num": 0, "obj": ind[child], "polarity": polarity})
+    return presence_dict
+
+
+def get_scores(scorer, ind):
+    scores, interactions = scorer.score(ind)
+    presence = dict(zip(scorer.get_factors(), scores.tolist()))
+    presence.update(interactions)
+    return presence
+
+
+def test_interaction_factor_absorbs_its_siblings(model_factors):
+    ind = gp.PrimitiveTree.from_string(
+        "EMD_model_evaluation(subtract(fa, add(subtract(fc, fb), fa)))",
+        model_factors.get_DEAP_primitive_set(),
+    )
+    assert get_scores(PresenceScorer(model_factors), ind) == {
+        "fa": 1,
+        "fb": 0,
+        "fc": -1,
+    }
+
+
+def test_scores_match_stack_based_scoring(model_factors):
+    random.seed(0)
+    pset = model_factors.get_DEAP_primitive_set()
+    scorer = PresenceScorer(model_factors)
+    for _ in range(1000):
+        ind = gp.PrimitiveTree(gp.genGrow(pset, 1, 6))
+        assert get_scores(scorer, ind) == score_factor_presence(ind, model_factors)
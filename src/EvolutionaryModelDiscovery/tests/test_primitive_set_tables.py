@@ -0,0 +1,109 @@
+import importlib
+import random
+
+import pytest
+from deap import gp
+
+from EvolutionaryModelDiscovery.PrimitiveSetTables import (
+    PrimitiveSetTables,
+    get_primitive_set_tables,
+)
+
+# The package exports the SimpleDEAPGP class under the name of its module
+simple_deap_gp = importlib.import_module("EvolutionaryModelDiscovery.SimpleDEAPGP")
+
+
+class Rule:
+    pass
+
+
+class Value:
+    pass
+
+
+class Values:
+    pass
+
+
+def identity(*args):
+    return args
+
+
+@pytest.fixture
+def pset():
+    # Like the Polarization model, rules and lists of values have no terminals
+    pset = gp.PrimitiveSetTyped("MAIN", [], Rule)
+    pset.addPrimitive(identity, [Value], Rule, name="execute")
+    pset.addPrimitive(identity, [Value, Value], Value, name="add")
+    pset.addPrimitive(identity, [Value, Value], Values, name="enlist")
+    pset.addPrimitive(identity, [Values], Value, name="pick")
+    pset.addTerminal("a", Value, name="a")
+    pset.addTerminal("b", Value, name="b")
+    return pset
+
+
+def get_leaf_depths(expr):
+    depths = []
+    stack = [0]
+    for node in expr:
+        depth = stack.pop()
+        if node.arity == 0:
+            depths.append(depth)
+        stack.extend([depth + 1] * node.arity)
+    return depths
+
+
+def test_candidates_close_their_subtree_within_the_window(pset):
+    tables = PrimitiveSetTables(pset)
+    assert not tables.is_feasible(Rule, 0, 0)
+    assert tables.is_feasible(Rule, 1, 1)
+    assert not tables.is_feasible(Values, 0, 0)
+    terminals, primitives = tables.get_candidates(Value, 0, 1)
+    assert [terminal.name for terminal in terminals] == ["a", "b"]
+    assert [primitive.name for primitive in primitives] == ["add"]
+    # pick needs a list of values, which needs two more levels to be closed
+    terminals, primitives = tables.get_candidates(Value, 2, 2)
+    assert terminals == []
+    assert sorted(primitive.name for primitive in primitives) == ["add", "pick"]
+
+
+def test_heights_relax_the_lowest_leaf_depth(pset):
+    tables = PrimitiveSetTables(pset)
+    assert tables.get_heights(Rule, 0, 3) == (0, [1, 2, 3])
+    assert tables.get_heights(Rule, 2, 2) == (2, [2])
+    assert tables.get_heights(Values, 0, 0) == (0, [])
+
+
+def test_tables_are_rebuilt_when_the_primitive_set_changes(pset):
+    tables = get_primitive_set_tables(pset)
+    assert get_primitive_set_tables(pset) is tables
+    pset.addTerminal(0, Values, name="empty")
+    assert not tables.is_current()
+    assert get_primitive_set_tables(pset).is_feasible(Values, 0, 0)
+
+
+@pytest.mark.parametrize("min_,max_", [(1, 1), (1, 4), (2, 5), (4, 4)])
+def test_generated_trees_keep_their_leaves_within_the_depth_bounds(
+    pset, min_, max_
+):
+    random.seed(0)
+    for _ in range(200):
+        expr = simple_deap_gp.genGrow(pset, min_, max_)
+        depths = get_leaf_depths(expr)
+        assert max(depths) <= max_
+        assert min(depths) >= min_
+        assert expr[0].ret is Rule
+
+
+def test_full_trees_have_all_leaves_at_the_same_depth(pset):
+    random.seed(0)
+    for _ in range(200):
+        expr = simple_deap_gp.generate(
+            pset, 2, 4, lambda height, depth: depth == height
+        )
+        assert len(set(get_leaf_depths(expr))) == 1
+
+
+def test_no_tree_fits_within_the_depth(pset):
+    with pytest.raises(TypeError):
+        simple_deap_gp.generate(pset, 0, 0, lambda height, depth: True)
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from EvolutionaryModelDiscovery import ABMEvaluator
+
+RACING = {"initial_replicates": 2, "top_fraction": 0.25, "confidence": 0.9}
+SETUP_COMMANDS = [["setup"]] * 10
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    batches = []
+
+    def simulate_replicates_concurrently(
+        model_path, replicates, reporters, ticks_to_run, go_command, new_rule
+    ):
+        batches.append(len(replicates))
+        return [float(len(batches) % 2) for _ in replicates]
+
+    monkeypatch.setattr(
+        ABMEvaluator,
+        "simulate_replicates_concurrently",
+        simulate_replicates_concurrently,
+    )
+    monkeypatch.setattr(ABMEvaluator, "RACING", RACING)
+    monkeypatch.setattr(ABMEvaluator, "RACING_REFERENCE", None)
+    return batches
+
+
+def race():
+    return ABMEvaluator.race("model", SETUP_COMMANDS, ["ticks"], 10, "go", np.mean)
+
+
+def test_all_replicates_run_without_a_reference(batches):
+    assert race() == ((1.0,), 10)
+    assert batches == [10]
+
+
+def test_rules_that_cannot_reach_the_top_stop_early(batches):
+    ABMEvaluator.set_racing_reference([10.0 + i for i in range(20)], False)
+    assert race() == ((1.0,), 2)
+    assert batches == [2]
+
+
+def test_rules_that_can_reach_the_top_run_all_replicates(batches):
+    ABMEvaluator.set_racing_reference([-10.0 - i for i in range(20)], False)
+    assert race() == ((0.6,), 10)
+    assert batches == [2] * 5
@@ -0,0 +1,26 @@
+import importlib
+
+import pytest
+
+from EvolutionaryModelDiscovery.ABMEvaluator import get_equivalent_record
+
+# The package exports the SimpleDEAPGP class under the name of its module
+simple_deap_gp = importlib.import_module("EvolutionaryModelDiscovery.SimpleDEAPGP")
+
+
+def evaluate_by_size(individual, ticks_to_run=None):
+    return get_equivalent_record(individual, {"Fitness": (float(len(individual)),)})
+
+
+@pytest.mark.parametrize("reevaluation", ["keep", "resample", "reevaluate"])
+def test_every_offspring_gets_a_factor_scores_row(gp, monkeypatch, reevaluation):
+    monkeypatch.setattr(simple_deap_gp, "evaluate", evaluate_by_size)
+    gp.set_population_size(10)
+    gp.set_generations(3)
+    # Few crossovers and mutations, so that most offspring are clones
+    gp.set_crossover_rate(0.1)
+    gp.set_mutation_rate(0.1)
+    gp.set_reevaluation(reevaluation)
+    population, logbook, factor_scores = gp.evolve(num_procs=1, verbose=False)
+    assert len(factor_scores) == 10 * 4
+    assert factor_scores.groupby("Gen").size().tolist() == [10] * 4
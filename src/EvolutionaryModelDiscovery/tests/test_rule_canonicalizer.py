@@ -0,0 +1,60 @@
+import operator
+
+import pytest
+from deap import gp
+
+from EvolutionaryModelDiscovery.RuleCanonicalizer import RuleCanonicalizer
+
+
+@pytest.fixture(scope="module")
+def pset():
+    pset = gp.PrimitiveSet("MAIN", 0)
+    pset.addPrimitive(operator.add, 2, name="add")
+    pset.addPrimitive(operator.sub, 2, name="sub")
+    pset.addPrimitive(max, 3, name="max3")
+    for terminal in ["a", "b", "c"]:
+        pset.addTerminal(terminal, name=terminal)
+    return pset
+
+
+def canonicalize(canonicalizer, pset, rule):
+    return canonicalizer.canonicalize(gp.PrimitiveTree.from_string(rule, pset))
+
+
+def test_without_annotations_trees_keep_their_form(pset):
+    canonicalizer = RuleCanonicalizer()
+    assert canonicalizer.is_identity()
+    assert canonicalize(canonicalizer, pset, "sub(add(b, a), c)") == "sub(add(b,a),c)"
+
+
+def test_commutative_arguments_are_sorted(pset):
+    canonicalizer = RuleCanonicalizer(commutative=["add", "max3"])
+    assert not canonicalizer.is_identity()
+    assert canonicalize(canonicalizer, pset, "add(b, a)") == canonicalize(
+        canonicalizer, pset, "add(a, b)"
+    )
+    assert canonicalize(canonicalizer, pset, "max3(c, sub(b, a), a)") == (
+        "max3(a,c,sub(b,a))"
+    )
+    # Arguments of factors that are not commutative keep their order
+    assert canonicalize(canonicalizer, pset, "sub(b, a)") == "sub(b,a)"
+
+
+def test_associative_applications_are_flattened(pset):
+    canonicalizer = RuleCanonicalizer(associative=["add"])
+    assert canonicalize(canonicalizer, pset, "add(add(a, b), c)") == "add(a,b,c)"
+    assert canonicalize(canonicalizer, pset, "add(a, add(b, c))") == "add(a,b,c)"
+    assert canonicalize(canonicalizer, pset, "add(c, add(b, a))") == "add(c,b,a)"
+    # Only nested applications of the same factor are flattened
+    assert canonicalize(canonicalizer, pset, "add(sub(add(a, b), c), a)") == (
+        "add(sub(add(a,b),c),a)"
+    )
+
+
+def test_commutative_and_associative_trees_share_a_form(pset):
+    canonicalizer = RuleCanonicalizer(commutative=["add"], associative=["add"])
+    forms = {
+        canonicalize(canonicalizer, pset, rule)
+        for rule in ["add(add(a, b), c)", "add(c, add(b, a))", "add(b, add(c, a))"]
+    }
+    assert forms == {"add(a,b,c)"}
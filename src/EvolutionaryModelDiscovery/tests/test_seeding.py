@@ -0,0 +1,35 @@
+import random
+
+import numpy as np
+
+from EvolutionaryModelDiscovery import _get_island_seeds, _seed_process
+
+
+def get_starting_population(gp, seed_sequence):
+    # Spawned run processes import the user's script again, along with its seeding
+    random.seed(0)
+    np.random.seed(0)
+    _seed_process(seed_sequence)
+    return [str(ind) for ind in gp._toolbox.population(n=10)]
+
+
+def test_parallel_runs_start_from_different_populations(gp):
+    run_seeds = np.random.SeedSequence(0).spawn(2)
+    populations = [get_starting_population(gp, seed) for seed in run_seeds]
+    assert populations[0] != populations[1]
+
+
+def test_parallel_runs_are_repeatable(gp):
+    first = get_starting_population(gp, np.random.SeedSequence(0).spawn(2)[1])
+    second = get_starting_population(gp, np.random.SeedSequence(0).spawn(2)[1])
+    assert first == second
+
+
+def test_islands_start_from_different_populations(gp):
+    island_seeds = _get_island_seeds(0, 2, 2)
+    populations = [
+        get_starting_population(gp, island_seeds[run][island])
+        for run in range(2)
+        for island in range(2)
+    ]
+    assert len(set(map(tuple, populations))) == 4